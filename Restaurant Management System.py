@@ -1,9 +1,31 @@
 import streamlit as st
 import mysql.connector
+import numpy as np
+from mysql.connector import errorcode
+from mysql.connector.errors import PoolError
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, as_completed
+from contextlib import contextmanager
+from functools import lru_cache
 from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import argparse
+import bisect
+import csv
 import hashlib
+import io
+import json
+import logging
+import math
+import os
 import re
-from typing import Dict, List, Tuple, Optional
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from typing import Dict, List, NamedTuple, Tuple, Optional
 
 # Configuration and Constants
 DB_CONFIG = {
@@ -13,16 +35,1108 @@ DB_CONFIG = {
     "database": "restaurant_db",
 }
 
+DB_POOL_CONFIG = {
+    "pool_size": 8,
+    "checkout_timeout": 5.0,  # seconds to wait for a free connection
+    "health_check_interval": 30.0,  # ping connections idle longer than this
+    "max_prepared_statements": 64,  # per connection; the least recently used is closed beyond this
+}
+
+# Read replicas for reporting and dashboard reads, each a DB_CONFIG-style dict
+# (e.g. {"host": "replica1", "port": 3306, ...}). With none, every read goes
+# to the primary in DB_CONFIG.
+REPLICA_CONFIGS = []
+
+REPLICA_ROUTER_CONFIG = {
+    "max_lag": 5.0,  # seconds behind the primary before a replica is skipped
+    "lag_check_interval": 2.0,  # seconds a replica's lag reading is trusted
+    "retry_interval": 30.0,  # seconds before a failed replica is tried again
+    "read_your_writes": 10.0,  # seconds a session reads from the primary after committing
+    "pool_size": 4,  # connections per replica
+}
+
+ARCHIVE_CONFIG = {
+    "order_retention_days": 90,  # closed orders older than this move to the archive
+    "reservation_retention_days": 30,
+    "batch_size": 500,  # rows moved per transaction
+    "pause": 0.1,  # seconds between batches, so replicas and live traffic keep up
+}
+
+FORECAST_CONFIG = {
+    "history_weeks": 52,  # whole weeks of order history the model is fitted on
+    "smoothing": 0.2,  # exponential smoothing factor for weekly demand (0-1)
+    "reorder_cover_days": 2,  # stock a reorder level should cover, in days of forecast use
+    "safety_factor": 1.25,
+    "cache_ttl": 3600.0,  # the model only moves with whole days of history
+}
+
+QUERY_CACHE_CONFIG = {
+    "max_entries": 256,
+    "menu_ttl": 300.0,  # seconds; the menu changes a few times a day
+    "table_ttl": 5.0,  # table status changes constantly, keep this short
+    "dashboard_ttl": 3.0,  # lets several open manager tabs share one snapshot
+}
+
+CUSTOMER_CONFIG = {
+    "default_country_code": "91",  # for phone numbers entered without one
+    "cache_size": 50000,  # identity -> Cust_Id mappings kept in memory
+    "cache_ttl": 3600.0,
+    "backfill_batch_size": 1000,  # customers keyed per transaction by backfill-customer-keys
+}
+
+RESERVATION_CONFIG = {
+    "conflict_window_hours": 2,  # bookings closer than this on one table clash
+    "index_ttl": 60.0,  # seconds before a day's bookings are reloaded
+}
+
+REPORT_PACK_CONFIG = {
+    "max_workers": 4,  # shared by all sessions; keep below the connection pool size
+    "timeout": 30.0,  # seconds per report, also enforced server-side
+}
+
+EXPORT_CONFIG = {
+    "directory": "exports",  # where exports started from the Reports page are written
+    "chunk_size": 10000,  # rows fetched and written per chunk
+}
+
+SNAPSHOT_CONFIG = {
+    "directory": "analytics_snapshot",  # columnar snapshot of order history on local disk
+    "refresh_interval": 300.0,  # seconds between incremental refreshes
+    "overlap": 60.0,  # seconds re-read behind each high-water mark, for late commits
+    "dashboard_days": 30,  # range of the dashboard panels served from the snapshot
+}
+
+QUERY_METRICS_CONFIG = {
+    "slow_query_ms": 200.0,  # statements slower than this go to the slow-query log
+    "slow_log_size": 500,  # most recent slow statements kept in memory
+}
+
+MENU_CATEGORIES = ["Appetizers", "Main Course", "Desserts", "Beverages"]
+
+# Allowed range for a bulk price change, in percent; -100 would zero every price
+MENU_PRICE_CHANGE_LIMITS = (-90.0, 500.0)
+
+MENU_IMPORT_CONFIG = {
+    "batch_size": 1000,  # rows per multi-row INSERT, keeps statements under max_allowed_packet
+    "max_price": Decimal("99999999.99"),  # DECIMAL(10,2)
+}
+
+LOW_STOCK_CONFIG = {
+    "ttl": 60.0,  # seconds before the alert queue is reloaded to catch changes made elsewhere
+    "dashboard_limit": 20,  # most urgent alerts shown on the dashboard
+}
+
+STOCK_DEPLETION_CONFIG = {
+    "interval": 5.0,  # seconds between depletion passes when nothing wakes the worker
+    "batch_size": 500,  # orders settled per transaction
+}
+
+# Recipe units and their size in a base unit; quantities convert only within
+# the same dimension
+UNITS = {
+    "mg": ("mass", Decimal("0.001")),
+    "g": ("mass", Decimal("1")),
+    "kg": ("mass", Decimal("1000")),
+    "ml": ("volume", Decimal("1")),
+    "l": ("volume", Decimal("1000")),
+    "pcs": ("count", Decimal("1")),
+    "portion": ("count", Decimal("1")),
+}
+
+WRITE_QUEUE_CONFIG = {
+    "path": "write_journal.sqlite3",  # local journal; keep it on persistent disk
+    "flush_interval": 0.5,  # seconds between flush passes when nothing wakes the flusher
+    "batch_size": 100,  # journal entries applied per MySQL transaction
+    "max_backoff": 30.0,  # seconds; the retry delay doubles up to this while MySQL fails
+    "max_attempts": 8,  # failures of one entry before it is set aside as rejected
+    "retention": 86400.0,  # seconds applied entries stay in the journal
+}
+
+LIST_CONFIG = {
+    "page_size": 50,  # rows per page in the management lists
+}
+
+KDS_CONFIG = {
+    "poll_interval": 2.0,  # seconds between kitchen display polls
+    # Re-read this far behind the watermark. The watermark itself is held at
+    # the start of the oldest open write transaction, which needs the PROCESS
+    # privilege; without it the overlap alone must cover the longest write.
+    "overlap": 2.0,
+    "batch_size": 500,
+}
+
+
+# Connection Pool
+# Session state the app changes on a connection, put back before the next
+# borrower gets it. COM_RESET_CONNECTION would also do this, but it drops the
+# connection's prepared statements.
+SESSION_RESET_SQL = (
+    "SET @bulk_order_items = NULL, @archiving = NULL,"
+    " SESSION max_execution_time = DEFAULT, SESSION transaction_isolation = DEFAULT"
+)
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of MySQL connections opened lazily from a connection config.
+
+    A thread that already holds a connection gets the same one back on nested
+    checkouts, so a helper called from inside another helper does not take a
+    second slot. The connection goes back to the pool when the outermost
+    checkout is released.
+
+    A nested checkout shares the outer checkout's transaction, so only the
+    outermost may commit or roll back; PooledConnection refuses to do either
+    for a nested checkout.
+    """
+
+    def __init__(
+        self,
+        db_config: Dict,
+        pool_size: int = 8,
+        checkout_timeout: float = 5.0,
+        health_check_interval: float = 30.0,
+        max_prepared_statements: int = 64,
+    ):
+        self.db_config = dict(db_config)
+        self.pool_size = pool_size
+        self.checkout_timeout = checkout_timeout
+        self.health_check_interval = health_check_interval
+        self.max_prepared_statements = max_prepared_statements
+        self._idle = []  # (connection, time it was returned)
+        self._statements = {}  # connection -> StatementRegistry
+        self._open = 0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            "checkouts": 0,
+            "connections_created": 0,
+            "health_checks": 0,
+            "stale_discarded": 0,
+            "waits": 0,
+            "wait_time_total": 0.0,
+            "wait_time_max": 0.0,
+            "exhausted": 0,
+            "timeouts": 0,
+            "statements_prepared": 0,
+            "statement_reuses": 0,
+        }
+
+    def _count(self, key, amount=1):
+        with self._cond:
+            self._stats[key] += amount
+
+    def _take(self):
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._open < self.pool_size:
+                    self._open += 1
+                    conn, returned_at = None, None
+                    break
+                if not waited:
+                    self._stats["exhausted"] += 1
+                    waited = True
+                remaining = self.checkout_timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolError(
+                        f"No free connection after {self.checkout_timeout}s "
+                        f"(pool size {self.pool_size})"
+                    )
+                self._cond.wait(remaining)
+
+            self._stats["checkouts"] += 1
+            if waited:
+                wait_time = time.perf_counter() - start
+                self._stats["waits"] += 1
+                self._stats["wait_time_total"] += wait_time
+                self._stats["wait_time_max"] = max(self._stats["wait_time_max"], wait_time)
+
+        try:
+            if conn is None:
+                conn = self._connect()
+            elif time.monotonic() - returned_at > self.health_check_interval:
+                self._count("health_checks")
+                if not conn.is_connected():
+                    self._count("stale_discarded")
+                    self._discard(conn)
+                    conn = self._connect()
+        except Exception:
+            with self._cond:
+                self._open -= 1
+                self._cond.notify()
+            raise
+        return conn
+
+    def _connect(self):
+        conn = mysql.connector.connect(**self.db_config)
+        self._count("connections_created")
+        with self._cond:
+            self._statements[conn] = StatementRegistry(conn, self.max_prepared_statements, self._count)
+        return conn
+
+    def _discard(self, conn):
+        with self._cond:
+            self._statements.pop(conn, None)
+        self._close_quietly(conn)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def statements(self, conn) -> "StatementRegistry":
+        """The prepared statement registry of a connection checked out from this pool."""
+        with self._cond:
+            return self._statements[conn]
+
+    def _give_back(self, conn):
+        # End any transaction left open (including the implicit one a plain
+        # SELECT starts) so the next borrower does not read a stale snapshot,
+        # and undo session settings the last borrower left behind.
+        try:
+            if conn.in_transaction or conn.unread_result:
+                conn.rollback()
+            cursor = conn.cursor()
+            cursor.execute(SESSION_RESET_SQL)
+            cursor.close()
+            healthy = True
+        except Exception:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                self._idle.append((conn, time.monotonic()))
+            else:
+                self._open -= 1
+            self._cond.notify()
+        if not healthy:
+            self._count("stale_discarded")
+            self._discard(conn)
+
+    def acquire(self):
+        """Check out a connection for the current thread."""
+        held = getattr(self._local, "conn", None)
+        if held is not None:
+            self._local.depth += 1
+            return held
+        conn = self._take()
+        self._local.conn = conn
+        self._local.depth = 1
+        return conn
+
+    def held(self) -> bool:
+        """Whether the current thread has a connection checked out from this pool."""
+        return getattr(self._local, "conn", None) is not None
+
+    def nested(self) -> bool:
+        """Whether the current thread's latest checkout is inside another one."""
+        return getattr(self._local, "depth", 0) > 1
+
+    def release(self):
+        """Release the current thread's checkout, returning it when the last one ends."""
+        self._local.depth -= 1
+        if self._local.depth > 0:
+            return
+        conn = self._local.conn
+        self._local.conn = None
+        self._give_back(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["pool_size"] = self.pool_size
+            stats["open"] = self._open
+            stats["idle"] = len(self._idle)
+        stats["in_use"] = stats["open"] - stats["idle"]
+        stats["wait_time_avg"] = (
+            stats["wait_time_total"] / stats["waits"] if stats["waits"] else 0.0
+        )
+        return stats
+
+
+class StatementRegistry:
+    """
+    Server-side prepared statements of one connection, one per SQL string.
+
+    A statement is prepared the first time its SQL is used on the connection
+    and the prepared cursor is kept for the life of the connection, so the
+    server parses it once rather than on every call. Beyond max_statements
+    the least recently used one is closed (MySQL caps prepared statements
+    per server with max_prepared_stmt_count).
+    """
+
+    def __init__(self, conn, max_statements: int = 64, count=None):
+        self._conn = conn
+        self._max_statements = max_statements
+        self._count = count or (lambda key: None)
+        self._cursors = OrderedDict()  # (sql, dictionary) -> (sql, prepared cursor)
+
+    def cursor(self, sql: str, dictionary: bool = False):
+        """
+        Returns:
+            (sql, cursor): the SQL string the cursor was prepared with, which
+            must be passed to execute as is (the connector only skips the
+            re-prepare when it gets the identical string object back), and
+            the prepared cursor.
+        """
+        key = (sql, dictionary)
+        entry = self._cursors.get(key)
+        if entry is not None:
+            self._cursors.move_to_end(key)
+            self._count("statement_reuses")
+            return entry
+        if len(self._cursors) >= self._max_statements:
+            _, (_, oldest) = self._cursors.popitem(last=False)
+            try:
+                oldest.close()
+            except mysql.connector.Error:
+                pass
+        entry = (sql, self._conn.cursor(prepared=True, dictionary=dictionary))
+        self._cursors[key] = entry
+        self._count("statements_prepared")
+        return entry
+
+
+class PooledConnection:
+    """Connection handle whose close() hands the connection back to its pool."""
+
+    def __init__(self, pool: ConnectionPool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._nested = pool.nested()
+        self._cursors = []
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    @property
+    def pool(self) -> ConnectionPool:
+        return self._pool
+
+    def _check_outermost(self, action):
+        if self._nested:
+            raise PoolError(f"A nested checkout cannot {action} the outer checkout's transaction")
+
+    def commit(self):
+        self._check_outermost("commit")
+        self._conn.commit()
+        note_session_write()
+
+    def rollback(self):
+        self._check_outermost("roll back")
+        self._conn.rollback()
+
+    def cursor(self, *args, **kwargs):
+        cursor = InstrumentedCursor(self._conn.cursor(*args, **kwargs), get_query_metrics(), self)
+        self._cursors.append(cursor)
+        return cursor
+
+    def prepared(self, sql: str, dictionary: bool = False) -> "PreparedCursor":
+        """
+        Cursor for one hot statement, prepared on the server once per pooled
+        connection and reused. Fetch all rows before running the next
+        statement: prepared cursors are unbuffered.
+        """
+        sql, raw = self._pool.statements(self._conn).cursor(sql, dictionary)
+        cursor = PreparedCursor(raw, get_query_metrics(), self, sql)
+        self._cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        if self._conn is not None:
+            for cursor in self._cursors:
+                cursor.finish()
+            self._cursors = []
+            self._conn = None
+            self._pool.release()
+
+
+# Streamlit re-executes this script on every rerun, so the pool is kept in the
+# resource cache to survive across reruns and sessions.
+@st.cache_resource(show_spinner=False)
+def get_connection_pool() -> ConnectionPool:
+    return ConnectionPool(DB_CONFIG, **DB_POOL_CONFIG)
+
+
+@contextmanager
+def pooled_connection():
+    """Check out a pooled connection for the duration of a with-block."""
+    pool = get_connection_pool()
+    conn = PooledConnection(pool, pool.acquire())
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_pool_stats() -> Dict:
+    return get_connection_pool().stats()
+
+
+# Read Replica Routing
+class ReplicaRouter:
+    """
+    Chooses the server for a read that tolerates a little staleness: a
+    replica within max_lag seconds of the primary, or else the primary.
+
+    Replica lag comes from SHOW REPLICA STATUS, read at most once per
+    lag_check_interval. A replica that cannot be reached or is not
+    replicating is skipped for retry_interval. Healthy replicas take turns.
+    A thread that already holds a connection keeps using it, and a session
+    that committed within read_your_writes seconds reads from the primary.
+    """
+
+    def __init__(
+        self,
+        primary: ConnectionPool,
+        replicas: List[ConnectionPool],
+        max_lag: float = 5.0,
+        lag_check_interval: float = 2.0,
+        retry_interval: float = 30.0,
+        read_your_writes: float = 10.0,
+    ):
+        self.primary = primary
+        self.replicas = list(replicas)
+        self.max_lag = max_lag
+        self.lag_check_interval = lag_check_interval
+        self.retry_interval = retry_interval
+        self.read_your_writes = read_your_writes
+        self._health = {
+            pool: {"lag": None, "checked_at": None, "down_until": 0.0, "error": None}
+            for pool in self.replicas
+        }
+        self._next = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "replica_reads": 0,
+            "primary_reads": 0,
+            "nested_reads": 0,
+            "read_your_writes": 0,
+            "fallback_lagging": 0,
+            "fallback_unavailable": 0,
+            "lag_checks": 0,
+        }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _mark_down(self, pool, error):
+        with self._lock:
+            health = self._health[pool]
+            health["down_until"] = time.monotonic() + self.retry_interval
+            health["lag"] = None
+            health["error"] = str(error)
+
+    def _measure_lag(self, pool):
+        self._count("lag_checks")
+        try:
+            with pool.connection() as conn:
+                cursor = conn.cursor(dictionary=True)
+                try:
+                    cursor.execute("SHOW REPLICA STATUS")
+                except mysql.connector.Error:
+                    cursor.execute("SHOW SLAVE STATUS")  # before MySQL 8.0.22
+                channels = cursor.fetchall()
+                cursor.close()
+        except mysql.connector.Error as error:
+            self._mark_down(pool, error)
+            return
+        if not channels:
+            self._mark_down(pool, "Replication is not configured")
+            return
+        lags = [
+            channel.get("Seconds_Behind_Source", channel.get("Seconds_Behind_Master"))
+            for channel in channels
+        ]
+        if any(lag is None for lag in lags):
+            self._mark_down(pool, "Replication is stopped")
+            return
+        with self._lock:
+            self._health[pool].update(lag=max(lags), error=None)
+
+    def _state(self, pool) -> str:
+        """'ok', 'lagging' or 'unavailable', checking the lag if it is due."""
+        now = time.monotonic()
+        with self._lock:
+            health = self._health[pool]
+            if now < health["down_until"]:
+                return "unavailable"
+            due = health["checked_at"] is None or now - health["checked_at"] >= self.lag_check_interval
+            if due:
+                # Claimed under the lock so only one thread checks; the others
+                # go by the previous reading meanwhile
+                health["checked_at"] = now
+        if due:
+            self._measure_lag(pool)
+        with self._lock:
+            health = self._health[pool]
+            if health["lag"] is None:
+                return "unavailable"
+            return "ok" if health["lag"] <= self.max_lag else "lagging"
+
+    def _candidates(self, last_write):
+        """Pools to try in order, the primary always last."""
+        for pool in [self.primary] + self.replicas:
+            if pool.held():
+                self._count("nested_reads")
+                return [pool]
+        if not self.replicas:
+            return [self.primary]
+        if last_write is not None and time.monotonic() - last_write < self.read_your_writes:
+            self._count("read_your_writes")
+            return [self.primary]
+
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.replicas)
+        ordered = self.replicas[start:] + self.replicas[:start]
+        candidates, fallback = [], "fallback_unavailable"
+        for pool in ordered:
+            state = self._state(pool)
+            if state == "ok":
+                candidates.append(pool)
+            elif state == "lagging":
+                fallback = "fallback_lagging"
+        if not candidates:
+            self._count(fallback)
+        return candidates + [self.primary]
+
+    def acquire(self, last_write: Optional[float] = None):
+        """
+        Check out a connection for a read.
+
+        Args:
+            last_write: time.monotonic() of the caller's last commit, if any
+
+        Returns:
+            (pool, connection)
+        """
+        candidates = self._candidates(last_write)
+        for pool in candidates[:-1]:
+            try:
+                conn = pool.acquire()
+            except PoolError:
+                continue  # busy rather than broken; try the next one
+            except mysql.connector.Error as error:
+                self._mark_down(pool, error)
+                continue
+            self._count("replica_reads")
+            return pool, conn
+        if len(candidates) > 1:
+            self._count("fallback_unavailable")
+        pool = candidates[-1]
+        conn = pool.acquire()
+        self._count("replica_reads" if pool is not self.primary else "primary_reads")
+        return pool, conn
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["replicas"] = [
+                {
+                    "host": f"{pool.db_config.get('host')}:{pool.db_config.get('port', 3306)}",
+                    "lag": health["lag"],
+                    "available": now >= health["down_until"] and health["lag"] is not None,
+                    "error": health["error"],
+                }
+                for pool, health in self._health.items()
+            ]
+        return stats
+
+
+@st.cache_resource(show_spinner=False)
+def get_replica_router() -> ReplicaRouter:
+    options = dict(REPLICA_ROUTER_CONFIG)
+    pool_options = dict(DB_POOL_CONFIG, pool_size=options.pop("pool_size"))
+    replicas = [ConnectionPool(config, **pool_options) for config in REPLICA_CONFIGS]
+    return ReplicaRouter(get_connection_pool(), replicas, **options)
+
+
+def note_session_write():
+    """Record that the current Streamlit session has just committed."""
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.session_state["last_write_at"] = time.monotonic()
+
+
+def session_last_write() -> Optional[float]:
+    """time.monotonic() of the current session's last commit, if any."""
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return None
+    return st.session_state.get("last_write_at")
+
+
+@contextmanager
+def pooled_read_connection(last_write: Optional[float] = None):
+    """Check out a connection for read-only queries, possibly on a replica."""
+    pool, raw = get_replica_router().acquire(last_write)
+    conn = PooledConnection(pool, raw)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def get_routing_stats() -> Dict:
+    return get_replica_router().stats()
+
+
+# Query Instrumentation
+slow_query_logger = logging.getLogger("restaurant.slow_query")
+
+
+@lru_cache(maxsize=2048)
+def sql_fingerprint(sql: str) -> str:
+    """Normalize a statement so calls differing only in literals share a key."""
+    fingerprint = re.sub(r"\s+", " ", sql).strip()
+    fingerprint = re.sub(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"", "?", fingerprint)
+    fingerprint = re.sub(r"%s|\b\d+(?:\.\d+)?\b", "?", fingerprint)
+    # IN lists and VALUES tuples of any length collapse to one shape
+    return re.sub(r"\(\s*\?(?:\s*,\s*\?)*\s*\)", "(?+)", fingerprint)
+
+
+# Histogram bucket upper bounds in ms: 0.05ms to about 2 minutes, 25% apart
+LATENCY_BUCKETS_MS = [0.05 * 1.25**i for i in range(67)]
+
+
+class QueryMetrics:
+    """
+    Per-fingerprint latency histograms, row counts and callers, plus a
+    bounded log of statements slower than slow_query_ms.
+    """
+
+    def __init__(self, slow_query_ms: float = 200.0, slow_log_size: int = 500):
+        self.slow_query_ms = slow_query_ms
+        self._queries = {}
+        self._slow = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+
+    def record(self, sql, caller, elapsed_ms, rows):
+        fingerprint = sql_fingerprint(sql)
+        bucket = bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)
+        with self._lock:
+            entry = self._queries.get(fingerprint)
+            if entry is None:
+                entry = self._queries[fingerprint] = {
+                    "calls": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "rows": 0,
+                    "callers": {},
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["rows"] += max(rows, 0)
+            entry["callers"][caller] = entry["callers"].get(caller, 0) + 1
+            entry["buckets"][bucket] += 1
+            if elapsed_ms >= self.slow_query_ms:
+                self._slow.append(
+                    {
+                        "At": datetime.now(),
+                        "Caller": caller,
+                        "Elapsed_ms": elapsed_ms,
+                        "Rows": rows,
+                        "Fingerprint": fingerprint,
+                    }
+                )
+        if elapsed_ms >= self.slow_query_ms:
+            slow_query_logger.warning(
+                "slow query %.1f ms in %s (%d rows): %s", elapsed_ms, caller, rows, fingerprint
+            )
+
+    @staticmethod
+    def _percentile(buckets, calls, q):
+        # Linear interpolation inside the bucket holding the q-th sample
+        rank = q * calls
+        seen = 0
+        for i, count in enumerate(buckets):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS_MS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else lower * 1.25
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return 0.0
+
+    def stats(self) -> List[Dict]:
+        with self._lock:
+            entries = [(fp, dict(e, callers=dict(e["callers"]), buckets=list(e["buckets"]))) for fp, e in self._queries.items()]
+        rows = []
+        for fingerprint, entry in entries:
+            calls = entry["calls"]
+            rows.append(
+                {
+                    "Fingerprint": fingerprint,
+                    "Calls": calls,
+                    "Total_ms": entry["total_ms"],
+                    "Mean_ms": entry["total_ms"] / calls,
+                    "P50_ms": min(self._percentile(entry["buckets"], calls, 0.50), entry["max_ms"]),
+                    "P95_ms": min(self._percentile(entry["buckets"], calls, 0.95), entry["max_ms"]),
+                    "P99_ms": min(self._percentile(entry["buckets"], calls, 0.99), entry["max_ms"]),
+                    "Max_ms": entry["max_ms"],
+                    "Rows_Avg": entry["rows"] / calls,
+                    "Callers": ", ".join(
+                        f"{name} ({count})"
+                        for name, count in sorted(entry["callers"].items(), key=lambda c: -c[1])
+                    ),
+                }
+            )
+        return sorted(rows, key=lambda r: r["Total_ms"], reverse=True)
+
+    def slow_queries(self) -> List[Dict]:
+        with self._lock:
+            return list(self._slow)
+
+    def reset(self):
+        with self._lock:
+            self._queries.clear()
+            self._slow.clear()
+
+
+class InstrumentedCursor:
+    """
+    Cursor wrapper that times each statement from execute through its last
+    fetch and reports it to QueryMetrics along with the rows returned and
+    the function that issued it.
+    """
+
+    def __init__(self, cursor, metrics: QueryMetrics, connection=None):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._pending = None  # [sql, caller, elapsed_ms, rows]
+        self.connection = connection
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def _run(self, method, operation, args, kwargs):
+        self.finish()
+        caller = sys._getframe(2).f_code.co_name
+        started = time.perf_counter()
+        try:
+            return getattr(self._cursor, method)(operation, *args, **kwargs)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            rows = 0 if self._cursor.with_rows else self._cursor.rowcount
+            self._pending = [operation, caller, elapsed_ms, rows]
+
+    def execute(self, operation, *args, **kwargs):
+        return self._run("execute", operation, args, kwargs)
+
+    def executemany(self, operation, *args, **kwargs):
+        return self._run("executemany", operation, args, kwargs)
+
+    def _fetch(self, method, *args):
+        started = time.perf_counter()
+        result = getattr(self._cursor, method)(*args)
+        if self._pending is not None:
+            self._pending[2] += (time.perf_counter() - started) * 1000
+            if method == "fetchone":
+                self._pending[3] += result is not None
+            else:
+                self._pending[3] += len(result)
+        return result
+
+    def fetchone(self):
+        return self._fetch("fetchone")
+
+    def fetchall(self):
+        return self._fetch("fetchall")
+
+    def fetchmany(self, size=1):
+        return self._fetch("fetchmany", size)
+
+    def finish(self):
+        """Report the current statement, if any. Called on the next execute and on close."""
+        if self._pending is not None:
+            self._metrics.record(*self._pending)
+            self._pending = None
+
+    def close(self):
+        self.finish()
+        return self._cursor.close()
+
+
+class PreparedCursor(InstrumentedCursor):
+    """InstrumentedCursor over a prepared statement; execute takes only the parameters."""
+
+    def __init__(self, cursor, metrics: QueryMetrics, connection, sql: str):
+        super().__init__(cursor, metrics, connection)
+        self.sql = sql
+
+    def execute(self, params=()):
+        return self._run("execute", self.sql, (params,), {})
+
+    def executemany(self, seq_params):
+        return self._run("executemany", self.sql, (seq_params,), {})
+
+    def finish(self):
+        super().finish()
+        # The cursor is shared by every call on this connection; drain rows a
+        # caller left unread so the next one starts clean
+        try:
+            if self._cursor.with_rows:
+                self._cursor.fetchall()
+        except mysql.connector.Error:
+            pass
+
+    def close(self):
+        # The prepared statement belongs to the registry; keep it open
+        self.finish()
+
+
+@lru_cache(maxsize=256)
+def in_list_sql(sql: str, count: int) -> str:
+    """
+    sql with "{in_list}" replaced by count placeholders. Cached so each
+    (sql, count) always yields the same string object, which is what lets a
+    prepared cursor reuse its statement.
+    """
+    return sql.replace("{in_list}", ", ".join(["%s"] * count))
+
+
+@lru_cache(maxsize=256)
+def values_sql(sql: str, rows: int, width: int) -> str:
+    """sql with "{values}" replaced by rows tuples of width placeholders, cached like in_list_sql."""
+    row = "(" + ", ".join(["%s"] * width) + ")"
+    return sql.replace("{values}", ", ".join([row] * rows))
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_metrics() -> QueryMetrics:
+    return QueryMetrics(**QUERY_METRICS_CONFIG)
+
+
+def get_query_stats() -> List[Dict]:
+    """Latency percentiles, mean rows and callers per statement fingerprint."""
+    return get_query_metrics().stats()
+
+
+def get_slow_queries() -> List[Dict]:
+    return get_query_metrics().slow_queries()
+
+
+# Query Cache
+class QueryCache:
+    """
+    Size-bounded TTL cache for read queries, keyed by query name and arguments.
+
+    Each entry carries a set of tags (for example "menu:item:3") so a write can
+    invalidate exactly the entries it affects. The least recently used entry is
+    evicted once max_entries is reached. Cached rows are shared between
+    callers and must be treated as read-only.
+
+    Every invalidation stamps its tags with a new generation number. A load
+    that started before one of its tags was invalidated may hold rows from
+    before the write, so its result is returned but not stored.
+    """
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, expires_at, tags)
+        self._tag_index = {}  # tag -> set of keys
+        self._generation = 0
+        self._tag_generations = {}  # tag -> generation of its last invalidation
+        self._cleared_at = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    def _drop(self, key):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+
+    def get_or_load(self, key, loader, ttl: float, tags=()):
+        """
+        Return the cached value for key, calling loader() on a miss.
+
+        Args:
+            key: Hashable cache key, normally (query name, *arguments)
+            loader: Zero-argument callable that runs the query. A None result
+                means the query failed and is not cached.
+            ttl: Seconds the loaded value stays fresh
+            tags: Iterable of tags, or a callable mapping the loaded value to tags
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return entry[0]
+                self._drop(key)
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            started_at = self._generation
+
+        value = loader()
+        if value is None:
+            return None
+
+        entry_tags = frozenset(tags(value) if callable(tags) else tags)
+        with self._lock:
+            if self._cleared_at > started_at or any(
+                self._tag_generations.get(tag, 0) > started_at for tag in entry_tags
+            ):
+                return value
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + ttl, entry_tags)
+            for tag in entry_tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats["evictions"] += 1
+        return value
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying any of the given tags."""
+        with self._lock:
+            self._generation += 1
+            keys = set()
+            for tag in tags:
+                self._tag_generations[tag] = self._generation
+                keys.update(self._tag_index.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self._stats["invalidations"] += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._cleared_at = self._generation
+            self._entries.clear()
+            self._tag_index.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+
+@st.cache_resource(show_spinner=False)
+def get_query_cache() -> QueryCache:
+    return QueryCache(QUERY_CACHE_CONFIG["max_entries"])
+
+
+def get_cache_stats() -> Dict:
+    return get_query_cache().stats()
+
 
 # Utility Functions
 def get_database_connection():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        pool = get_connection_pool()
+        return PooledConnection(pool, pool.acquire())
+    except mysql.connector.Error as error:
+        st.error(f"Database Connection Error: {error}")
+        return None
+
+
+def get_read_connection():
+    """
+    Connection for reporting and dashboard reads, which may be served by a
+    replica up to REPLICA_ROUTER_CONFIG["max_lag"] seconds behind. Anything
+    that writes, or must see a write just made, uses get_database_connection.
+    """
+    try:
+        pool, conn = get_replica_router().acquire(session_last_write())
+        return PooledConnection(pool, conn)
     except mysql.connector.Error as error:
         st.error(f"Database Connection Error: {error}")
         return None
 
 
+def like_prefix(text):
+    """Escape LIKE wildcards in text and turn it into a prefix pattern."""
+    return re.sub(r"([\\%_])", r"\\\1", text) + "%"
+
+
+def fetch_keyset_page(sql, filters, params, order_by, after, limit):
+    """
+    Run one page of a keyset-paginated query.
+
+    Args:
+        sql: SELECT ... FROM ... without WHERE or ORDER BY
+        filters: WHERE conditions to AND together
+        params: Parameters for filters
+        order_by: Unique column tuple the list is sorted by
+        after: Values of order_by for the last row of the previous page, or None
+        limit: Page size
+
+    Returns:
+        (rows, next_after) where next_after is None on the last page, or
+        None if the query failed.
+    """
+    conditions = list(filters)
+    params = list(params)
+    if after is not None:
+        # (a, b) > (x, y) spelled out so MySQL can range-scan the index
+        clauses = []
+        for i, column in enumerate(order_by):
+            equal = [f"{previous} = %s" for previous in order_by[:i]]
+            clauses.append("(" + " AND ".join(equal + [f"{column} > %s"]) + ")")
+            params.extend(after[: i + 1])
+        conditions.append("(" + " OR ".join(clauses) + ")")
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += f" ORDER BY {', '.join(order_by)} LIMIT %s"
+    params.append(limit + 1)
+
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error fetching list: {error}")
+        return None
+    finally:
+        conn.close()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, tuple(rows[-1][column] for column in order_by)
+
+
 def hash_password(password):
     return hashlib.sha256(password.encode()).hexdigest()
 
@@ -32,18 +1146,18 @@ def validate_email(email):
 
 
 # Authentication Functions
+STAFF_LOGIN_SQL = "SELECT Staff_ID, Username, Role FROM Staff WHERE Username = %s AND Password = %s AND Role = %s"
+
+
 def check_staff_login(username, password, role):
     conn = get_database_connection()
     if not conn:
         return False, None
 
     try:
-        cursor = conn.cursor(dictionary=True)
+        cursor = conn.prepared(STAFF_LOGIN_SQL, dictionary=True)
         hashed_password = hash_password(password)
-        cursor.execute(
-            "SELECT Staff_ID, Username, Role FROM Staff WHERE Username = %s AND Password = %s AND Role = %s",
-            (username, hashed_password, role),
-        )
+        cursor.execute((username, hashed_password, role))
         result = cursor.fetchone()
         return bool(result), result
     except mysql.connector.Error as error:
@@ -57,26 +1171,14 @@ def register_new_user(username, password, email):
     if not validate_email(email):
         st.error("Invalid email format")
         return
-    conn = get_database_connection()
-    if not conn:
-        return
-    try:
-        cursor = conn.cursor()
-        hashed_password = hash_password(password)
-        cursor.execute(
-            "INSERT INTO Customers (Cust_Name, Email) VALUES (%s, %s)",
-            (username, email),
-        )
-        conn.commit()
+    # Goes through the identity keys so a guest who registers and later
+    # books by email is the same customer
+    if get_or_create_customer(username, email=email) is not None:
         st.success("User registered successfully!")
-    except mysql.connector.Error as error:
-        st.error(f"Error: {error}")
-    finally:
-        conn.close()
 
 # Manager portal
 def get_active_tables_count():
-    conn = get_database_connection()
+    conn = get_read_connection()
     if not conn:
         return 0
     try:
@@ -90,7 +1192,7 @@ def get_active_tables_count():
         conn.close()
 
 def get_open_orders_count():
-    conn = get_database_connection()
+    conn = get_read_connection()
     if not conn:
         return 0
     try:
@@ -103,8 +1205,84 @@ def get_open_orders_count():
     finally:
         conn.close()
 
+def get_dashboard_snapshot(ttl: Optional[float] = None) -> Optional[Dict]:
+    """
+    Fetch the manager dashboard counts and table list in one query.
+
+    Table rows come back as a JSON array alongside the counts. Low-stock
+    alerts are served by get_low_stock_alerts() instead.
+    The result is shared through the query cache for `ttl` seconds
+    (QUERY_CACHE_CONFIG["dashboard_ttl"] by default, 0 to always refetch).
+
+    Returns:
+        Dict with active_tables, total_tables, open_orders, tables,
+        query_ms (latency of the fetch that produced it) and fetched_at, or
+        None on error.
+    """
+    if ttl is None:
+        ttl = QUERY_CACHE_CONFIG["dashboard_ttl"]
+    if ttl <= 0:
+        return _fetch_dashboard_snapshot()
+    return get_query_cache().get_or_load(
+        ("dashboard_snapshot",), _fetch_dashboard_snapshot, ttl=ttl, tags=("tables",)
+    )
+
+
+def _fetch_dashboard_snapshot():
+    conn = get_read_connection()
+    if not conn:
+        return None
+    try:
+        started = time.perf_counter()
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT
+                (SELECT COUNT(*) FROM Tables WHERE table_status = 'Occupied') AS Active_Tables,
+                (SELECT COUNT(*) FROM Tables) AS Total_Tables,
+                (SELECT COUNT(*) FROM Orders WHERE Order_Status != 'Completed') AS Open_Orders,
+                (SELECT JSON_ARRAYAGG(JSON_OBJECT(
+                    'Table_Id', Table_Id, 'Capacity', Capacity,
+                    'table_status', table_status, 'Current_Order_ID', Current_Order_ID))
+                 FROM Tables) AS Tables_Json
+        """
+        )
+        row = cursor.fetchone()
+        query_ms = (time.perf_counter() - started) * 1000
+
+        tables = json.loads(row["Tables_Json"] or "[]")
+        tables.sort(key=lambda t: t["Table_Id"])
+        return {
+            "active_tables": row["Active_Tables"],
+            "total_tables": row["Total_Tables"],
+            "open_orders": row["Open_Orders"],
+            "tables": tables,
+            "query_ms": query_ms,
+            "fetched_at": datetime.now(),
+        }
+    except mysql.connector.Error as error:
+        st.error(f"Error loading dashboard: {error}")
+        return None
+    finally:
+        conn.close()
+
 
 # Staff Management Functions
+def get_staff_id(username):
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Staff_ID FROM Staff WHERE Username = %s", (username,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    except mysql.connector.Error as error:
+        st.error(f"Error looking up staff member: {error}")
+        return None
+    finally:
+        conn.close()
+
 def get_all_staff():
     conn = get_database_connection()
     if not conn:
@@ -119,6 +1297,21 @@ def get_all_staff():
     finally:
         conn.close()
 
+def get_staff_page(after=None, name_prefix=None, role=None, limit=None):
+    """One page of staff sorted by username, filtered on the server."""
+    filters, params = [], []
+    if name_prefix:
+        filters.append("Username LIKE %s")
+        params.append(like_prefix(name_prefix))
+    if role:
+        filters.append("Role = %s")
+        params.append(role)
+    page = fetch_keyset_page(
+        "SELECT Staff_ID, Username, Role, Name, Email, Phone, Active FROM Staff",
+        filters, params, ("Username",), after, limit or LIST_CONFIG["page_size"],
+    )
+    return page if page is not None else ([], None)
+
 def update_staff_member(staff_id, username, role, active):
     conn = get_database_connection()
     if not conn:
@@ -157,24 +1350,341 @@ def add_staff_member(username, password, role):
     finally:
         conn.close()
 
-# Report Functions
-def get_sales_report(start_date, end_date):
+# Order History Archive
+# Closed orders (with their items and payments) and past reservations move to
+# twin *_Archive tables once they are older than the retention window, which
+# keeps the tables the live screens query small. Queries that may reach
+# archived history are HistoryQuery objects, run through history_sql().
+ARCHIVE_TABLES = {
+    "Orders": "Orders_Archive",
+    "Order_Items": "Order_Items_Archive",
+    "Payment": "Payment_Archive",
+    "Reservation": "Reservation_Archive",
+}
+HOT_TABLES = {table: table for table in ARCHIVE_TABLES}
+
+# Date column that decides whether a query's range reaches the archive
+ARCHIVE_DATE_COLUMNS = {
+    "Orders": "Order_Time",
+    "Payment": "Created_At",
+    "Reservation": "Date",
+}
+
+
+class HistoryQuery(NamedTuple):
+    """
+    A query over history that may have been archived.
+
+    part names the history tables as {Orders}, {Order_Items}, {Payment} or
+    {Reservation}; sql contains {parts}, which becomes part over the hot
+    tables, or that UNION ALL part over the archive tables when the range
+    needs it. All parameters belong to part. table is the one whose date
+    column (ARCHIVE_DATE_COLUMNS) the range applies to.
+    """
+
+    sql: str
+    part: str
+    table: str = "Orders"
+
+
+def history_sql(conn, query, params, start_date) -> Tuple[str, tuple]:
+    """
+    SQL and parameters for running query from start_date on.
+
+    The archive is only read when it holds rows dated start_date or later,
+    which is one index probe. Plain SQL strings are returned as they are.
+    """
+    if isinstance(query, str):
+        return query, tuple(params)
+    hot = query.part.format_map(HOT_TABLES)
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT EXISTS (SELECT 1 FROM {ARCHIVE_TABLES[query.table]} "
+        f"WHERE {ARCHIVE_DATE_COLUMNS[query.table]} >= %s)",
+        (start_date,),
+    )
+    if not cursor.fetchall()[0][0]:
+        return query.sql.format(parts=hot), tuple(params)
+    archive = query.part.format_map(ARCHIVE_TABLES)
+    return query.sql.format(parts=f"{hot}\n    UNION ALL\n{archive}"), tuple(params) * 2
+
+
+# Each job picks candidates without locking, then locks exactly those rows by
+# primary key and re-checks them, so a batch holds record locks on the rows
+# it moves and nothing else. The move statements run in order with the
+# locked ids as {in_list}; guard is the session variable that makes the
+# delete triggers stand down.
+ARCHIVE_JOBS = {
+    "orders": {
+        "retention": "order_retention_days",
+        "candidates": """
+            SELECT o.Order_ID FROM Orders o
+            WHERE o.Order_ID > %s AND o.Order_Time < %s
+            AND o.Order_Status IN ('Completed', 'Cancelled')
+            AND NOT EXISTS (SELECT 1 FROM Tables t WHERE t.Current_Order_ID = o.Order_ID)
+            AND NOT EXISTS (
+                SELECT 1 FROM Stock_Depletions d
+                WHERE d.Order_ID = o.Order_ID AND d.Depleted_At IS NULL
+            )
+            ORDER BY o.Order_ID
+            LIMIT %s
+        """,
+        "lock": """
+            SELECT Order_ID FROM Orders
+            WHERE Order_ID IN ({in_list}) AND Order_Status IN ('Completed', 'Cancelled')
+            ORDER BY Order_ID
+            FOR UPDATE
+        """,
+        "move": [
+            "INSERT INTO Orders_Archive SELECT * FROM Orders WHERE Order_ID IN ({in_list})",
+            "INSERT INTO Order_Items_Archive SELECT * FROM Order_Items WHERE Order_ID IN ({in_list})",
+            "INSERT INTO Payment_Archive SELECT * FROM Payment WHERE Order_Id IN ({in_list})",
+            "DELETE FROM Payment WHERE Order_Id IN ({in_list})",
+            "DELETE FROM Order_Items WHERE Order_ID IN ({in_list})",
+            "DELETE FROM Stock_Depletions WHERE Order_ID IN ({in_list})",
+            "DELETE FROM Orders WHERE Order_ID IN ({in_list})",
+        ],
+        "guard": "@bulk_order_items",
+    },
+    "reservations": {
+        "retention": "reservation_retention_days",
+        "candidates": """
+            SELECT Reserve_Id FROM Reservation
+            WHERE Reserve_Id > %s AND Date < %s
+            ORDER BY Reserve_Id
+            LIMIT %s
+        """,
+        "lock": """
+            SELECT Reserve_Id FROM Reservation
+            WHERE Reserve_Id IN ({in_list})
+            ORDER BY Reserve_Id
+            FOR UPDATE
+        """,
+        "move": [
+            "INSERT INTO Reservation_Archive SELECT * FROM Reservation WHERE Reserve_Id IN ({in_list})",
+            "DELETE FROM Reservation WHERE Reserve_Id IN ({in_list})",
+        ],
+        "guard": "@archiving",
+    },
+}
+
+
+def archive_history(batch_size=None, max_batches=None) -> Optional[Dict]:
+    """
+    Move closed orders and past reservations older than their retention
+    window (ARCHIVE_CONFIG) into the archive tables.
+
+    Each batch of batch_size rows is moved in its own short transaction and
+    the job pauses between batches, so live writes are never held up for
+    long. Safe to stop and rerun at any point.
+
+    Args:
+        batch_size: Rows per transaction (ARCHIVE_CONFIG["batch_size"] by default)
+        max_batches: Stop each job after this many batches (default: run until done)
+
+    Returns:
+        Dict of job name -> rows moved, or None on error.
+    """
+    batch_size = batch_size or ARCHIVE_CONFIG["batch_size"]
+    today = datetime.now().date()
+    moved = {}
+    for name, job in ARCHIVE_JOBS.items():
+        cutoff = today - timedelta(days=ARCHIVE_CONFIG[job["retention"]])
+        count = _run_archive_job(name, job, cutoff, batch_size, max_batches)
+        if count is None:
+            return None
+        moved[name] = count
+    return moved
+
+
+def _run_archive_job(name, job, cutoff, batch_size, max_batches):
+    conn = get_database_connection()
+    if not conn:
+        return None
+    moved, after_id, batches = 0, 0, 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SET {job['guard']} = 1")
+        try:
+            while max_batches is None or batches < max_batches:
+                cursor.execute(job["candidates"], (after_id, cutoff, batch_size))
+                candidates = [row[0] for row in cursor.fetchall()]
+                if not candidates:
+                    break
+                conn.rollback()  # end the read snapshot before locking
+
+                conn.start_transaction()
+                cursor.execute(in_list_sql(job["lock"], len(candidates)), candidates)
+                ids = [row[0] for row in cursor.fetchall()]
+                if ids:
+                    for statement in job["move"]:
+                        cursor.execute(in_list_sql(statement, len(ids)), ids)
+                conn.commit()
+
+                moved += len(ids)
+                after_id = candidates[-1]
+                batches += 1
+                if len(candidates) < batch_size:
+                    break
+                time.sleep(ARCHIVE_CONFIG["pause"])
+        finally:
+            clear_session_flag(cursor, job["guard"])
+        return moved
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error archiving {name} after {moved} rows: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+# Sales Rollup Functions
+SALES_ROLLUP_REBUILD = HistoryQuery(
+    sql="""
+        INSERT INTO Daily_Sales_Rollup (Sale_Date, Category, Staff_ID, Order_Count, Items_Sold, Revenue)
+        SELECT Sale_Date, Category, Staff_ID, SUM(Order_Count), SUM(Items_Sold), SUM(Revenue)
+        FROM ({parts}) parts
+        GROUP BY Sale_Date, Category, Staff_ID
+    """,
+    part="""
+        SELECT DATE(o.Order_Time) AS Sale_Date, mi.Category, o.Staff_ID,
+               COUNT(DISTINCT o.Order_ID) AS Order_Count, SUM(oi.Quantity) AS Items_Sold,
+               SUM(oi.Quantity * mi.Price) AS Revenue
+        FROM {Orders} o
+        JOIN {Order_Items} oi ON o.Order_ID = oi.Order_ID
+        JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+        WHERE o.Order_Status = 'Completed'
+        AND o.Order_Time >= %s AND o.Order_Time < %s
+        GROUP BY DATE(o.Order_Time), mi.Category, o.Staff_ID
+    """,
+)
+
+ORDER_ROLLUP_REBUILD = HistoryQuery(
+    sql="""
+        INSERT INTO Daily_Order_Rollup (Sale_Date, Staff_ID, Order_Count, Revenue)
+        SELECT Sale_Date, Staff_ID, SUM(Order_Count), SUM(Revenue)
+        FROM ({parts}) parts
+        GROUP BY Sale_Date, Staff_ID
+    """,
+    part="""
+        SELECT DATE(o.Order_Time) AS Sale_Date, o.Staff_ID,
+               COUNT(DISTINCT o.Order_ID) AS Order_Count,
+               COALESCE(SUM(oi.Quantity * mi.Price), 0) AS Revenue
+        FROM {Orders} o
+        LEFT JOIN {Order_Items} oi ON o.Order_ID = oi.Order_ID
+        LEFT JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+        WHERE o.Order_Status = 'Completed'
+        AND o.Order_Time >= %s AND o.Order_Time < %s
+        GROUP BY DATE(o.Order_Time), o.Staff_ID
+    """,
+)
+
+
+def rebuild_sales_rollup(start_date, end_date) -> Optional[int]:
+    """
+    Recompute Daily_Sales_Rollup and Daily_Order_Rollup for a date range.
+
+    The range is replaced in one transaction, so reports never see it half
+    rebuilt. Order_Time is filtered by a half-open range so idx_order_date
+    can be used. Archived orders are included when the range reaches them.
+
+    Returns:
+        Number of rollup rows written, or None on error.
+    """
+    conn = get_database_connection()
+    if not conn:
+        return None
+    range_start, range_end = start_date, end_date + timedelta(days=1)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM Daily_Sales_Rollup WHERE Sale_Date BETWEEN %s AND %s",
+            (start_date, end_date),
+        )
+        cursor.execute(
+            "DELETE FROM Daily_Order_Rollup WHERE Sale_Date BETWEEN %s AND %s",
+            (start_date, end_date),
+        )
+        cursor.execute(*history_sql(conn, SALES_ROLLUP_REBUILD, (range_start, range_end), range_start))
+        rows_written = cursor.rowcount
+        cursor.execute(*history_sql(conn, ORDER_ROLLUP_REBUILD, (range_start, range_end), range_start))
+        rows_written += cursor.rowcount
+        conn.commit()
+        return rows_written
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error rebuilding sales rollup: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def backfill_sales_rollup(chunk_days: int = 31) -> Optional[int]:
+    """
+    Rebuild the sales rollups for the whole order history.
+
+    The history is processed in chunks of chunk_days so each transaction
+    stays short.
+
+    Returns:
+        Total number of rollup rows written, or None on error.
+    """
     conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            SELECT MIN(First), MAX(Last) FROM (
+                SELECT MIN(Order_Time) AS First, MAX(Order_Time) AS Last
+                FROM Orders WHERE Order_Status = 'Completed'
+                UNION ALL
+                SELECT MIN(Order_Time), MAX(Order_Time)
+                FROM Orders_Archive WHERE Order_Status = 'Completed'
+            ) history
+        """
+        )
+        first, last = cursor.fetchone()
+    except mysql.connector.Error as error:
+        st.error(f"Error reading order history: {error}")
+        return None
+    finally:
+        conn.close()
+
+    if first is None:
+        return 0
+    total = 0
+    chunk_start, last_date = first.date(), last.date()
+    while chunk_start <= last_date:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), last_date)
+        written = rebuild_sales_rollup(chunk_start, chunk_end)
+        if written is None:
+            return None
+        total += written
+        chunk_start = chunk_end + timedelta(days=1)
+    return total
+
+
+# Report Functions
+SALES_REPORT_SQL = """
+    SELECT 
+        Sale_Date as Date,
+        SUM(Order_Count) as Total_Orders,
+        SUM(Revenue) as Revenue
+    FROM Daily_Order_Rollup
+    WHERE Sale_Date BETWEEN %s AND %s
+    GROUP BY Sale_Date
+    ORDER BY Date
+"""
+
+def get_sales_report(start_date, end_date):
+    conn = get_read_connection()
     if not conn:
         return None
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                DATE(o.Order_Time) as Date,
-                COUNT(DISTINCT o.Order_ID) as Total_Orders,
-                SUM(oi.Price * oi.Quantity) as Revenue
-            FROM Orders o
-            JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
-            WHERE DATE(o.Order_Time) BETWEEN %s AND %s
-            GROUP BY DATE(o.Order_Time)
-            ORDER BY Date
-        """, (start_date, end_date))
+        cursor.execute(SALES_REPORT_SQL, (start_date, end_date))
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error generating sales report: {error}")
@@ -182,26 +1692,43 @@ def get_sales_report(start_date, end_date):
     finally:
         conn.close()
 
+INVENTORY_REPORT_SQL = HistoryQuery(
+    sql="""
+        SELECT 
+            i.Item_Name,
+            i.Current_Stock,
+            i.Reorder_Level,
+            i.Unit,
+            COALESCE(u.Times_Ordered, 0) AS Times_Ordered,
+            COALESCE(u.Quantity_Used, 0) AS Quantity_Used
+        FROM Inventory i
+        LEFT JOIN (
+            SELECT Inventory_Id, SUM(Times_Ordered) AS Times_Ordered, SUM(Quantity_Used) AS Quantity_Used
+            FROM ({parts}) parts
+            GROUP BY Inventory_Id
+        ) u ON u.Inventory_Id = i.Inventory_Id
+        ORDER BY Quantity_Used DESC, i.Item_Name
+    """,
+    part="""
+        SELECT 
+            r.Inventory_Id,
+            COUNT(DISTINCT oi.Order_ID) AS Times_Ordered,
+            SUM(oi.Quantity * r.Stock_Quantity) AS Quantity_Used
+        FROM {Orders} o
+        JOIN {Order_Items} oi ON oi.Order_ID = o.Order_ID
+        JOIN Recipe_Items r ON r.Item_Id = oi.Item_ID
+        WHERE o.Order_Time >= %s AND o.Order_Time < %s + INTERVAL 1 DAY
+        GROUP BY r.Inventory_Id
+    """,
+)
+
 def get_inventory_report(start_date, end_date):
-    conn = get_database_connection()
+    conn = get_read_connection()
     if not conn:
         return None
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                i.Item_Name,
-                i.Current_Stock,
-                i.Reorder_Level,
-                COUNT(oi.Order_ID) as Times_Ordered
-            FROM Inventory i
-            LEFT JOIN Menu_Items mi ON i.Item_Name = mi.Item_Name
-            LEFT JOIN Order_Items oi ON mi.Item_Id = oi.Item_ID
-            LEFT JOIN Orders o ON oi.Order_ID = o.Order_ID
-            AND DATE(o.Order_Time) BETWEEN %s AND %s
-            GROUP BY i.Item_Name
-            ORDER BY Times_Ordered DESC
-        """, (start_date, end_date))
+        cursor.execute(*history_sql(conn, INVENTORY_REPORT_SQL, (start_date, end_date), start_date))
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error generating inventory report: {error}")
@@ -209,25 +1736,26 @@ def get_inventory_report(start_date, end_date):
     finally:
         conn.close()
 
+STAFF_PERFORMANCE_SQL = """
+    SELECT 
+        s.Username,
+        s.Role,
+        COALESCE(SUM(r.Order_Count), 0) as Orders_Handled,
+        SUM(r.Revenue) as Total_Sales
+    FROM Staff s
+    LEFT JOIN Daily_Order_Rollup r ON s.Staff_ID = r.Staff_ID
+    AND r.Sale_Date BETWEEN %s AND %s
+    GROUP BY s.Staff_ID
+    ORDER BY Total_Sales DESC
+"""
+
 def get_staff_performance(start_date, end_date):
-    conn = get_database_connection()
+    conn = get_read_connection()
     if not conn:
         return None
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                s.Username,
-                s.Role,
-                COUNT(o.Order_ID) as Orders_Handled,
-                SUM(oi.Price * oi.Quantity) as Total_Sales
-            FROM Staff s
-            LEFT JOIN Orders o ON s.Staff_ID = o.Staff_ID
-            AND DATE(o.Order_Time) BETWEEN %s AND %s
-            LEFT JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
-            GROUP BY s.Staff_ID
-            ORDER BY Total_Sales DESC
-        """, (start_date, end_date))
+        cursor.execute(STAFF_PERFORMANCE_SQL, (start_date, end_date))
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error generating staff performance report: {error}")
@@ -235,35 +1763,760 @@ def get_staff_performance(start_date, end_date):
     finally:
         conn.close()
 
+REVENUE_ANALYSIS_SQL = """
+    SELECT 
+        Sale_Date as Date,
+        Category,
+        SUM(Revenue) as Revenue
+    FROM Daily_Sales_Rollup
+    WHERE Sale_Date BETWEEN %s AND %s
+    GROUP BY Sale_Date, Category
+    ORDER BY Date, Category
+"""
+
 def get_revenue_analysis(start_date, end_date):
-    conn = get_database_connection()
+    conn = get_read_connection()
     if not conn:
         return None
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("""
-            SELECT 
-                DATE(o.Order_Time) as Date,
-                mi.Category,
-                SUM(oi.Price * oi.Quantity) as Revenue
-            FROM Orders o
-            JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
-            JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-            WHERE DATE(o.Order_Time) BETWEEN %s AND %s
-            GROUP BY DATE(o.Order_Time), mi.Category
-            ORDER BY Date, Category
-        """, (start_date, end_date))
+        cursor.execute(REVENUE_ANALYSIS_SQL, (start_date, end_date))
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error generating revenue analysis: {error}")
         return None
     finally:
         conn.close()
+
+
+# Report Pack
+# Each report is SQL or a HistoryQuery taking (start_date, end_date)
+REPORT_PACK = {
+    "Sales": SALES_REPORT_SQL,
+    "Revenue Analysis": REVENUE_ANALYSIS_SQL,
+    "Staff Performance": STAFF_PERFORMANCE_SQL,
+    "Inventory": INVENTORY_REPORT_SQL,
+}
+
+
+@st.cache_resource(show_spinner=False)
+def get_report_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(
+        max_workers=REPORT_PACK_CONFIG["max_workers"], thread_name_prefix="report"
+    )
+
+
+class ReportPack:
+    """
+    Runs several report queries concurrently on the shared report executor.
+
+    Each report runs on its own pooled connection with MySQL's
+    max_execution_time set to the timeout, so a runaway report is stopped by
+    the server rather than left holding a worker. cancel() drops queued
+    reports and kills the queries of running ones. Errors are returned with
+    the results, since a worker thread cannot show them on the page.
+    """
+
+    def __init__(self, reports: Dict, start_date, end_date, timeout: Optional[float] = None):
+        self.reports = reports
+        self.start_date = start_date
+        self.end_date = end_date
+        self.timeout = timeout if timeout is not None else REPORT_PACK_CONFIG["timeout"]
+        self._futures = {}
+        self._running = {}  # report name -> (pool, server connection id)
+        self._last_write = session_last_write()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def start(self):
+        executor = get_report_executor()
+        for name, report in self.reports.items():
+            self._futures[executor.submit(self._run, name, report)] = name
+        return self
+
+    def _run(self, name, report):
+        if self._cancelled.is_set():
+            raise RuntimeError("Cancelled")
+        # The worker thread has no session, so pass on the caller's last write
+        with pooled_read_connection(self._last_write) as conn:
+            cursor = conn.cursor()
+            cursor.execute("SET SESSION max_execution_time = %s", (int(self.timeout * 1000),))
+            with self._lock:
+                self._running[name] = (conn.pool, conn.connection_id)
+            try:
+                started = time.perf_counter()
+                params = (self.start_date, self.end_date)
+                report_cursor = conn.cursor(dictionary=True)
+                report_cursor.execute(*history_sql(conn, report, params, self.start_date))
+                rows = report_cursor.fetchall()
+                return rows, (time.perf_counter() - started) * 1000
+            finally:
+                with self._lock:
+                    self._running.pop(name, None)
+                cursor.execute("SET SESSION max_execution_time = 0")
+
+    def results(self):
+        """
+        Yield each report's result as soon as it finishes.
+
+        Yields:
+            Dicts with Report, Rows (None on failure), Elapsed_ms and Error.
+        """
+        if not self._futures:
+            self.start()
+        pending = dict(self._futures)
+        try:
+            # Reports start as soon as a worker is free, so allow for queueing
+            waves = math.ceil(len(pending) / REPORT_PACK_CONFIG["max_workers"])
+            for future in as_completed(pending, timeout=self.timeout * waves + 1):
+                name = pending.pop(future)
+                result = {"Report": name, "Rows": None, "Elapsed_ms": None, "Error": None}
+                try:
+                    result["Rows"], result["Elapsed_ms"] = future.result()
+                except Exception as error:
+                    result["Error"] = "Cancelled" if self._cancelled.is_set() else str(error)
+                yield result
+        except FutureTimeoutError:
+            self.cancel()
+            for name in pending.values():
+                yield {"Report": name, "Rows": None, "Elapsed_ms": None, "Error": "Timed out"}
+
+    def cancel(self):
+        self._cancelled.set()
+        for future in self._futures:
+            future.cancel()
+        with self._lock:
+            running = list(self._running.values())
+        # Each query has to be killed on the server it runs on
+        by_pool = {}
+        for pool, connection_id in running:
+            by_pool.setdefault(pool, []).append(connection_id)
+        for pool, connection_ids in by_pool.items():
+            try:
+                conn = PooledConnection(pool, pool.acquire())
+            except mysql.connector.Error:
+                continue
+            try:
+                cursor = conn.cursor()
+                for connection_id in connection_ids:
+                    try:
+                        cursor.execute("KILL QUERY %s", (connection_id,))
+                    except mysql.connector.Error:
+                        pass  # the query finished in the meantime
+            finally:
+                conn.close()
+
+
+# Streaming Export
+# Every export takes (start_date, end_date) as inclusive dates; each is SQL or
+# a HistoryQuery
+EXPORTS = {
+    "Sales": SALES_REPORT_SQL,
+    "Revenue Analysis": REVENUE_ANALYSIS_SQL,
+    "Staff Performance": STAFF_PERFORMANCE_SQL,
+    "Inventory": INVENTORY_REPORT_SQL,
+    "Orders": HistoryQuery(
+        sql="{parts}\n    ORDER BY Order_ID",
+        part="""
+        SELECT * FROM {Orders}
+        WHERE Order_Time >= %s AND Order_Time < %s + INTERVAL 1 DAY
+        """,
+    ),
+    "Order_Items": HistoryQuery(
+        sql="{parts}\n    ORDER BY Order_ID, Item_ID",
+        part="""
+        SELECT oi.* FROM {Order_Items} oi
+        JOIN {Orders} o ON oi.Order_ID = o.Order_ID
+        WHERE o.Order_Time >= %s AND o.Order_Time < %s + INTERVAL 1 DAY
+        """,
+    ),
+    "Payment": HistoryQuery(
+        sql="{parts}\n    ORDER BY Payment_Id",
+        part="""
+        SELECT * FROM {Payment}
+        WHERE Created_At >= %s AND Created_At < %s + INTERVAL 1 DAY
+        """,
+        table="Payment",
+    ),
+}
+
+EXPORT_FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+
+# Chunk writers take the cursor description, whose first field is the column name
+class CsvChunkWriter:
+    def __init__(self, path, description):
+        self._file = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow([column[0] for column in description])
+
+    def write(self, rows):
+        self._writer.writerows(
+            [
+                [
+                    value.decode("utf-8", errors="replace")
+                    if isinstance(value, (bytes, bytearray))
+                    else value
+                    for value in row
+                ]
+                for row in rows
+            ]
+        )
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetChunkWriter:
+    """Writes each chunk as a Parquet row group. Needs the optional pyarrow package."""
+
+    def __init__(self, path, description):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow: pip install pyarrow")
+        self._pa = pa
+        self._schema = pa.schema([(column[0], self._arrow_type(column[1])) for column in description])
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _arrow_type(self, type_code):
+        pa = self._pa
+        name = mysql.connector.FieldType.get_info(type_code)
+        if name in ("TINY", "SHORT", "INT24", "LONG", "LONGLONG", "YEAR"):
+            return pa.int64()
+        if name in ("FLOAT", "DOUBLE"):
+            return pa.float64()
+        if name in ("DECIMAL", "NEWDECIMAL"):
+            return pa.decimal128(38, 10)
+        if name in ("DATE", "NEWDATE"):
+            return pa.date32()
+        if name in ("DATETIME", "TIMESTAMP"):
+            return pa.timestamp("us")
+        if name == "TIME":
+            return pa.duration("us")
+        return pa.string()
+
+    @staticmethod
+    def _as_text(value):
+        if value is None or isinstance(value, str):
+            return value
+        if isinstance(value, (bytes, bytearray)):
+            return value.decode("utf-8", errors="replace")
+        return str(value)
+
+    def write(self, rows):
+        arrays = []
+        for field, values in zip(self._schema, zip(*rows)):
+            if field.type == self._pa.string():
+                values = [self._as_text(value) for value in values]
+            arrays.append(self._pa.array(values, type=field.type))
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def export_query(name, start_date, end_date, path, file_format="csv", chunk_size=None) -> Optional[Dict]:
+    """
+    Stream a report or table dump from EXPORTS to a CSV or Parquet file.
+
+    Rows are read with an unbuffered cursor in chunks of chunk_size and
+    written as they arrive, so memory use does not grow with the date range.
+
+    Args:
+        name: Key of EXPORTS
+        start_date: First date to include
+        end_date: Last date to include
+        path: File to write
+        file_format: 'csv' or 'parquet'
+        chunk_size: Rows per fetchmany call (EXPORT_CONFIG["chunk_size"] by default)
+
+    Returns:
+        Dict with Path, Rows, Seconds and Rows_Per_Second, or None on error.
+    """
+    chunk_size = chunk_size or EXPORT_CONFIG["chunk_size"]
+    writer_class = CsvChunkWriter if file_format == "csv" else ParquetChunkWriter
+    conn = get_read_connection()
+    if not conn:
+        return None
+    started = time.perf_counter()
+    rows_written = 0
+    try:
+        sql, params = history_sql(conn, EXPORTS[name], (start_date, end_date), start_date)
+        # Unbuffered: rows stay on the server until fetched
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(sql, params)
+        writer = writer_class(path, cursor.description)
+        try:
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                writer.write(rows)
+                rows_written += len(rows)
+        finally:
+            writer.close()
+    except (mysql.connector.Error, OSError, RuntimeError) as error:
+        st.error(f"Error exporting {name}: {error}")
+        return None
+    finally:
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    return {
+        "Path": str(path),
+        "Rows": rows_written,
+        "Seconds": seconds,
+        "Rows_Per_Second": rows_written / seconds if seconds else 0.0,
+    }
+
+
+# Analytics Snapshot
+# A local columnar copy of the order history for manager analytics. Each table
+# is a directory of one .npy file per column (text as fixed-width unicode),
+# memory-mapped by readers; manifest.json names the current directory of each
+# table and its high-water mark, and is replaced atomically after a refresh.
+# Tables with a high_water column are refreshed incrementally: rows changed
+# since the mark replace their older copies by key. A table that follows
+# another is reloaded for the keys that changed in it (an order's items are
+# re-read whenever the order's Updated_At moves, which item changes do
+# through the total triggers). The rest are small and reloaded whole.
+SNAPSHOT_TABLES = {
+    "Orders": {
+        "key": "Order_ID",
+        "high_water": "Updated_At",
+        "columns": {
+            "Order_ID": "i8",
+            "Table_ID": "i8",
+            "Staff_ID": "i8",
+            "Order_Status": "U10",
+            "Order_Time": "M8[s]",
+            "Total_Amount": "f8",
+            "Updated_At": "M8[us]",
+        },
+        "query": HistoryQuery(
+            sql="{parts}",
+            part="""
+            SELECT Order_ID, Table_ID, Staff_ID, Order_Status, Order_Time, Total_Amount, Updated_At
+            FROM {Orders} WHERE Updated_At >= %s
+            """,
+        ),
+    },
+    "Order_Items": {
+        "key": "Order_ID",
+        "follows": "Orders",
+        "columns": {"Order_ID": "i8", "Item_ID": "i8", "Quantity": "i8"},
+        "query": HistoryQuery(
+            sql="{parts}",
+            part="""
+            SELECT oi.Order_ID, oi.Item_ID, oi.Quantity
+            FROM {Order_Items} oi JOIN {Orders} o ON o.Order_ID = oi.Order_ID
+            WHERE o.Updated_At >= %s
+            """,
+        ),
+    },
+    "Payment": {
+        "key": "Payment_Id",
+        "high_water": "Updated_At",
+        "columns": {
+            "Payment_Id": "i8",
+            "Order_Id": "i8",
+            "Payment_Method": "U50",
+            "Payment_Status": "U10",
+            "Total_Amount": "f8",
+            "Created_At": "M8[s]",
+            "Updated_At": "M8[s]",
+        },
+        "query": HistoryQuery(
+            sql="{parts}",
+            part="""
+            SELECT Payment_Id, Order_Id, Payment_Method, Payment_Status, Total_Amount, Created_At, Updated_At
+            FROM {Payment} WHERE Updated_At >= %s
+            """,
+            table="Payment",
+        ),
+    },
+    "Menu_Items": {
+        "key": "Item_Id",
+        "columns": {"Item_Id": "i8", "Item_Name": "U50", "Category": "U30", "Price": "f8"},
+        "query": "SELECT Item_Id, Item_Name, Category, Price FROM Menu_Items",
+    },
+    "Staff": {
+        "key": "Staff_ID",
+        "columns": {"Staff_ID": "i8", "Username": "U50", "Role": "U10"},
+        "query": "SELECT Staff_ID, Username, Role FROM Staff",
+    },
+}
+
+SNAPSHOT_EPOCH = datetime(1970, 1, 1)
+
+
+def _snapshot_columns(rows, columns: Dict) -> Dict[str, np.ndarray]:
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    arrays = {}
+    for (name, dtype), column in zip(columns.items(), values):
+        if dtype.startswith("U"):
+            column = ["" if value is None else value for value in column]
+        arrays[name] = np.array(column, dtype=dtype)
+    return arrays
+
+
+def _sorted_by_key(table: Dict[str, np.ndarray], key: str) -> Dict[str, np.ndarray]:
+    order = np.argsort(table[key], kind="stable")
+    return {name: column[order] for name, column in table.items()}
+
+
+class AnalyticsSnapshot:
+    """
+    Columnar snapshot store in `directory`; see SNAPSHOT_TABLES.
+
+    refresh() extracts what changed since the last refresh (everything the
+    first time, archived history included) in one consistent read and
+    writes only the tables that changed. tables() memory-maps the current
+    columns, so reports over the snapshot never query MySQL.
+    """
+
+    def __init__(self, directory: str, overlap: float = 60.0):
+        self.directory = directory
+        self.overlap = overlap
+        self._manifest = None
+        self._manifest_mtime = None
+        self._mapped = {}  # table directory -> {column: memmap}
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def _manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def manifest(self) -> Optional[Dict]:
+        """The current manifest, re-read when the file has been replaced."""
+        try:
+            mtime = os.stat(self._manifest_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if mtime != self._manifest_mtime:
+                with open(self._manifest_path) as manifest_file:
+                    self._manifest = json.load(manifest_file)
+                self._manifest_mtime = mtime
+            return self._manifest
+
+    def _load(self, table_dir, columns, mmap_mode="r"):
+        path = os.path.join(self.directory, table_dir)
+        return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in columns}
+
+    def tables(self, *names) -> Optional[List[Dict[str, np.ndarray]]]:
+        """Memory-mapped columns of each named table, or None if there is no snapshot yet."""
+        manifest = self.manifest()
+        if manifest is None or any(name not in manifest["tables"] for name in names):
+            return None
+        result = []
+        with self._lock:
+            for name in names:
+                table_dir = manifest["tables"][name]["dir"]
+                if table_dir not in self._mapped:
+                    self._mapped[table_dir] = self._load(table_dir, SNAPSHOT_TABLES[name]["columns"])
+                result.append(self._mapped[table_dir])
+        return result
+
+    def freshness(self) -> Optional[Dict]:
+        """
+        Returns:
+            Dict with refreshed_at, source_high_water (newest order change in
+            the snapshot), age_seconds and rows per table, or None if there
+            is no snapshot yet.
+        """
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        refreshed_at = datetime.fromisoformat(manifest["refreshed_at"])
+        high_water = manifest["tables"]["Orders"]["high_water"]
+        return {
+            "refreshed_at": refreshed_at,
+            "source_high_water": datetime.fromisoformat(high_water) if high_water else None,
+            "age_seconds": (datetime.now() - refreshed_at).total_seconds(),
+            "rows": {name: table["rows"] for name, table in manifest["tables"].items()},
+        }
+
+    def refresh(self, full: bool = False) -> Optional[Dict]:
+        """
+        Bring the snapshot up to date.
+
+        Args:
+            full: Rebuild every table from scratch
+
+        Returns:
+            Dict of table -> rows extracted, or None on error.
+        """
+        with self._refresh_lock:
+            current = self.manifest()
+            mapped_dirs = {table["dir"] for table in current["tables"].values()} if current else set()
+            old_tables = current["tables"] if current and not full else {}
+            deltas = self._extract(old_tables)
+            if deltas is None:
+                return None
+
+            tables = {}
+            for name, spec in SNAPSHOT_TABLES.items():
+                delta = deltas[name]
+                old = old_tables.get(name)
+                merged = self._merge(name, spec, old, delta, deltas)
+                if merged is None:
+                    tables[name] = old
+                    continue
+                high_water = old["high_water"] if old else None
+                if spec.get("high_water") and len(delta[spec["high_water"]]):
+                    newest = delta[spec["high_water"]].max().astype(datetime)
+                    if high_water is None or newest > datetime.fromisoformat(high_water):
+                        high_water = newest.isoformat()
+                tables[name] = {
+                    "dir": self._write(name, merged),
+                    "rows": int(len(merged[spec["key"]])),
+                    "high_water": high_water,
+                }
+
+            self._write_manifest({"refreshed_at": datetime.now().isoformat(), "tables": tables})
+            self._prune({table["dir"] for table in tables.values()} | mapped_dirs)
+            return {name: int(len(delta[SNAPSHOT_TABLES[name]["key"]])) for name, delta in deltas.items()}
+
+    def _extract(self, old_tables):
+        conn = get_read_connection()
+        if not conn:
+            return None
+        try:
+            # One consistent read, so orders and their items match
+            conn.start_transaction(consistent_snapshot=True, readonly=True)
+            deltas = {}
+            for name, spec in SNAPSHOT_TABLES.items():
+                source = spec.get("follows", name)
+                params = ()
+                if isinstance(spec["query"], HistoryQuery):
+                    high_water = old_tables.get(source, {}).get("high_water")
+                    since = (
+                        datetime.fromisoformat(high_water) - timedelta(seconds=self.overlap)
+                        if high_water
+                        else SNAPSHOT_EPOCH
+                    )
+                    params = (since,)
+                cursor = conn.cursor()
+                cursor.execute(*history_sql(conn, spec["query"], params, params[0] if params else None))
+                deltas[name] = _snapshot_columns(cursor.fetchall(), spec["columns"])
+            conn.commit()
+            return deltas
+        except mysql.connector.Error as error:
+            conn.rollback()
+            snapshot_logger.warning("analytics snapshot extract failed: %s", error)
+            return None
+        finally:
+            conn.close()
+
+    def _merge(self, name, spec, old, delta, deltas):
+        """The table's new columns, or None if nothing changed."""
+        key = spec["key"]
+        incremental = isinstance(spec["query"], HistoryQuery)
+        if old is None:
+            return _sorted_by_key(delta, key)
+        current = self._load(old["dir"], spec["columns"], mmap_mode=None)
+        if not incremental:
+            delta = _sorted_by_key(delta, key)
+            if all(np.array_equal(current[column], delta[column]) for column in spec["columns"]):
+                return None
+            return delta
+        # A following table shares its key with the table it follows
+        replaced = deltas[spec.get("follows", name)][key]
+        if not len(replaced):
+            return None
+        keep = ~np.isin(current[key], replaced)
+        return _sorted_by_key(
+            {column: np.concatenate([current[column][keep], delta[column]]) for column in spec["columns"]},
+            key,
+        )
+
+    def _write(self, name, table):
+        table_dir = f"{name}.{uuid.uuid4().hex[:12]}"
+        path = os.path.join(self.directory, table_dir)
+        os.makedirs(path)
+        for column, values in table.items():
+            np.save(os.path.join(path, f"{column}.npy"), values)
+        return table_dir
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self._manifest_path + ".tmp"
+        with open(temporary, "w") as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+        os.replace(temporary, self._manifest_path)
+
+    def _prune(self, keep):
+        """Delete table directories from before the previous refresh; readers may still map those."""
+        for entry in os.listdir(self.directory):
+            path = os.path.join(self.directory, entry)
+            if os.path.isdir(path) and entry not in keep:
+                for column_file in os.listdir(path):
+                    os.remove(os.path.join(path, column_file))
+                os.rmdir(path)
+        with self._lock:
+            for table_dir in list(self._mapped):
+                if table_dir not in keep:
+                    del self._mapped[table_dir]
+
+
+snapshot_logger = logging.getLogger("restaurant.analytics_snapshot")
+
+
+class SnapshotRefresher:
+    """Background worker that refreshes the analytics snapshot every interval seconds."""
+
+    def __init__(self, snapshot: AnalyticsSnapshot, interval: float):
+        self._snapshot = snapshot
+        self._interval = interval
+        self._thread = threading.Thread(target=self._run, name="analytics-snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            if self._snapshot.refresh() is None:
+                snapshot_logger.warning("analytics snapshot refresh failed; retrying later")
+            time.sleep(self._interval)
+
+
+@st.cache_resource(show_spinner=False)
+def get_analytics_snapshot() -> AnalyticsSnapshot:
+    return AnalyticsSnapshot(SNAPSHOT_CONFIG["directory"], SNAPSHOT_CONFIG["overlap"])
+
+
+@st.cache_resource(show_spinner=False)
+def get_snapshot_refresher() -> SnapshotRefresher:
+    return SnapshotRefresher(get_analytics_snapshot(), SNAPSHOT_CONFIG["refresh_interval"])
+
+
+def _completed_order_lines(start_date, end_date):
+    """
+    Order lines of orders completed between the dates, from the snapshot.
+
+    Returns:
+        (orders, completed, lines) or None without a snapshot: the Orders
+        columns, a mask of the completed orders in range, and per line of
+        those orders the order's position in Orders, the Category and the
+        Revenue (quantity x current price, as in the sales rollups).
+    """
+    tables = get_analytics_snapshot().tables("Orders", "Order_Items", "Menu_Items")
+    if tables is None:
+        return None
+    orders, items, menu = tables
+    days = orders["Order_Time"].astype("M8[D]")
+    completed = (
+        (orders["Order_Status"] == "Completed")
+        & (days >= np.datetime64(start_date, "D"))
+        & (days <= np.datetime64(end_date, "D"))
+    )
+    if not len(orders["Order_ID"]) or not len(menu["Item_Id"]):
+        empty = np.zeros(0, dtype=np.int64)
+        return orders, completed, {"order": empty, "category": empty.astype("U30"), "revenue": empty.astype(float)}
+
+    order_pos = np.minimum(np.searchsorted(orders["Order_ID"], items["Order_ID"]), len(orders["Order_ID"]) - 1)
+    menu_pos = np.minimum(np.searchsorted(menu["Item_Id"], items["Item_ID"]), len(menu["Item_Id"]) - 1)
+    selected = (
+        (orders["Order_ID"][order_pos] == items["Order_ID"])
+        & (menu["Item_Id"][menu_pos] == items["Item_ID"])
+        & completed[order_pos]
+    )
+    order_pos, menu_pos = order_pos[selected], menu_pos[selected]
+    return orders, completed, {
+        "order": order_pos,
+        "category": menu["Category"][menu_pos],
+        "revenue": items["Quantity"][selected] * menu["Price"][menu_pos],
+    }
+
+
+def snapshot_revenue_analysis(start_date, end_date) -> Optional[List[Dict]]:
+    """
+    get_revenue_analysis() over the analytics snapshot instead of MySQL.
+
+    Returns:
+        Dicts with Date, Category and Revenue ordered by date and category,
+        or None if there is no snapshot yet.
+    """
+    found = _completed_order_lines(start_date, end_date)
+    if found is None:
+        return None
+    orders, _, lines = found
+    days = orders["Order_Time"].astype("M8[D]")[lines["order"]]
+    categories, category_codes = np.unique(lines["category"], return_inverse=True)
+    group_keys = days.astype(np.int64) * max(len(categories), 1) + category_codes
+    groups, group_codes = np.unique(group_keys, return_inverse=True)
+    revenue = np.bincount(group_codes, weights=lines["revenue"], minlength=len(groups))
+    return [
+        {
+            "Date": np.datetime64(int(group) // len(categories), "D").astype(object),
+            "Category": str(categories[int(group) % len(categories)]),
+            "Revenue": float(total),
+        }
+        for group, total in zip(groups, revenue)
+    ]
+
+
+def snapshot_staff_performance(start_date, end_date) -> Optional[List[Dict]]:
+    """
+    get_staff_performance() over the analytics snapshot instead of MySQL.
+
+    Returns:
+        Dicts with Username, Role, Orders_Handled and Total_Sales (None
+        without sales) for every staff member, best sellers first, or None
+        if there is no snapshot yet.
+    """
+    found = _completed_order_lines(start_date, end_date)
+    tables = get_analytics_snapshot().tables("Staff")
+    if found is None or tables is None:
+        return None
+    orders, completed, lines = found
+    (staff,) = tables
+    if not len(staff["Staff_ID"]):
+        return []
+    staff_of_orders = np.searchsorted(staff["Staff_ID"], orders["Staff_ID"])
+    known = (staff_of_orders < len(staff["Staff_ID"]))
+    known[known] = staff["Staff_ID"][staff_of_orders[known]] == orders["Staff_ID"][known]
+
+    handled = np.bincount(staff_of_orders[completed & known], minlength=len(staff["Staff_ID"]))
+    line_staff = staff_of_orders[lines["order"]]
+    line_known = known[lines["order"]]
+    sales = np.bincount(line_staff[line_known], weights=lines["revenue"][line_known], minlength=len(staff["Staff_ID"]))
+    has_sales = np.bincount(line_staff[line_known], minlength=len(staff["Staff_ID"])) > 0
+
+    rows = [
+        {
+            "Username": str(staff["Username"][i]),
+            "Role": str(staff["Role"][i]),
+            "Orders_Handled": int(handled[i]),
+            "Total_Sales": float(sales[i]) if has_sales[i] else None,
+        }
+        for i in range(len(staff["Staff_ID"]))
+    ]
+    rows.sort(key=lambda row: row["Total_Sales"] if row["Total_Sales"] is not None else -1, reverse=True)
+    return rows
+
+
+def get_snapshot_freshness() -> Optional[Dict]:
+    return get_analytics_snapshot().freshness()
+
+
 # Table Management Functions
 def get_table_status():
+    tables = get_query_cache().get_or_load(
+        ("table_status",),
+        _fetch_table_status,
+        ttl=QUERY_CACHE_CONFIG["table_ttl"],
+        tags=("tables",),
+    )
+    return tables if tables is not None else []
+
+
+def _fetch_table_status():
     conn = get_database_connection()
     if not conn:
-        return []
+        return None
 
     try:
         cursor = conn.cursor(dictionary=True)
@@ -277,7 +2530,7 @@ def get_table_status():
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error fetching tables: {error}")
-        return []
+        return None
     finally:
         conn.close()
 
@@ -298,6 +2551,7 @@ def update_table_status(table_id, status, order_id=None):
             (status, order_id, table_id),
         )
         conn.commit()
+        get_query_cache().invalidate("tables")
         return True
     except mysql.connector.Error as error:
         st.error(f"Error updating table: {error}")
@@ -307,10 +2561,26 @@ def update_table_status(table_id, status, order_id=None):
 
 
 # Menu Management Functions
+def _menu_cache_tags(category, items):
+    tags = {f"menu:category:{category}" if category else "menu:all"}
+    tags.update(f"menu:item:{item['Item_Id']}" for item in items)
+    return tags
+
+
 def get_menu_items(category=None):
+    items = get_query_cache().get_or_load(
+        ("menu_items", category),
+        lambda: _fetch_menu_items(category),
+        ttl=QUERY_CACHE_CONFIG["menu_ttl"],
+        tags=lambda items: _menu_cache_tags(category, items),
+    )
+    return items if items is not None else []
+
+
+def _fetch_menu_items(category=None):
     conn = get_database_connection()
     if not conn:
-        return []
+        return None
 
     try:
         cursor = conn.cursor(dictionary=True)
@@ -333,11 +2603,27 @@ def get_menu_items(category=None):
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error fetching menu: {error}")
-        return []
+        return None
     finally:
         conn.close()
 
 
+def get_menu_page(after=None, name_prefix=None, category=None, limit=None):
+    """One page of menu items sorted by name, filtered on the server."""
+    filters, params = [], []
+    if name_prefix:
+        filters.append("Item_Name LIKE %s")
+        params.append(like_prefix(name_prefix))
+    if category:
+        filters.append("Category = %s")
+        params.append(category)
+    page = fetch_keyset_page(
+        "SELECT * FROM Menu_Items",
+        filters, params, ("Item_Name",), after, limit or LIST_CONFIG["page_size"],
+    )
+    return page if page is not None else ([], None)
+
+
 def update_menu_item(item_id, name, price, category, description):
     conn = get_database_connection()
     if not conn:
@@ -355,6 +2641,11 @@ def update_menu_item(item_id, name, price, category, description):
             (name, price, category, description, item_id),
         )
         conn.commit()
+        # Lists that held the item (its old category and the full menu) plus
+        # the list for its new category.
+        get_query_cache().invalidate(
+            f"menu:item:{item_id}", f"menu:category:{category}"
+        )
         return True
     except mysql.connector.Error as error:
         st.error(f"Error updating menu item: {error}")
@@ -377,6 +2668,7 @@ def add_menu_item(name, price, category, description):
             (name, price, category, description)
         )
         conn.commit()
+        get_query_cache().invalidate("menu:all", f"menu:category:{category}")
         return True
     except mysql.connector.Error as error:
         st.error(f"Error adding menu item: {error}")
@@ -385,57 +2677,311 @@ def add_menu_item(name, price, category, description):
         conn.close()
 
 
-# Order Management Functions
-def create_order(table_id, item_name, quantity):
-    # Logic to create the order
+def parse_menu_csv(data) -> List[Dict]:
+    """
+    Read menu rows from CSV text or bytes.
+
+    Expects a header with Item_Name, Category and Price; Description and
+    Available are optional. Each row gets its file line number as Line.
+    """
+    if isinstance(data, bytes):
+        data = data.decode("utf-8-sig")
+    reader = csv.DictReader(io.StringIO(data))
+    return [
+        {**{key.strip(): value for key, value in row.items() if key}, "Line": line}
+        for line, row in enumerate(reader, start=2)
+    ]
+
+
+def validate_menu_rows(rows) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Check and normalise menu rows for bulk_upsert_menu_items.
+
+    Returns:
+        (valid, rejected). Valid rows have Item_Name, Category, Price
+        (Decimal), Description and Available; rejected rows are
+        {"Line": ..., "Item_Name": ..., "Error": ...}.
+    """
+    valid, rejected, seen = [], [], set()
+    for index, row in enumerate(rows, start=1):
+        line = row.get("Line", index)
+        name = (row.get("Item_Name") or "").strip()
+        category = (row.get("Category") or "").strip()
+        available = str(row.get("Available", "")).strip().lower()
+
+        error = None
+        try:
+            price = Decimal(str(row.get("Price", "")).strip()).quantize(Decimal("0.01"))
+        except InvalidOperation:
+            price = None
+        if not name:
+            error = "Item_Name is empty"
+        elif len(name) > 50:
+            error = "Item_Name is longer than 50 characters"
+        elif name.lower() in seen:
+            error = "Item_Name appears more than once"
+        elif category not in MENU_CATEGORIES:
+            error = f"Category must be one of {', '.join(MENU_CATEGORIES)}"
+        elif price is None or not price.is_finite():
+            error = "Price is not a number"
+        elif price < 0 or price > MENU_IMPORT_CONFIG["max_price"]:
+            error = "Price is out of range"
+        elif available not in ("", "1", "0", "true", "false", "yes", "no"):
+            error = "Available must be true or false"
+
+        if error:
+            rejected.append({"Line": line, "Item_Name": name, "Error": error})
+            continue
+        seen.add(name.lower())
+        valid.append(
+            {
+                "Item_Name": name,
+                "Category": category,
+                "Price": price,
+                "Description": (row.get("Description") or "").strip() or None,
+                "Available": available not in ("0", "false", "no"),
+            }
+        )
+    return valid, rejected
+
+
+def bulk_upsert_menu_items(rows) -> Optional[Dict]:
+    """
+    Insert or update many menu items, matched by Item_Name, in one transaction.
+
+    Rows are validated first; invalid rows are skipped and reported. The
+    rest are written with multi-row INSERT ... ON DUPLICATE KEY UPDATE in
+    batches of MENU_IMPORT_CONFIG["batch_size"].
+
+    Returns:
+        {"inserted": n, "updated": n, "rejected": [...]}, or None if the
+        transaction failed and nothing was written.
+    """
+    valid, rejected = validate_menu_rows(rows)
+    result = {"inserted": 0, "updated": 0, "rejected": rejected}
+    if not valid:
+        return result
+
+    conn = get_database_connection()
+    if not conn:
+        return None
+    batch_size = MENU_IMPORT_CONFIG["batch_size"]
     try:
-        conn = get_database_connection()
-        if conn:
-            cursor = conn.cursor()
+        cursor = conn.cursor()
+        conn.start_transaction()
+        existing = {}
+        for start in range(0, len(valid), batch_size):
+            names = [row["Item_Name"] for row in valid[start : start + batch_size]]
             cursor.execute(
+                f"""
+                SELECT Item_Id, Item_Name FROM Menu_Items
+                WHERE Item_Name IN ({', '.join(['%s'] * len(names))})
+                FOR UPDATE
+                """,
+                names,
+            )
+            existing.update((name.lower(), item_id) for item_id, name in cursor.fetchall())
+
+        for start in range(0, len(valid), batch_size):
+            cursor.executemany(
                 """
-                INSERT INTO Orders (Table_ID, Order_Status, Order_Time)
-                VALUES (%s, 'Pending', NOW())
+                INSERT INTO Menu_Items (Item_Name, Category, Price, Description, Available)
+                VALUES (%s, %s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE
+                    Category = VALUES(Category),
+                    Price = VALUES(Price),
+                    Description = VALUES(Description),
+                    Available = VALUES(Available)
                 """,
-                (table_id,)
+                [
+                    (row["Item_Name"], row["Category"], row["Price"], row["Description"], row["Available"])
+                    for row in valid[start : start + batch_size]
+                ],
             )
-            order_id = cursor.lastrowid  # Get the last inserted Order_ID
+        conn.commit()
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error importing menu items: {error}")
+        return None
+    finally:
+        conn.close()
 
-            cursor.execute(
-                    """
-                    INSERT INTO Order_Items (Order_ID, Item_Name, Quantity)
-                    VALUES (%s, %s, %s)
-                    """,
-                    (order_id, item_name, quantity)
-                )
+    result["updated"] = sum(1 for row in valid if row["Item_Name"].lower() in existing)
+    result["inserted"] = len(valid) - result["updated"]
+    get_query_cache().invalidate(
+        "menu:all",
+        *{f"menu:category:{row['Category']}" for row in valid},
+        *(f"menu:item:{item_id}" for item_id in existing.values()),
+    )
+    return result
+
+
+def adjust_menu_prices(percent, category=None) -> Optional[int]:
+    """
+    Change menu prices by a percentage in one statement.
+
+    Args:
+        percent: e.g. 5 for +5%, -10 for -10%, within MENU_PRICE_CHANGE_LIMITS
+        category: Only change this category; all items if None
+
+    Returns:
+        Number of items repriced, or None on error or an out-of-range percent.
+    """
+    low, high = MENU_PRICE_CHANGE_LIMITS
+    if not low <= percent <= high:
+        st.error(f"Price change must be between {low:g}% and {high:g}%")
+        return None
+
+    conn = get_database_connection()
+    if not conn:
+        return None
+    sql = "UPDATE Menu_Items SET Price = ROUND(Price * (1 + %s / 100), 2)"
+    params = [percent]
+    if category:
+        sql += " WHERE Category = %s"
+        params.append(category)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql, params)
+        repriced = cursor.rowcount
+        if category:
+            categories = [category]
+        else:
+            cursor.execute("SELECT DISTINCT Category FROM Menu_Items")
+            categories = [row[0] for row in cursor.fetchall()]
+        conn.commit()
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error changing prices: {error}")
+        return None
+    finally:
+        conn.close()
+
+    # Every cached menu list holds the full menu or one category
+    get_query_cache().invalidate("menu:all", *(f"menu:category:{name}" for name in categories))
+    return repriced
 
-            conn.commit()
-            return True, order_id
-    except Exception as e:
-        return False, str(e)
 
 # Inventory Management Functions
 def check_inventory_levels():
+    items = get_low_stock_items()
+    return items if items is not None else []
+
+
+def get_low_stock_items(inventory_ids=None) -> Optional[List[Dict]]:
+    """
+    Fetch low-stock inventory rows, most urgent first, from idx_inventory_ratio.
+
+    Args:
+        inventory_ids: Fetch these items whether or not they are low on
+            stock, so callers can tell which ones have recovered
+
+    Returns:
+        List of rows, or None on error.
+    """
     conn = get_database_connection()
     if not conn:
-        return []
-
+        return None
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute(
-            """
-            SELECT * FROM Inventory 
-            WHERE Current_Stock <= Reorder_Level
-            ORDER BY Current_Stock/Reorder_Level
-        """
-        )
+        if inventory_ids is None:
+            cursor.execute(
+                """
+                SELECT * FROM Inventory
+                WHERE Stock_Ratio <= 1
+                ORDER BY Stock_Ratio
+                """
+            )
+        else:
+            cursor.execute(
+                f"""
+                SELECT * FROM Inventory
+                WHERE Inventory_Id IN ({', '.join(['%s'] * len(inventory_ids))})
+                """,
+                list(inventory_ids),
+            )
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error checking inventory: {error}")
-        return []
+        return None
     finally:
         conn.close()
 
+
+class LowStockAlerts:
+    """
+    Low-stock inventory items held in memory, most urgent first.
+
+    Loaded from the Stock_Ratio index and kept current by refresh() whenever
+    this process changes stock, so reading the top alerts costs O(k).
+    Reloaded in full once older than ttl to pick up changes made elsewhere.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._queue = []  # sorted [(Stock_Ratio, Inventory_Id)]
+        self._items = {}  # Inventory_Id -> row
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self) -> bool:
+        with self._lock:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return True
+        rows = get_low_stock_items()
+        if rows is None:
+            return False
+        with self._lock:
+            self._items = {row["Inventory_Id"]: row for row in rows}
+            self._queue = sorted((row["Stock_Ratio"], row["Inventory_Id"]) for row in rows)
+            self._loaded_at = time.monotonic()
+        return True
+
+    def top(self, k: Optional[int] = None) -> Optional[List[Dict]]:
+        """The k most urgent alerts (all of them if k is None), or None on error."""
+        if not self._ensure_loaded():
+            return None
+        with self._lock:
+            return [self._items[inventory_id] for _, inventory_id in self._queue[:k]]
+
+    def count(self) -> Optional[int]:
+        if not self._ensure_loaded():
+            return None
+        with self._lock:
+            return len(self._queue)
+
+    def refresh(self, inventory_ids):
+        """Re-read the given items after their stock or reorder level changed."""
+        inventory_ids = list(inventory_ids)
+        if not inventory_ids or self._loaded_at is None:
+            return
+        rows = get_low_stock_items(inventory_ids)
+        if rows is None:
+            self.invalidate()
+            return
+        with self._lock:
+            for inventory_id in inventory_ids:
+                self._discard(inventory_id)
+            for row in rows:
+                ratio = row["Stock_Ratio"]
+                if ratio is not None and ratio <= 1:
+                    bisect.insort(self._queue, (ratio, row["Inventory_Id"]))
+                    self._items[row["Inventory_Id"]] = row
+
+    def _discard(self, inventory_id):
+        row = self._items.pop(inventory_id, None)
+        if row is not None:
+            del self._queue[bisect.bisect_left(self._queue, (row["Stock_Ratio"], inventory_id))]
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+
+@st.cache_resource(show_spinner=False)
+def get_low_stock_alerts() -> LowStockAlerts:
+    return LowStockAlerts(LOW_STOCK_CONFIG["ttl"])
+
 def get_inventory_items():
     conn = get_database_connection()
     if not conn:
@@ -454,6 +3000,21 @@ def get_inventory_items():
     finally:
         conn.close()  # Close the connection properly here
 
+def get_inventory_page(after=None, name_prefix=None, low_stock_only=False, limit=None):
+    """One page of inventory sorted by name, filtered on the server."""
+    filters, params = [], []
+    if name_prefix:
+        filters.append("Item_Name LIKE %s")
+        params.append(like_prefix(name_prefix))
+    if low_stock_only:
+        filters.append("Stock_Ratio <= 1")  # served by idx_inventory_ratio
+    page = fetch_keyset_page(
+        "SELECT * FROM Inventory",
+        filters, params, ("Item_Name", "Inventory_Id"), after,
+        limit or LIST_CONFIG["page_size"],
+    )
+    return page if page is not None else ([], None)
+
 def update_inventory_item(inventory_id, current_stock, reorder_level):
     conn = get_database_connection()
     if not conn:
@@ -468,6 +3029,7 @@ def update_inventory_item(inventory_id, current_stock, reorder_level):
             """, (current_stock, reorder_level, inventory_id)
         )
         conn.commit()  # Ensure the update is committed
+        get_low_stock_alerts().refresh([inventory_id])
         return True
     except mysql.connector.Error as error:
         st.error(f"Error updating inventory: {error}")
@@ -488,6 +3050,7 @@ def add_inventory_item(item_name, current_stock, reorder_level):
             """, (item_name, current_stock, reorder_level)
         )
         conn.commit()  # Ensure the insert is committed
+        get_low_stock_alerts().refresh([cursor.lastrowid])
         return True
     except mysql.connector.Error as error:
         st.error(f"Error adding inventory item: {error}")
@@ -496,61 +3059,735 @@ def add_inventory_item(item_name, current_stock, reorder_level):
         conn.close()  # Close the connection properly here
 
 
-# Reservation Management Functions
-def create_reservation(
-    customer_name, contact_number, table_id, reservation_datetime, party_size
-):
+# Recipe Functions
+def convert_quantity(quantity, from_unit, to_unit) -> Decimal:
+    """
+    Convert a recipe quantity into an inventory item's unit.
+
+    Raises:
+        ValueError: If either unit is unknown or they measure different things.
+    """
+    quantity = Decimal(str(quantity))
+    from_unit = (from_unit or "").strip().lower()
+    to_unit = (to_unit or "").strip().lower()
+    # No unit on the recipe line means it is already in the stock unit
+    if not from_unit or from_unit == to_unit:
+        return quantity
+    if from_unit not in UNITS or to_unit not in UNITS:
+        raise ValueError(f"Cannot convert {from_unit or 'no unit'} to {to_unit or 'no unit'}")
+    (from_dimension, from_size), (to_dimension, to_size) = UNITS[from_unit], UNITS[to_unit]
+    if from_dimension != to_dimension:
+        raise ValueError(f"Cannot convert {from_unit} ({from_dimension}) to {to_unit} ({to_dimension})")
+    return quantity * from_size / to_size
+
+
+def get_recipe(item_id) -> List[Dict]:
     conn = get_database_connection()
     if not conn:
-        return False, None
+        return []
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT r.Inventory_Id, i.Item_Name, r.Quantity, r.Unit,
+                   r.Stock_Quantity, i.Unit AS Stock_Unit
+            FROM Recipe_Items r
+            JOIN Inventory i ON r.Inventory_Id = i.Inventory_Id
+            WHERE r.Item_Id = %s
+            ORDER BY i.Item_Name
+            """,
+            (item_id,),
+        )
+        return cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error fetching recipe: {error}")
+        return []
+    finally:
+        conn.close()
+
 
+def set_recipe_item(item_id, inventory_id, quantity, unit) -> bool:
+    """Add an ingredient to a menu item's recipe, or change its quantity."""
+    conn = get_database_connection()
+    if not conn:
+        return False
     try:
         cursor = conn.cursor()
+        cursor.execute("SELECT Unit FROM Inventory WHERE Inventory_Id = %s", (inventory_id,))
+        row = cursor.fetchone()
+        if not row:
+            st.error("Inventory item not found")
+            return False
+        stock_quantity = convert_quantity(quantity, unit, row[0])
         cursor.execute(
             """
-            INSERT INTO Reservation (
-                Customer_Id, 
-                Table_Id, 
-                Date, 
-                Time, 
-                Status,
-                Party_Size
-            ) VALUES ((SELECT Cust_Id FROM Customers WHERE Cust_Name = %s AND PhoneNumber = %s), %s, %s, 'Booked', %s)
+            INSERT INTO Recipe_Items (Item_Id, Inventory_Id, Quantity, Unit, Stock_Quantity)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                Quantity = VALUES(Quantity),
+                Unit = VALUES(Unit),
+                Stock_Quantity = VALUES(Stock_Quantity)
             """,
-            (
-                customer_name,
-                contact_number,
-                table_id,
-                reservation_datetime.date(),
-                reservation_datetime.time(),
-                party_size,
-            ),
+            (item_id, inventory_id, quantity, unit or None, stock_quantity),
         )
         conn.commit()
-        return True, cursor.lastrowid
+        return True
+    except ValueError as error:
+        st.error(str(error))
+        return False
     except mysql.connector.Error as error:
-        st.error(f"Error: {error}")
-        return False, None
+        st.error(f"Error saving recipe: {error}")
+        return False
     finally:
         conn.close()
 
 
-def get_reservation(date_filter):
+def remove_recipe_item(item_id, inventory_id) -> bool:
     conn = get_database_connection()
     if not conn:
-        return []
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM Recipe_Items WHERE Item_Id = %s AND Inventory_Id = %s",
+            (item_id, inventory_id),
+        )
+        conn.commit()
+        return True
+    except mysql.connector.Error as error:
+        st.error(f"Error removing recipe item: {error}")
+        return False
+    finally:
+        conn.close()
 
+
+# Stock Depletion
+def deplete_stock(batch_size=None) -> Optional[int]:
+    """
+    Take the ingredients of one batch of queued orders out of stock.
+
+    Orders are queued in Stock_Depletions by the queue_stock_depletion
+    trigger. A batch is claimed with SKIP LOCKED, so several app processes
+    can work the queue at once, and its usage is applied with one UPDATE
+    per batch. The Inventory rows are locked in Inventory_Id order first,
+    so concurrent batches wait on each other rather than deadlock.
+
+    Returns:
+        Number of orders settled, or None on error.
+    """
+    batch_size = batch_size or STOCK_DEPLETION_CONFIG["batch_size"]
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        conn.start_transaction()
+        cursor.execute(
+            """
+            SELECT Order_ID FROM Stock_Depletions
+            WHERE Depleted_At IS NULL
+            ORDER BY Order_ID
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (batch_size,),
+        )
+        order_ids = [row[0] for row in cursor.fetchall()]
+        if not order_ids:
+            conn.rollback()
+            return 0
+
+        placeholders = ", ".join(["%s"] * len(order_ids))
+        cursor.execute(
+            f"""
+            SELECT i.Inventory_Id FROM Inventory i
+            WHERE i.Inventory_Id IN (
+                SELECT r.Inventory_Id
+                FROM Order_Items oi
+                JOIN Recipe_Items r ON r.Item_Id = oi.Item_ID
+                WHERE oi.Order_ID IN ({placeholders})
+            )
+            ORDER BY i.Inventory_Id
+            FOR UPDATE
+            """,
+            order_ids,
+        )
+        inventory_ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            f"""
+            UPDATE Inventory i
+            JOIN (
+                SELECT r.Inventory_Id, SUM(oi.Quantity * r.Stock_Quantity) AS Used
+                FROM Order_Items oi
+                JOIN Recipe_Items r ON r.Item_Id = oi.Item_ID
+                WHERE oi.Order_ID IN ({placeholders})
+                GROUP BY r.Inventory_Id
+            ) u ON u.Inventory_Id = i.Inventory_Id
+            SET i.Current_Stock = i.Current_Stock - u.Used
+            """,
+            order_ids,
+        )
+        cursor.execute(
+            f"""
+            UPDATE Stock_Depletions SET Depleted_At = CURRENT_TIMESTAMP(6)
+            WHERE Order_ID IN ({placeholders})
+            """,
+            order_ids,
+        )
+        conn.commit()
+        get_low_stock_alerts().refresh(inventory_ids)
+        return len(order_ids)
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error depleting stock: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_pending_depletions() -> Optional[int]:
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM Stock_Depletions WHERE Depleted_At IS NULL")
+        return cursor.fetchone()[0]
+    except mysql.connector.Error as error:
+        st.error(f"Error counting queued depletions: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+stock_depletion_logger = logging.getLogger("restaurant.stock_depletion")
+
+
+class StockDepleter:
+    """
+    Background worker that drains the stock depletion queue.
+
+    Order status changes call wake(), so stock follows sales within moments,
+    but a burst of completions is still settled a batch at a time.
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self._interval = interval
+        self._batch_size = batch_size
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stock-depletion", daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self._interval)
+            self._wake.clear()
+            while True:
+                settled = deplete_stock(self._batch_size)
+                if settled is None:
+                    stock_depletion_logger.warning("stock depletion pass failed; retrying later")
+                    break
+                if settled < self._batch_size:
+                    break
+
+
+@st.cache_resource(show_spinner=False)
+def get_stock_depleter() -> StockDepleter:
+    return StockDepleter(STOCK_DEPLETION_CONFIG["interval"], STOCK_DEPLETION_CONFIG["batch_size"])
+
+
+# Demand Forecasting
+# Every menu item's hourly sales form one row of a (items, hours) array, so
+# the model is fitted for all items at once with array operations.
+HOURS_PER_WEEK = 7 * 24
+
+HOURLY_SALES_SQL = HistoryQuery(
+    sql="""
+        SELECT Item_ID, Slot, SUM(Quantity)
+        FROM ({parts}) parts
+        GROUP BY Item_ID, Slot
+    """,
+    part="""
+        SELECT oi.Item_ID, TIMESTAMPDIFF(HOUR, %s, o.Order_Time) AS Slot, SUM(oi.Quantity) AS Quantity
+        FROM {Orders} o
+        JOIN {Order_Items} oi ON oi.Order_ID = o.Order_ID
+        WHERE o.Order_Status != 'Cancelled'
+        AND o.Order_Time >= %s AND o.Order_Time < %s
+        GROUP BY oi.Item_ID, Slot
+    """,
+)
+
+
+def load_hourly_sales(start, weeks) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Hourly quantities sold of every menu item over `weeks` weeks from start.
+
+    Returns:
+        (item_ids, sales): sorted Item_Ids, and a float array of shape
+        (len(item_ids), weeks * 168) whose column h is the hour starting
+        h hours after start. None on error.
+    """
+    end = start + timedelta(weeks=weeks)
+    conn = get_read_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT Item_Id FROM Menu_Items ORDER BY Item_Id")
+        item_ids = np.array([row[0] for row in cursor.fetchall()], dtype=np.int64)
+        cursor.execute(*history_sql(conn, HOURLY_SALES_SQL, (start, start, end), start))
+        rows = cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error loading sales history: {error}")
+        return None
+    finally:
+        conn.close()
+
+    sales = np.zeros((len(item_ids), weeks * HOURS_PER_WEEK))
+    if rows:
+        items, slots, quantities = (np.array(column) for column in zip(*rows))
+        known = np.isin(items, item_ids)  # archived sales of items since deleted from the menu
+        sales[
+            np.searchsorted(item_ids, items[known]),
+            slots[known].astype(np.int64),
+        ] = quantities[known].astype(float)
+    return item_ids, sales
+
+
+def fit_demand_model(sales: np.ndarray, first_weekday: int, smoothing: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fit a weekly level and an hour-of-week profile for every item at once.
+
+    The level is simple exponential smoothing of each item's weekly totals
+    (started from the first week), written as one weighted sum over weeks.
+    The profile is each item's share of a week's sales in each of the 168
+    day-of-week x hour slots over the whole history.
+
+    Args:
+        sales: (items, weeks * 168) hourly quantities, starting at 00:00
+        first_weekday: Weekday of the first column, Monday = 0
+        smoothing: Weight of the latest week, between 0 and 1
+
+    Returns:
+        (level, shares): level has shape (items,) and is the expected
+        quantity next week; shares has shape (items, 168), slot 0 is Monday
+        00:00, and each row sums to 1 (0 for items never sold).
+    """
+    items, hours = sales.shape
+    weeks = hours // HOURS_PER_WEEK
+    by_week = sales[:, : weeks * HOURS_PER_WEEK].reshape(items, weeks, HOURS_PER_WEEK)
+
+    weights = smoothing * (1 - smoothing) ** np.arange(weeks - 1, -1, -1)
+    weights[0] = (1 - smoothing) ** (weeks - 1)
+    level = by_week.sum(axis=2) @ weights
+
+    profile = np.roll(by_week.sum(axis=1), first_weekday * 24, axis=1)
+    totals = profile.sum(axis=1, keepdims=True)
+    shares = np.divide(profile, totals, out=np.zeros_like(profile), where=totals > 0)
+    return level, shares
+
+
+def forecast_hours(level: np.ndarray, shares: np.ndarray, start_weekday: int, hours: int) -> np.ndarray:
+    """(items, hours) expected quantities for the hours from 00:00 on a day with start_weekday."""
+    slots = (start_weekday * 24 + np.arange(hours)) % HOURS_PER_WEEK
+    return level[:, None] * shares[:, slots]
+
+
+def forecast_demand(day=None, days=1) -> Optional[Dict]:
+    """
+    Hourly demand forecast per menu item for `days` days from `day`
+    (tomorrow by default), fitted on the FORECAST_CONFIG["history_weeks"]
+    whole weeks before today. Cached for FORECAST_CONFIG["cache_ttl"].
+
+    Returns:
+        Dict with item_ids, day, hours and forecast ((items, days * 24)
+        array), or None on error.
+    """
+    today = datetime.now().date()
+    day = day or today + timedelta(days=1)
+    return get_query_cache().get_or_load(
+        ("demand_forecast", today, day, days),
+        lambda: _fit_and_forecast(today, day, days),
+        ttl=FORECAST_CONFIG["cache_ttl"],
+    )
+
+
+def _fit_and_forecast(today, day, days):
+    weeks = FORECAST_CONFIG["history_weeks"]
+    start = today - timedelta(weeks=weeks)
+    loaded = load_hourly_sales(start, weeks)
+    if loaded is None:
+        return None
+    item_ids, sales = loaded
+    level, shares = fit_demand_model(sales, start.weekday(), FORECAST_CONFIG["smoothing"])
+    # The level is next week's; days further out are forecast at the same level
+    return {
+        "item_ids": item_ids,
+        "day": day,
+        "hours": days * 24,
+        "forecast": forecast_hours(level, shares, day.weekday(), days * 24),
+    }
+
+
+def suggest_reorder_levels(forecast: Dict, cover_days=None) -> Optional[List[Dict]]:
+    """
+    Reorder levels that cover cover_days of forecast ingredient use.
+
+    Forecast item demand over the first cover_days days is turned into
+    ingredient use through the recipes (one matrix product), times
+    FORECAST_CONFIG["safety_factor"].
+
+    Returns:
+        Dicts with Inventory_Id, Item_Name, Unit, Current_Stock,
+        Reorder_Level, Forecast_Use and Suggested_Level per inventory item,
+        or None on error.
+    """
+    cover_days = cover_days or FORECAST_CONFIG["reorder_cover_days"]
+    conn = get_read_connection()
+    if not conn:
+        return None
     try:
         cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            "SELECT Inventory_Id, Item_Name, Unit, Current_Stock, Reorder_Level "
+            "FROM Inventory ORDER BY Inventory_Id"
+        )
+        inventory = cursor.fetchall()
+        cursor = conn.cursor()
+        cursor.execute("SELECT Item_Id, Inventory_Id, Stock_Quantity FROM Recipe_Items")
+        recipes = cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error loading recipes: {error}")
+        return None
+    finally:
+        conn.close()
+
+    item_ids = forecast["item_ids"]
+    inventory_ids = np.array([item["Inventory_Id"] for item in inventory], dtype=np.int64)
+    per_portion = np.zeros((len(item_ids), len(inventory_ids)))
+    if recipes:
+        items, ingredients, quantities = (np.array(column) for column in zip(*recipes))
+        known = np.isin(items, item_ids)  # recipes of items added since the forecast
+        per_portion[
+            np.searchsorted(item_ids, items[known]),
+            np.searchsorted(inventory_ids, ingredients[known]),
+        ] = quantities[known].astype(float)
+
+    demand = forecast["forecast"][:, : cover_days * 24].sum(axis=1)
+    use = demand @ per_portion
+    suggested = np.ceil(use * FORECAST_CONFIG["safety_factor"]).astype(np.int64)
+    return [
+        dict(item, Forecast_Use=float(use[i]), Suggested_Level=int(suggested[i]))
+        for i, item in enumerate(inventory)
+    ]
+
+
+def set_reorder_levels(levels: Dict[int, int]) -> Optional[int]:
+    """
+    Set Reorder_Level for several inventory items in one transaction.
+
+    Args:
+        levels: Inventory_Id -> new reorder level
+
+    Returns:
+        Number of items updated, or None on error.
+    """
+    if not levels:
+        return 0
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "UPDATE Inventory SET Reorder_Level = %s WHERE Inventory_Id = %s",
+            [(level, inventory_id) for inventory_id, level in levels.items()],
+        )
+        conn.commit()
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error updating reorder levels: {error}")
+        return None
+    finally:
+        conn.close()
+    get_low_stock_alerts().refresh(list(levels))
+    return len(levels)
+
+
+# Customer Identity Functions
+def normalize_phone(phone) -> Optional[str]:
+    """
+    Phone number as "+<country code><number>", or None if it has no digits.
+
+    Spaces and punctuation are dropped; a leading 00 is read as an
+    international prefix, and a leading 0 or a bare 10-digit number gets
+    CUSTOMER_CONFIG["default_country_code"].
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if not digits:
+        return None
+    if phone.strip().startswith("+"):
+        return "+" + digits
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0") or len(digits) == 10:
+        digits = CUSTOMER_CONFIG["default_country_code"] + digits.lstrip("0")
+    return "+" + digits
+
+
+def normalize_email(email) -> Optional[str]:
+    email = (email or "").strip().lower()
+    return email or None
+
+
+@st.cache_resource(show_spinner=False)
+def get_customer_cache() -> QueryCache:
+    return QueryCache(CUSTOMER_CONFIG["cache_size"])
+
+
+CUSTOMER_LOOKUP_SQL = {
+    "Phone_Key": "SELECT Cust_Id FROM Customers WHERE Phone_Key = %s",
+    "Email_Key": "SELECT Cust_Id FROM Customers WHERE Email_Key = %s",
+}
+
+
+def _fetch_customer_id(column, key):
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.prepared(CUSTOMER_LOOKUP_SQL[column])
+        cursor.execute((key,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+    except mysql.connector.Error as error:
+        st.error(f"Error looking up customer: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def find_customer(phone=None, email=None) -> Optional[int]:
+    """
+    Cust_Id of the guest with this phone number or email, or None.
+
+    Lookups use the unique identity keys and are cached, so a repeat guest
+    is usually resolved without a query. Unknown guests are not cached.
+    """
+    for column, key in (("Phone_Key", normalize_phone(phone)), ("Email_Key", normalize_email(email))):
+        if key is None:
+            continue
+        customer_id = get_customer_cache().get_or_load(
+            (column, key),
+            lambda: _fetch_customer_id(column, key),
+            ttl=CUSTOMER_CONFIG["cache_ttl"],
+        )
+        if customer_id is not None:
+            return customer_id
+    return None
+
+
+def get_or_create_customer(name, phone=None, email=None) -> Optional[int]:
+    """
+    Cust_Id of the guest with this phone number or email, creating them if new.
+
+    Safe under concurrency: the insert resolves races on the unique keys
+    with ON DUPLICATE KEY UPDATE, so two sessions registering the same
+    guest at once both get the one row.
+
+    Returns:
+        Cust_Id, or None if neither a phone number nor an email was given
+        or the query failed.
+    """
+    phone_key, email_key = normalize_phone(phone), normalize_email(email)
+    if phone_key is None and email_key is None:
+        st.error("A phone number or email is needed to identify the guest")
+        return None
+
+    customer_id = find_customer(phone, email)
+    if customer_id is not None:
+        return customer_id
+
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
         cursor.execute(
             """
-            SELECT r.Reserve_Id, c.Cust_Name AS Customer_Name, r.Table_Id, r.Date, r.Time, r.Status, r.Party_Size
-            FROM Reservation r
-            JOIN Customers c ON r.Customer_Id = c.Cust_Id
-            WHERE r.Date = %s
+            INSERT INTO Customers (Cust_Name, PhoneNumber, Email, Phone_Key, Email_Key)
+            VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE Cust_Id = LAST_INSERT_ID(Cust_Id)
+            """,
+            (name, phone or None, email or None, phone_key, email_key),
+        )
+        customer_id = cursor.lastrowid
+        conn.commit()
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error saving customer: {error}")
+        return None
+    finally:
+        conn.close()
+
+    cache = get_customer_cache()
+    for column, key in (("Phone_Key", phone_key), ("Email_Key", email_key)):
+        if key is not None:
+            cache.get_or_load((column, key), lambda: customer_id, ttl=CUSTOMER_CONFIG["cache_ttl"])
+    return customer_id
+
+
+# Tables whose Customer_Id moves over when duplicate customers are merged
+CUSTOMER_REFERENCES = ("Reservation", "Reservation_Archive", "Payment", "Payment_Archive")
+
+
+def backfill_customer_keys(batch_size=None) -> Optional[Dict]:
+    """
+    Set Phone_Key and Email_Key on customers saved before they existed.
+
+    Customers are walked in Cust_Id order, a batch per transaction. One
+    whose phone number or email normalises to a key another customer holds
+    is the same guest entered twice: their reservations and payments move
+    to the holder and the duplicate row is deleted, so the UNIQUE keys
+    never clash. A customer that already holds a key is never deleted,
+    since running sessions may have it cached.
+
+    Returns:
+        Counts of customers keyed and merged, or None on error. Batches
+        committed before the error are kept; running it again carries on.
+    """
+    batch_size = batch_size or CUSTOMER_CONFIG["backfill_batch_size"]
+    totals = {"keyed": 0, "merged": 0}
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        last_id = 0
+        while True:
+            cursor.execute(
+                """
+                SELECT Cust_Id, PhoneNumber, Email, Phone_Key, Email_Key
+                FROM Customers
+                WHERE Cust_Id > %s
+                ORDER BY Cust_Id
+                LIMIT %s
+                FOR UPDATE
             """,
-            (date_filter,),
+                (last_id, batch_size),
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return totals
+            last_id = rows[-1]["Cust_Id"]
+            keyed, merged = _key_customers(cursor, rows)
+            conn.commit()
+            totals["keyed"] += keyed
+            totals["merged"] += merged
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error backfilling customer keys: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def _key_customers(cursor, rows) -> Tuple[int, int]:
+    """Key or merge one batch of customers on an open transaction: (keyed, merged)."""
+    wanted = {
+        row["Cust_Id"]: [
+            row["Phone_Key"] or normalize_phone(row["PhoneNumber"]),
+            row["Email_Key"] or normalize_email(row["Email"]),
+        ]
+        for row in rows
+    }
+    phones = sorted({phone for phone, _ in wanted.values() if phone})
+    emails = sorted({email for _, email in wanted.values() if email})
+
+    # Current holders of the keys this batch wants, including rows in it
+    holders = [{}, {}]  # key -> Cust_Id, for Phone_Key and Email_Key
+    held = {}  # Cust_Id -> [Phone_Key, Email_Key]
+    conditions, params = [], []
+    for column, keys in (("Phone_Key", phones), ("Email_Key", emails)):
+        if keys:
+            conditions.append(f"{column} IN ({', '.join(['%s'] * len(keys))})")
+            params.extend(keys)
+    if conditions:
+        cursor.execute(
+            f"SELECT Cust_Id, Phone_Key, Email_Key FROM Customers WHERE {' OR '.join(conditions)} FOR UPDATE",
+            params,
+        )
+        for holder in cursor.fetchall():
+            held[holder["Cust_Id"]] = [holder["Phone_Key"], holder["Email_Key"]]
+            for index, key in enumerate(held[holder["Cust_Id"]]):
+                if key is not None:
+                    holders[index][key] = holder["Cust_Id"]
+
+    updates = {}  # Cust_Id -> [Phone_Key, Email_Key] to fill in
+    merges = {}  # duplicate Cust_Id -> Cust_Id it merges into
+    for row in rows:
+        cust_id = row["Cust_Id"]
+        owners = [holders[index].get(key) for index, key in enumerate(wanted[cust_id]) if key]
+        owner = next((owner for owner in owners if owner not in (None, cust_id)), None)
+        if owner is not None and cust_id not in held:
+            merges[cust_id] = owner
+            target = owner
+        else:
+            target = cust_id
+        # Keys nobody holds yet go to this customer, or to the one it merges into
+        current = held.setdefault(target, [None, None])
+        for index, key in enumerate(wanted[cust_id]):
+            if key and current[index] is None and key not in holders[index]:
+                current[index] = key
+                holders[index][key] = target
+                updates.setdefault(target, [None, None])[index] = key
+
+    if merges:
+        for table in CUSTOMER_REFERENCES:
+            cursor.executemany(
+                f"UPDATE {table} SET Customer_Id = %s WHERE Customer_Id = %s",
+                [(owner, duplicate) for duplicate, owner in merges.items()],
+            )
+        cursor.execute(
+            f"DELETE FROM Customers WHERE Cust_Id IN ({', '.join(['%s'] * len(merges))})",
+            list(merges),
+        )
+    if updates:
+        cursor.executemany(
+            """
+            UPDATE Customers
+            SET Phone_Key = COALESCE(Phone_Key, %s), Email_Key = COALESCE(Email_Key, %s)
+            WHERE Cust_Id = %s
+        """,
+            [(phone, email, cust_id) for cust_id, (phone, email) in updates.items()],
         )
+    return len(updates), len(merges)
+
+
+# Reservation Management Functions
+RESERVATIONS_ON_DATE = HistoryQuery(
+    sql="{parts}",
+    part="""
+        SELECT r.Reserve_Id, c.Cust_Name AS Customer_Name, r.Table_Id, r.Date, r.Time, r.Status, r.Party_Size
+        FROM {Reservation} r
+        JOIN Customers c ON r.Customer_Id = c.Cust_Id
+        WHERE r.Date = %s
+    """,
+    table="Reservation",
+)
+
+
+def get_reservation(date_filter):
+    conn = get_database_connection()
+    if not conn:
+        return []
+
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(*history_sql(conn, RESERVATIONS_ON_DATE, (date_filter,), date_filter))
         return cursor.fetchall()
     except mysql.connector.Error as error:
         st.error(f"Error fetching reservation: {error}")
@@ -575,6 +3812,11 @@ def update_reservation_status(reservation_id, status):
             (status, reservation_id),
         )
         conn.commit()
+        if status == "Booked":
+            # The booking's slot isn't known here; reload on next use
+            get_availability_index().invalidate()
+        else:
+            get_availability_index().remove(reservation_id)
         return True
     except mysql.connector.Error as error:
         st.error(f"Error updating reservation: {error}")
@@ -583,31 +3825,41 @@ def update_reservation_status(reservation_id, status):
         conn.close()
 
 
+# A booking clashes with any other booking on the same table that starts
+# within the conflict window; Date narrows the scan to the neighbouring days
+RESERVATION_CLASH_SQL = """
+    SELECT Reserve_Id
+    FROM Reservation
+    WHERE Table_Id = %s
+    AND Status = 'Booked'
+    AND Date IN (%s, %s, %s)
+    AND TIMESTAMP(Date, Time) BETWEEN %s AND %s
+"""
+
+
+def reservation_clashes(cursor, table_id, moment, lock=False) -> bool:
+    """
+    Whether a booking on the table at moment would clash, read from the
+    database rather than the availability index. With lock set the clashing
+    rows are locked for the rest of the transaction.
+    """
+    window = timedelta(hours=RESERVATION_CONFIG["conflict_window_hours"])
+    day = moment.date()
+    cursor.execute(
+        RESERVATION_CLASH_SQL + (" FOR UPDATE" if lock else ""),
+        (table_id, day - timedelta(days=1), day, day + timedelta(days=1), moment - window, moment + window),
+    )
+    return bool(cursor.fetchall())
+
+
 def check_table_availability(table_id, desired_datetime):
     conn = get_database_connection()
     if not conn:
         return False
 
     try:
-        cursor = conn.cursor(dictionary=True)
-        # Check 2 hours before and after the desired time
-        start_time = desired_datetime - timedelta(hours=2)
-        end_time = desired_datetime + timedelta(hours=2)
-
-        cursor.execute(
-            """
-            SELECT COUNT(*) as conflict_count
-            FROM Reservation
-            WHERE Table_Id = %s
-            AND Status = 'Booked'
-            AND Date = %s
-            AND Time BETWEEN %s AND %s
-        """,
-            (table_id, desired_datetime.date(), start_time.time(), end_time.time()),
-        )
-
-        result = cursor.fetchone()
-        return result["conflict_count"] == 0
+        cursor = conn.cursor()
+        return not reservation_clashes(cursor, table_id, desired_datetime)
     except mysql.connector.Error as error:
         st.error(f"Error checking table availability: {error}")
         return False
@@ -615,6 +3867,181 @@ def check_table_availability(table_id, desired_datetime):
         conn.close()
 
 
+# Table Availability Index
+BOOKED_RESERVATIONS_SQL = """
+    SELECT Reserve_Id, Table_Id, Date, Time
+    FROM Reservation
+    WHERE Status = 'Booked'
+    AND Date IN ({in_list})
+"""
+
+
+def get_booked_reservations(dates) -> Optional[List[Dict]]:
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.prepared(in_list_sql(BOOKED_RESERVATIONS_SQL, len(dates)), dictionary=True)
+        cursor.execute(list(dates))
+        return cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error loading reservations: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def _reservation_start(date, time_of_day):
+    # TIME columns come back as timedelta from mysql.connector
+    if isinstance(time_of_day, timedelta):
+        return datetime.combine(date, datetime.min.time()) + time_of_day
+    return datetime.combine(date, time_of_day)
+
+
+class AvailabilityIndex:
+    """
+    Booked reservations held in memory as sorted start times per table.
+
+    Days are loaded on first use, together with their neighbours so windows
+    that cross midnight are checked correctly, and reloaded once older than
+    ttl. A booking clashes with any other booking on the same table that
+    starts within `window` of it, the same rule as RESERVATION_CLASH_SQL.
+
+    Bookings made by other processes only show up on reload, so the index
+    is for searching and suggesting tables; make_reservation re-checks in
+    the database before it inserts.
+    """
+
+    def __init__(self, window_hours: float = 2, ttl: float = 60.0):
+        self.window = timedelta(hours=window_hours)
+        self.ttl = ttl
+        self._starts = {}  # Table_Id -> sorted [(start, Reserve_Id)]
+        self._booked = {}  # Reserve_Id -> (Table_Id, start)
+        self._loaded = {}  # date -> time it was loaded
+        self._lock = threading.RLock()
+
+    def _ensure_loaded(self, moment) -> bool:
+        day = moment.date()
+        dates = [day - timedelta(days=1), day, day + timedelta(days=1)]
+        now = time.monotonic()
+        with self._lock:
+            stale = [d for d in dates if now - self._loaded.get(d, -self.ttl) >= self.ttl]
+        if not stale:
+            return True
+        rows = get_booked_reservations(stale)
+        if rows is None:
+            return False
+        with self._lock:
+            for reserve_id, (_, start) in list(self._booked.items()):
+                if start.date() in stale:
+                    self._discard(reserve_id)
+            for row in rows:
+                self._insert(row["Reserve_Id"], row["Table_Id"], _reservation_start(row["Date"], row["Time"]))
+            for d in stale:
+                self._loaded[d] = now
+        return True
+
+    def _insert(self, reserve_id, table_id, start):
+        if reserve_id in self._booked:
+            self._discard(reserve_id)
+        bisect.insort(self._starts.setdefault(table_id, []), (start, reserve_id))
+        self._booked[reserve_id] = (table_id, start)
+
+    def _discard(self, reserve_id):
+        table_id, start = self._booked.pop(reserve_id)
+        starts = self._starts[table_id]
+        del starts[bisect.bisect_left(starts, (start, reserve_id))]
+
+    def _last_clash(self, table_id, moment):
+        """Latest booking start on the table that clashes with moment, or None."""
+        starts = self._starts.get(table_id, [])
+        first = bisect.bisect_left(starts, (moment - self.window,))
+        last = bisect.bisect_right(starts, (moment + self.window, float("inf"))) - 1
+        return starts[last][0] if last >= first else None
+
+    def is_free(self, table_id, moment) -> Optional[bool]:
+        """Whether the table can take a booking at moment; None if it could not be loaded."""
+        if not self._ensure_loaded(moment):
+            return None
+        with self._lock:
+            return self._last_clash(table_id, moment) is None
+
+    def free_tables(self, moment, party_size: int = 1) -> Optional[List[Dict]]:
+        """
+        Tables that seat party_size and are free at moment, smallest first.
+
+        Returns:
+            List of dicts with Table_Id and Capacity, or None if the
+            reservations could not be loaded.
+        """
+        tables = [t for t in get_table_status() if t["Capacity"] >= party_size]
+        if not self._ensure_loaded(moment):
+            return None
+        with self._lock:
+            free = [
+                {"Table_Id": t["Table_Id"], "Capacity": t["Capacity"]}
+                for t in tables
+                if self._last_clash(t["Table_Id"], moment) is None
+            ]
+        return sorted(free, key=lambda t: (t["Capacity"], t["Table_Id"]))
+
+    def next_free_slot(self, moment, party_size: int = 1, table_id=None) -> Optional[Tuple[int, datetime]]:
+        """
+        Earliest time at or after moment, on the same day, that a suitable
+        table is free.
+
+        Args:
+            moment: Earliest acceptable start
+            party_size: Guests to seat; ignored when table_id is given
+            table_id: Restrict the search to one table
+
+        Returns:
+            Tuple of (Table_Id, start), or None if nothing is free that day.
+        """
+        if table_id is not None:
+            candidates = [table_id]
+        else:
+            candidates = [t["Table_Id"] for t in get_table_status() if t["Capacity"] >= party_size]
+        if not self._ensure_loaded(moment):
+            return None
+
+        day_end = datetime.combine(moment.date() + timedelta(days=1), datetime.min.time())
+        best = None
+        with self._lock:
+            for candidate in candidates:
+                slot = moment
+                while slot < day_end:
+                    clash = self._last_clash(candidate, slot)
+                    if clash is None:
+                        break
+                    slot = clash + self.window + timedelta(minutes=1)
+                if slot < day_end and (best is None or slot < best[1]):
+                    best = (candidate, slot)
+        return best
+
+    def add(self, reserve_id, table_id, start):
+        with self._lock:
+            self._insert(reserve_id, table_id, start)
+
+    def remove(self, reserve_id):
+        with self._lock:
+            if reserve_id in self._booked:
+                self._discard(reserve_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._starts.clear()
+            self._booked.clear()
+            self._loaded.clear()
+
+
+@st.cache_resource(show_spinner=False)
+def get_availability_index() -> AvailabilityIndex:
+    return AvailabilityIndex(
+        RESERVATION_CONFIG["conflict_window_hours"], RESERVATION_CONFIG["index_ttl"]
+    )
+
+
 # UI Components
 def login_page():
     st.title("Restaurant Management System")
@@ -704,6 +4131,9 @@ def manager_portal():
             "Staff Management",
             "Inventory",
             "Reservation",
+            "Reports",
+            "Demand Forecast",
+            "Performance",
         ],
     )
 
@@ -717,59 +4147,295 @@ def manager_portal():
         show_inventory_management()
     elif menu == "Reservation":
         reservation_management_ui()
+    elif menu == "Reports":
+        show_reports()
+    elif menu == "Demand Forecast":
+        show_demand_forecast()
+    elif menu == "Performance":
+        show_performance()
+
+def show_demand_forecast():
+    st.subheader("Demand Forecast")
+    today = datetime.now().date()
+    day = st.date_input("Day", today + timedelta(days=1), min_value=today)
+
+    forecast = forecast_demand(day)
+    if not forecast:
+        return
+    names = {item["Item_Id"]: item["Item_Name"] for item in get_menu_items() or []}
+    per_item = forecast["forecast"]
+
+    st.write("Portions expected per hour, all items")
+    st.bar_chart({"Portions": per_item.sum(axis=0)})
+
+    totals = per_item.sum(axis=1)
+    order = np.argsort(-totals)
+    st.dataframe(
+        [
+            {
+                "Item": names.get(int(forecast["item_ids"][i]), forecast["item_ids"][i]),
+                "Portions": round(float(totals[i]), 1),
+                "Peak_Hour": f"{int(per_item[i].argmax()):02d}:00",
+            }
+            for i in order
+            if totals[i] > 0
+        ]
+    )
+
+    st.subheader("Reorder Levels")
+    suggestions = suggest_reorder_levels(forecast)
+    if not suggestions:
+        return
+    changed = [item for item in suggestions if item["Suggested_Level"] != item["Reorder_Level"]]
+    st.caption(
+        f"Levels covering {FORECAST_CONFIG['reorder_cover_days']} days of forecast use "
+        f"with a {FORECAST_CONFIG['safety_factor']:g}x safety factor"
+    )
+    st.dataframe(changed)
+    if changed and st.button(f"Apply {len(changed)} Suggested Levels"):
+        updated = set_reorder_levels(
+            {item["Inventory_Id"]: item["Suggested_Level"] for item in changed}
+        )
+        if updated is not None:
+            st.success(f"Updated {updated} reorder levels")
+
+def show_reports():
+    st.subheader("Reports")
+
+    col1, col2 = st.columns(2)
+    start_date = col1.date_input("From", datetime.now().date() - timedelta(days=30))
+    end_date = col2.date_input("To", datetime.now().date())
+
+    if st.button("Generate Reports"):
+        placeholders = {name: st.empty() for name in REPORT_PACK}
+        for name, placeholder in placeholders.items():
+            placeholder.info(f"{name}: running...")
+
+        started = time.perf_counter()
+        pack = ReportPack(REPORT_PACK, start_date, end_date).start()
+        try:
+            for result in pack.results():
+                with placeholders[result["Report"]].container():
+                    st.markdown(f"**{result['Report']}**")
+                    if result["Error"]:
+                        st.error(f"{result['Report']}: {result['Error']}")
+                    else:
+                        st.caption(f"{len(result['Rows'])} rows in {result['Elapsed_ms']:.0f} ms")
+                        st.dataframe(result["Rows"])
+        finally:
+            # Stops stragglers if the page is rerun before the pack finishes
+            pack.cancel()
+        st.caption(f"All reports finished in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    with st.expander("Export"):
+        export_name = st.selectbox("Data", list(EXPORTS))
+        file_format = st.radio("Format", list(EXPORT_FORMATS), horizontal=True)
+        if st.button("Export"):
+            os.makedirs(EXPORT_CONFIG["directory"], exist_ok=True)
+            file_name = (
+                f"{export_name.lower().replace(' ', '_')}_{start_date}_{end_date}"
+                f"{EXPORT_FORMATS[file_format]}"
+            )
+            path = os.path.join(EXPORT_CONFIG["directory"], file_name)
+            result = export_query(export_name, start_date, end_date, path, file_format)
+            if result:
+                st.success(
+                    f"Exported {result['Rows']} rows to {result['Path']} "
+                    f"({result['Rows_Per_Second']:.0f} rows/s)"
+                )
+                if os.path.getsize(path) <= 50 * 1024 * 1024:
+                    with open(path, "rb") as exported:
+                        st.download_button("Download", exported, file_name=file_name)
+
+def show_performance():
+    st.subheader("Query Performance")
+    if st.button("Reset Statistics"):
+        get_query_metrics().reset()
+
+    query_stats = get_query_stats()
+    if query_stats:
+        st.dataframe(query_stats)
+    else:
+        st.info("No queries recorded yet")
+
+    st.subheader(f"Slow Queries (over {QUERY_METRICS_CONFIG['slow_query_ms']:.0f} ms)")
+    slow_queries = get_slow_queries()
+    if slow_queries:
+        st.dataframe(list(reversed(slow_queries)))
+    else:
+        st.info("No slow queries recorded")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.subheader("Connection Pool")
+        st.json(get_pool_stats())
+    with col2:
+        st.subheader("Query Cache")
+        st.json(get_cache_stats())
+    with col3:
+        st.subheader("Write Queue")
+        st.json(get_write_queue_stats())
+
+    st.subheader("Read Routing")
+    st.json(get_routing_stats())
 
 def show_dashboard():
+    snapshot = get_dashboard_snapshot()
+    if not snapshot:
+        return
+
     # Revenue metrics
     col1, col2, col3 = st.columns(3)
     with col1:
-        active_tables = get_active_tables_count()
-        st.metric("Active Tables", f"{active_tables}/4")
+        st.metric("Active Tables", f"{snapshot['active_tables']}/{snapshot['total_tables']}")
     with col2:
-        open_orders = get_open_orders_count()
-        st.metric("Open Orders", str(open_orders))
+        st.metric("Open Orders", str(snapshot["open_orders"]))
+    with col3:
+        st.metric("Snapshot Latency", f"{snapshot['query_ms']:.0f} ms")
+    st.caption(f"As of {snapshot['fetched_at']:%H:%M:%S}")
 
+    show_snapshot_analytics()
 
     # Table Status
     st.subheader("Table Status")
-    tables = get_table_status()
-    st.dataframe(tables)
+    st.dataframe(snapshot["tables"])
 
     # Low Inventory Alerts
     st.subheader("Low Inventory Alerts")
-    low_inventory = check_inventory_levels()
+    alerts = get_low_stock_alerts()
+    low_inventory = alerts.top(LOW_STOCK_CONFIG["dashboard_limit"])
     if low_inventory:
-        st.warning(f"{len(low_inventory)} items need reordering")
-        st.dataframe(low_inventory)
+        st.warning(f"{alerts.count()} items need reordering")
+        st.dataframe(
+            [
+                {key: item[key] for key in ("Item_Name", "Current_Stock", "Reorder_Level", "Unit")}
+                for item in low_inventory
+            ]
+        )
+
+def show_snapshot_analytics():
+    """Revenue and staff panels served from the analytics snapshot, with its freshness."""
+    days = SNAPSHOT_CONFIG["dashboard_days"]
+    st.subheader(f"Last {days} Days")
+    freshness = get_snapshot_freshness()
+    if freshness is None:
+        st.info("The analytics snapshot is still being built")
+        return
+    high_water = freshness["source_high_water"]
+    caption = (
+        f"From the analytics snapshot refreshed at {freshness['refreshed_at']:%H:%M:%S} "
+        f"({freshness['age_seconds'] / 60:.0f} min ago, {freshness['rows']['Orders']} orders)"
+    )
+    if high_water:
+        caption += f"; newest order change {high_water:%Y-%m-%d %H:%M:%S}"
+    if freshness["age_seconds"] > 2 * SNAPSHOT_CONFIG["refresh_interval"]:
+        st.warning(caption)
+    else:
+        st.caption(caption)
+
+    end_date = datetime.now().date()
+    start_date = end_date - timedelta(days=days - 1)
+    revenue = snapshot_revenue_analysis(start_date, end_date) or []
+    if revenue:
+        by_date = {}
+        for row in revenue:
+            by_date.setdefault(row["Date"], {"Date": row["Date"]})[row["Category"]] = row["Revenue"]
+        st.bar_chart(list(by_date.values()), x="Date")
+    staff = snapshot_staff_performance(start_date, end_date) or []
+    st.dataframe([row for row in staff if row["Orders_Handled"]])
+
+def show_list_page(key, fetch_page, filters, columns):
+    """
+    Show one page of a management list with Previous/Next buttons.
+
+    The keyset position of every page visited is kept in session_state, so
+    Previous walks back without OFFSET scans. Changing the filters returns
+    to the first page.
+
+    Returns:
+        The rows on the current page.
+    """
+    state = st.session_state.setdefault(f"{key}_pages", {"filters": None, "after": [None]})
+    if state["filters"] != filters:
+        state["filters"] = dict(filters)
+        state["after"] = [None]
+
+    rows, next_after = fetch_page(after=state["after"][-1], **filters)
+    if rows:
+        st.dataframe([{column: row[column] for column in columns} for row in rows], hide_index=True)
+    else:
+        st.info("Nothing matches these filters.")
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    if col1.button("Previous", key=f"{key}_previous", disabled=len(state["after"]) == 1):
+        state["after"].pop()
+        st.rerun()
+    col2.caption(f"Page {len(state['after'])}")
+    if col3.button("Next", key=f"{key}_next", disabled=next_after is None):
+        state["after"].append(next_after)
+        st.rerun()
+    return rows
+
+
+def select_list_row(key, rows, label):
+    """Pick one row from the current page to edit."""
+    if not rows:
+        return None
+    index = st.selectbox(
+        "Edit",
+        range(len(rows)),
+        format_func=lambda i: label(rows[i]),
+        index=None,
+        placeholder="Choose a row to edit",
+        key=f"{key}_edit",
+    )
+    return rows[index] if index is not None else None
+
 
 def show_menu_management():
     st.subheader("Menu Management")
     
-    tab1, tab2 = st.tabs(["View/Edit Menu", "Add New Item"])
+    tab1, tab2, tab3 = st.tabs(["View/Edit Menu", "Add New Item", "Bulk Changes"])
     
     with tab1:
-        menu_items = get_menu_items()
-        for item in menu_items:
-            with st.expander(f"{item['Item_Name']} - ₹{item['Price']}"):
-                with st.form(f"edit_item_{item['Item_Id']}"):
-                    name = st.text_input("Name", item['Item_Name'])
-                    price = st.number_input("Price", value=float(item['Price']), min_value=0.0)
-                    category = st.selectbox(
-                        "Category",
-                        ["Appetizers", "Main Course", "Desserts", "Beverages"],
-                        index=["Appetizers", "Main Course", "Desserts", "Beverages"].index(item['Category'])
-                    )
-                    description = st.text_area("Description", item['Description'])
-                    
-                    if st.form_submit_button("Update Item"):
-                        if update_menu_item(item['Item_Id'], name, price, category, description):
-                            st.success("Item updated successfully!")
-                            st.rerun()
+        col1, col2 = st.columns(2)
+        name_prefix = col1.text_input("Search by name", key="menu_search").strip()
+        category = col2.selectbox(
+            "Category", ["All"] + MENU_CATEGORIES
+        )
+        menu_items = show_list_page(
+            "menu",
+            get_menu_page,
+            {
+                "name_prefix": name_prefix or None,
+                "category": None if category == "All" else category,
+            },
+            ["Item_Name", "Category", "Price", "Available"],
+        )
+        item = select_list_row(
+            "menu", menu_items, lambda item: f"{item['Item_Name']} - ₹{item['Price']}"
+        )
+        if item:
+            with st.form(f"edit_item_{item['Item_Id']}"):
+                name = st.text_input("Name", item['Item_Name'])
+                price = st.number_input("Price", value=float(item['Price']), min_value=0.0)
+                category = st.selectbox(
+                    "Category",
+                    MENU_CATEGORIES,
+                    index=MENU_CATEGORIES.index(item['Category']) if item['Category'] in MENU_CATEGORIES else 0,
+                )
+                description = st.text_area("Description", item['Description'] or "")
+
+                if st.form_submit_button("Update Item"):
+                    if update_menu_item(item['Item_Id'], name, price, category, description):
+                        st.success("Item updated successfully!")
+                        st.rerun()
     
     with tab2:
         with st.form("add_new_item"):
             name = st.text_input("Name")
             price = st.number_input("Price", min_value=0.0)
-            category = st.selectbox("Category", ["Appetizers", "Main Course", "Desserts", "Beverages"])
+            category = st.selectbox("Category", MENU_CATEGORIES)
             description = st.text_area("Description")
 
             if st.form_submit_button("Add Item"):
@@ -777,6 +4443,38 @@ def show_menu_management():
                     st.success("New item added successfully!")
                     st.rerun()
 
+    with tab3:
+        st.write("Import a CSV with columns Item_Name, Category, Price, Description, Available. "
+                 "Existing items are matched by name and updated.")
+        upload = st.file_uploader("Menu CSV", type=["csv"])
+        if upload is not None:
+            try:
+                rows = parse_menu_csv(upload.getvalue())
+            except (UnicodeDecodeError, csv.Error) as error:
+                st.error(f"Could not read the file: {error}")
+                rows = []
+            valid, rejected = validate_menu_rows(rows)
+            st.caption(f"{len(valid)} valid rows, {len(rejected)} rejected")
+            if rejected:
+                st.dataframe(rejected, hide_index=True)
+            if valid and st.button("Import"):
+                result = bulk_upsert_menu_items(rows)
+                if result:
+                    st.success(
+                        f"Inserted {result['inserted']}, updated {result['updated']}, "
+                        f"rejected {len(result['rejected'])}"
+                    )
+
+        with st.form("adjust_prices"):
+            st.write("Change prices by a percentage")
+            category = st.selectbox("Category", ["All"] + MENU_CATEGORIES, key="adjust_category")
+            low, high = MENU_PRICE_CHANGE_LIMITS
+            percent = st.number_input("Change (%)", min_value=low, max_value=high, value=0.0, step=0.5)
+            if st.form_submit_button("Apply"):
+                repriced = adjust_menu_prices(percent, None if category == "All" else category)
+                if repriced is not None:
+                    st.success(f"Repriced {repriced} items")
+
 
 
 def show_staff_management():
@@ -785,22 +4483,32 @@ def show_staff_management():
     tab1, tab2 = st.tabs(["View Staff", "Add New Staff"])
     
     with tab1:
-        staff = get_all_staff()
-        for employee in staff:
-            with st.expander(f"{employee['Username']} - {employee['Role']}"):
-                with st.form(f"edit_staff_{employee['Staff_ID']}"):
-                    username = st.text_input("Username", employee['Username'])
-                    role = st.selectbox(
-                        "Role",
-                        ["Manager", "Waiter", "Chef", "Cashier"],
-                        index=["Manager", "Waiter", "Chef", "Cashier"].index(employee['Role'])
-                    )
-                    active = st.checkbox("Active", value=employee['Active'])
-                    
-                    if st.form_submit_button("Update Staff"):
-                        if update_staff_member(employee['Staff_ID'], username, role, active):
-                            st.success("Staff member updated successfully!")
-                            st.rerun()
+        col1, col2 = st.columns(2)
+        name_prefix = col1.text_input("Search by username", key="staff_search").strip()
+        role = col2.selectbox("Role", ["All", "Manager", "Waiter", "Chef", "Cashier"])
+        staff = show_list_page(
+            "staff",
+            get_staff_page,
+            {"name_prefix": name_prefix or None, "role": None if role == "All" else role},
+            ["Username", "Role", "Name", "Active"],
+        )
+        employee = select_list_row(
+            "staff", staff, lambda employee: f"{employee['Username']} - {employee['Role']}"
+        )
+        if employee:
+            with st.form(f"edit_staff_{employee['Staff_ID']}"):
+                username = st.text_input("Username", employee['Username'])
+                role = st.selectbox(
+                    "Role",
+                    ["Manager", "Waiter", "Chef", "Cashier"],
+                    index=["Manager", "Waiter", "Chef", "Cashier"].index(employee['Role'])
+                )
+                active = st.checkbox("Active", value=bool(employee['Active']))
+
+                if st.form_submit_button("Update Staff"):
+                    if update_staff_member(employee['Staff_ID'], username, role, active):
+                        st.success("Staff member updated successfully!")
+                        st.rerun()
     
     with tab2:
         with st.form("add_new_staff"):
@@ -816,26 +4524,35 @@ def show_staff_management():
 def show_inventory_management():
     st.subheader("Inventory Management")
     
-    tab1, tab2 = st.tabs(["Current Inventory", "Add New Item"])
+    tab1, tab2, tab3 = st.tabs(["Current Inventory", "Add New Item", "Recipes"])
     
     with tab1:
-        inventory = get_inventory_items()
-        for item in inventory:
-            # We no longer use Inventory_ID, so the form and dynamic naming can be simpler
-            with st.expander(f"{item['Item_Name']} - Stock: {item['Current_Stock']}"):
-                with st.form(f"edit_inventory_{item['Item_Name']}"):  # Use Item_Name for dynamic form name
-                    quantity = st.number_input("Current Stock", value=item['Current_Stock'], min_value=0)
-                    reorder_level = st.number_input("Reorder Level", value=item['Reorder_Level'], min_value=0)
-                    
-                    if st.form_submit_button("Update Stock"):
-                        if update_inventory_item(item['Item_Name'], quantity, reorder_level):
-                            st.success("Inventory updated successfully!")
-                            st.rerun()
+        col1, col2 = st.columns(2)
+        name_prefix = col1.text_input("Search by name", key="inventory_search").strip()
+        low_stock_only = col2.checkbox("Low stock only")
+        inventory = show_list_page(
+            "inventory",
+            get_inventory_page,
+            {"name_prefix": name_prefix or None, "low_stock_only": low_stock_only},
+            ["Item_Name", "Current_Stock", "Reorder_Level", "Unit"],
+        )
+        item = select_list_row(
+            "inventory", inventory, lambda item: f"{item['Item_Name']} - Stock: {item['Current_Stock']}"
+        )
+        if item:
+            with st.form(f"edit_inventory_{item['Inventory_Id']}"):
+                quantity = st.number_input("Current Stock", value=float(item['Current_Stock']), min_value=0.0)
+                reorder_level = st.number_input("Reorder Level", value=item['Reorder_Level'], min_value=0)
+
+                if st.form_submit_button("Update Stock"):
+                    if update_inventory_item(item['Inventory_Id'], quantity, reorder_level):
+                        st.success("Inventory updated successfully!")
+                        st.rerun()
     
     with tab2:
         with st.form("add_inventory_item"):
             name = st.text_input("Item Name")
-            quantity = st.number_input("Initial Stock", min_value=0)
+            quantity = st.number_input("Initial Stock", min_value=0.0)
             reorder_level = st.number_input("Reorder Level", min_value=0)
             
             if st.form_submit_button("Add Item"):
@@ -843,6 +4560,49 @@ def show_inventory_management():
                     st.success("New inventory item added successfully!")
                     st.rerun()
 
+    with tab3:
+        pending = get_pending_depletions()
+        if pending:
+            st.caption(f"{pending} completed orders waiting to come out of stock")
+
+        menu_items = get_menu_items()
+        if not menu_items:
+            st.info("No menu items yet.")
+            return
+        menu_item = st.selectbox(
+            "Menu item", menu_items, format_func=lambda item: item['Item_Name'], key="recipe_item"
+        )
+        recipe = get_recipe(menu_item['Item_Id'])
+        if recipe:
+            for line in recipe:
+                col1, col2 = st.columns([4, 1])
+                col1.write(
+                    f"{line['Item_Name']}: {line['Quantity']:g} {line['Unit'] or ''}"
+                    f" ({line['Stock_Quantity']:g} {line['Stock_Unit'] or ''} of stock)"
+                )
+                if col2.button("Remove", key=f"remove_recipe_{menu_item['Item_Id']}_{line['Inventory_Id']}"):
+                    if remove_recipe_item(menu_item['Item_Id'], line['Inventory_Id']):
+                        st.rerun()
+        else:
+            st.info("No ingredients recorded for this item.")
+
+        search = st.text_input("Find ingredient", key="recipe_search").strip()
+        ingredients, _ = get_inventory_page(name_prefix=search or None)
+        if ingredients:
+            with st.form("set_recipe_item"):
+                ingredient = st.selectbox(
+                    "Ingredient",
+                    ingredients,
+                    format_func=lambda item: f"{item['Item_Name']} ({item['Unit'] or 'no unit'})",
+                )
+                col1, col2 = st.columns(2)
+                quantity = col1.number_input("Quantity per portion", min_value=0.0, step=0.5)
+                unit = col2.selectbox("Unit", [""] + list(UNITS))
+                if st.form_submit_button("Save Ingredient"):
+                    if set_recipe_item(menu_item['Item_Id'], ingredient['Inventory_Id'], quantity, unit):
+                        st.success("Recipe updated")
+                        st.rerun()
+
 
 def waiter_portal():
     st.title("Waiter Portal")
@@ -866,24 +4626,35 @@ def waiter_portal():
             format_func=lambda x: f"Table {x['Table_Id']} - {x['table_status']}",
         )
 
+        user_data = st.session_state["user_data"]
+        staff_id = user_data.get("Staff_ID") or get_staff_id(user_data["Name"])
+        if not staff_id:
+            st.error("Your account is not registered as a staff member")
+            return
+        user_data["Staff_ID"] = staff_id
+
         # Fetch menu items
         menu_items = get_menu_items()
-        with st.form("order_form"):
+        item_names = {item["Item_Id"]: item["Item_Name"] for item in menu_items}
+        with st.form("order_form", clear_on_submit=True):
+            quantities = {}
             for item in menu_items:
-                quantity = st.number_input(
+                quantities[item["Item_Id"]] = st.number_input(
                     f"{item['Item_Name']} (₹{item['Price']})", min_value=0, step=1, key=item['Item_Name']
                 )
             submit = st.form_submit_button("Place Order")
             if submit:
-                for item in menu_items:
-                    quantity = st.session_state.get(item['Item_Name'], 0)
-                    if quantity > 0:
-                        success, order_id = create_order(table["Table_Id"], item["Item_Name"], quantity)
-                        if success:
-                            st.success(f"Order #{order_id} for {item['Item_Name']} placed successfully")
-                        else:
-                            st.error(f"Error placing order for {item['Item_Name']}: {order_id}")
-                st.rerun()
+                cart = {item_id: int(qty) for item_id, qty in quantities.items() if qty > 0}
+                if not cart:
+                    st.warning("Add at least one item to the order")
+                else:
+                    key = submit_order(table["Table_Id"], staff_id, cart)
+                    st.session_state.setdefault("submitted_orders", []).append(
+                        {"key": key, "table_id": table["Table_Id"]}
+                    )
+                    st.success(f"Order for table {table['Table_Id']} sent")
+
+        show_submitted_orders(item_names)
 
     elif menu == "View Orders":
         conn = get_database_connection()
@@ -921,204 +4692,1159 @@ def waiter_portal():
         tables = get_table_status()
         st.dataframe(tables)
 
-def chef_portal():
-    st.title("Kitchen Display System")
+def show_submitted_orders(item_names):
+    """Show what became of the orders this waiter sent through the write journal."""
+    submitted = st.session_state.get("submitted_orders", [])[-10:]
+    if not submitted:
+        return
+    st.subheader("Recent Orders")
+    journal = get_write_journal()
+    for order in reversed(submitted):
+        entry = journal.entry(order["key"])
+        if entry is None:
+            continue
+        if entry["status"] == "pending":
+            note = f" (retrying: {entry['last_error']})" if entry["last_error"] else ""
+            st.info(f"Table {order['table_id']}: sending{note}")
+        elif entry["status"] == "rejected":
+            st.error(f"Table {order['table_id']}: not placed - {entry['last_error']}")
+        else:
+            lines = entry["details"] or []
+            added = sum(1 for line in lines if line["Status"] == "Added")
+            st.success(f"Table {order['table_id']}: order #{entry['result_id']} placed with {added} item(s)")
+            for line in lines:
+                if line["Status"] != "Added":
+                    st.warning(f"{item_names.get(line['Item_ID'], line['Item_ID'])}: {line['Reason']}")
+
+
+def journal_outcomes(state_key, limit=10) -> Dict:
+    """
+    Latest journal entry for each order this session sent a write for.
+
+    The writes are kept in session state under state_key: every one still
+    pending, plus the most recent `limit`.
+
+    Returns:
+        Order_ID -> (write, entry), where write is what the caller stored
+        and entry is WriteJournal.entry() for it (None once pruned).
+    """
+    journal = get_write_journal()
+    submitted = st.session_state.setdefault(state_key, [])
+    outcomes = [(write, journal.entry(write["key"])) for write in submitted]
+    outcomes = [
+        (write, entry) for write, entry in outcomes[:-limit] if entry and entry["status"] == "pending"
+    ] + outcomes[-limit:]
+    submitted[:] = [write for write, _ in outcomes]
+    return {write["order_id"]: (write, entry) for write, entry in outcomes}
+
+
+def chef_portal():
+    st.title("Kitchen Display System")
+
+    # Each kitchen screen keeps its own ticket list and watermark
+    if "kitchen_feed" not in st.session_state:
+        st.session_state["kitchen_feed"] = KitchenFeed(**KDS_CONFIG)
+
+    # Active orders display
+    st.header("Active Orders")
+    show_kitchen_tickets()
+
+
+@st.fragment(run_every=KDS_CONFIG["poll_interval"])
+def show_kitchen_tickets():
+    feed = st.session_state["kitchen_feed"]
+    feed.poll()
+
+    # Tickets marked ready here stay hidden while the change is in the
+    # journal, and come back if it is rejected
+    pending = feed.pending_tickets()
+    pending_ids = {order["Order_ID"] for order in pending}
+    outcomes = journal_outcomes("submitted_statuses")
+    hidden = set()
+    for order_id, (write, entry) in outcomes.items():
+        if order_id not in pending_ids or entry is None:
+            continue
+        if entry["status"] == "rejected":
+            st.error(f"Order #{order_id}: not marked {write['status']} - {entry['last_error']}")
+        else:
+            hidden.add(order_id)
+            if entry["status"] == "pending" and entry["last_error"]:
+                st.warning(f"Order #{order_id}: marking {write['status']} (retrying: {entry['last_error']})")
+    tickets = [order for order in pending if order["Order_ID"] not in hidden]
+    if not tickets:
+        st.info("No pending orders")
+    for order in tickets:
+        with st.container():
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                st.write(
+                    f"Order #{order['Order_ID']} - Table {order['Table_ID']}"
+                )
+                st.write(f"Time: {order['Order_Time']}")
+                st.write(f"Items: {order['Items']}")
+            with col2:
+                if st.button("Mark Ready", key=f"ready_{order['Order_ID']}"):
+                    key = submit_order_status(order["Order_ID"], "Ready")
+                    st.session_state["submitted_statuses"].append(
+                        {"key": key, "order_id": order["Order_ID"], "status": "Ready"}
+                    )
+                    st.rerun(scope="fragment")
+
+    stats = feed.get_stats()
+    st.caption(
+        f"Feed lag avg {stats['lag_avg']:.2f}s, max {stats['lag_max']:.2f}s "
+        f"- last poll {stats['last_poll_rows']} rows in {stats['last_poll_ms']:.0f} ms"
+        + ("" if stats["transactions_checked"] else " - open transactions not checked (needs PROCESS)")
+    )
+
+
+def cashier_portal():
+    st.title("Cashier Portal")
+
+    # Show active tables with orders
+    # Bills paid here stay hidden while the payment is in the journal, and
+    # come back if it is rejected
+    outcomes = journal_outcomes("submitted_payments")
+    paid = {
+        order_id
+        for order_id, (_, entry) in outcomes.items()
+        if entry is not None and entry["status"] != "rejected"
+    }
+    bills = [bill for bill in get_open_bills() if bill["Order_ID"] not in paid]
+
+    if bills:
+        for bill in bills:
+            with st.expander(
+                f"Table {bill['Table_Id']} - Order #{bill['Order_ID']}"
+            ):
+                if not bill["Items"]:
+                    st.warning("No items found for this order")
+                    continue
+
+                # Display order items
+                for item in bill["Items"]:
+                    st.write(
+                        f"{item['Item_Name']} x{item['Quantity']} = ₹{item['Subtotal']}"
+                    )
+
+                st.write(f"**Total: ₹{bill['Total']}**")
+
+                col1, col2 = st.columns(2)
+                payment_method = col1.selectbox(
+                    "Payment Method",
+                    ["Cash", "Card", "UPI"],
+                    key=f"payment_{bill['Order_ID']}",
+                )
+
+                if col2.button(
+                    "Process Payment", key=f"pay_{bill['Order_ID']}"
+                ):
+                    key = submit_payment(bill["Table_Id"], bill["Order_ID"], payment_method)
+                    st.session_state["submitted_payments"].append(
+                        {"key": key, "order_id": bill["Order_ID"], "table_id": bill["Table_Id"]}
+                    )
+                    st.rerun()
+    else:
+        st.info("No active orders to process")
+
+    show_submitted_payments(outcomes)
+
+
+def show_submitted_payments(outcomes):
+    """Show what became of the payments this cashier sent through the write journal."""
+    if not outcomes:
+        return
+    st.subheader("Recent Payments")
+    for order_id, (payment, entry) in reversed(list(outcomes.items())):
+        if entry is None:
+            continue
+        label = f"Table {payment['table_id']} - Order #{order_id}"
+        if entry["status"] == "pending":
+            note = f" (retrying: {entry['last_error']})" if entry["last_error"] else ""
+            st.info(f"{label}: recording payment{note}")
+        elif entry["status"] == "rejected":
+            st.error(f"{label}: payment not recorded - {entry['last_error']}")
+        else:
+            st.success(f"{label}: payment recorded")
+
+
+# Billing Functions
+def get_open_bills() -> List[Dict]:
+    """
+    Fetch the bill for every occupied table in one query.
+
+    Returns:
+        List of bills ordered by table, each with Table_Id, Order_ID,
+        Items (Item_Name, Price, Quantity, Subtotal) and Total.
+    """
+    conn = get_database_connection()
+    if not conn:
+        return []
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT 
+                t.Table_Id,
+                t.Current_Order_ID,
+                mi.Item_Name,
+                mi.Price,
+                oi.Quantity,
+                (mi.Price * oi.Quantity) as Subtotal
+            FROM Tables t
+            LEFT JOIN Order_Items oi ON oi.Order_ID = t.Current_Order_ID
+            LEFT JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+            WHERE t.table_status = 'Occupied'
+            ORDER BY t.Table_Id, mi.Item_Name
+        """
+        )
+        bills = {}
+        for row in cursor.fetchall():
+            bill = bills.setdefault(
+                row["Table_Id"],
+                {"Table_Id": row["Table_Id"], "Order_ID": row["Current_Order_ID"], "Items": [], "Total": 0},
+            )
+            if row["Item_Name"] is not None:
+                bill["Items"].append(
+                    {
+                        "Item_Name": row["Item_Name"],
+                        "Price": row["Price"],
+                        "Quantity": row["Quantity"],
+                        "Subtotal": row["Subtotal"],
+                    }
+                )
+                bill["Total"] += row["Subtotal"]
+        return list(bills.values())
+    except mysql.connector.Error as error:
+        st.error(f"Error fetching open bills: {error}")
+        return []
+    finally:
+        conn.close()
+
+
+def process_payment(table_id, order_id, payment_method):
+    conn = get_database_connection()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        settle_payment(cursor, table_id, order_id, payment_method)
+        conn.commit()
+        get_query_cache().invalidate("tables")
+        get_stock_depleter().wake()
+        return True
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error processing payment: {error}")
+        return False
+    finally:
+        conn.close()
+
+
+def settle_payment(cursor, table_id, order_id, payment_method):
+    """Record a payment, complete its order and free the table, without committing."""
+    cursor.execute(
+        """
+        INSERT INTO Payment (Order_Id, Payment_Method, Payment_Status, Total_Amount)
+        SELECT Order_ID, %s, 'Paid', Total_Amount FROM Orders WHERE Order_ID = %s
+    """,
+        (payment_method, order_id),
+    )
+
+    # Update order status
+    cursor.execute(
+        """
+        UPDATE Orders 
+        SET Order_Status = 'Completed'
+        WHERE Order_ID = %s
+    """,
+        (order_id,),
+    )
+
+    # Update table status
+    cursor.execute(
+        """
+        UPDATE Tables 
+        SET table_status = 'Available', Current_Order_ID = NULL
+        WHERE Table_Id = %s
+    """,
+        (table_id,),
+    )
+
+
+# Kitchen Display Feed
+ORDER_CHANGES_SQL = """
+    SELECT o.Order_ID, o.Table_ID, o.Order_Time, o.Order_Status, o.Updated_At,
+           GROUP_CONCAT(CONCAT(mi.Item_Name, ' x', oi.Quantity)) as Items,
+           NOW(6) as Seen_At
+    FROM Orders o
+    LEFT JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
+    LEFT JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+    WHERE {where}
+    GROUP BY o.Order_ID
+    ORDER BY {order}
+    LIMIT %s
+"""
+# Pages are keyed on (Updated_At, Order_ID): one statement can stamp many
+# orders with the same time, so Updated_At alone would skip some of them
+ORDER_CHANGES_SINCE_SQL = ORDER_CHANGES_SQL.replace(
+    "{where}", "o.Updated_At > %s OR (o.Updated_At = %s AND o.Order_ID > %s)"
+).replace("{order}", "o.Updated_At, o.Order_ID")
+PENDING_ORDERS_SQL = ORDER_CHANGES_SQL.replace(
+    "{where}", "o.Order_Status = 'Pending' AND o.Order_ID > %s"
+).replace("{order}", "o.Order_ID")
+
+# Updated_At is stamped when the statement runs, not when it commits, so a
+# change can become visible with a stamp older than rows already read. Any
+# such change belongs to a transaction open now, and its stamp is no older
+# than that transaction's start.
+CHANGE_FEED_BOUND_SQL = """
+    SELECT NOW(6) as Server_Time,
+           (SELECT MIN(trx_started) FROM information_schema.INNODB_TRX
+            WHERE trx_rows_locked > 0 OR trx_rows_modified > 0) as Oldest_Write
+"""
+
+
+def get_order_changes(since=None, limit=500, after_id=0) -> Optional[List[Dict]]:
+    """
+    Fetch orders changed at or after a watermark, oldest change first.
+
+    Args:
+        since: Orders.Updated_At watermark. None returns a snapshot of the
+            pending orders instead, for a screen that is starting up.
+        limit: Maximum number of orders to return
+        after_id: Paging key; skips orders stamped exactly `since` (or, for
+            the snapshot, any order) with an Order_ID up to this one
+
+    Returns:
+        Orders with Order_Status, Items, Updated_At and Seen_At (the server
+        time of the read), or None on error.
+    """
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        if since is None:
+            cursor = conn.prepared(PENDING_ORDERS_SQL, dictionary=True)
+            cursor.execute((after_id, limit))
+        else:
+            cursor = conn.prepared(ORDER_CHANGES_SINCE_SQL, dictionary=True)
+            cursor.execute((since, since, after_id, limit))
+        return cursor.fetchall()
+    except mysql.connector.Error as error:
+        st.error(f"Error fetching order changes: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+def get_change_feed_bound(check_transactions=True) -> Optional[Tuple[datetime, bool]]:
+    """
+    Latest watermark a change-feed read starting now can safely move to.
+
+    This is the server time, held back to the start of the oldest open
+    transaction that has locked or changed rows, since that transaction may
+    still commit changes stamped before the read. Looking at open
+    transactions needs the PROCESS privilege; without it the server time is
+    returned unchecked.
+
+    Returns:
+        (bound, checked) where checked says open transactions were taken
+        into account, or None on error.
+    """
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        if check_transactions:
+            try:
+                cursor.execute(CHANGE_FEED_BOUND_SQL)
+                row = cursor.fetchone()
+                bound = row["Server_Time"]
+                if row["Oldest_Write"] is not None:
+                    bound = min(bound, row["Oldest_Write"])
+                return bound, True
+            except mysql.connector.Error as error:
+                if error.errno != errorcode.ER_SPECIFIC_ACCESS_DENIED_ERROR:
+                    raise
+        cursor.execute("SELECT NOW(6) as Server_Time")
+        return cursor.fetchone()["Server_Time"], False
+    except mysql.connector.Error as error:
+        st.error(f"Error fetching order changes: {error}")
+        return None
+    finally:
+        conn.close()
+
+
+class KitchenFeed:
+    """
+    Pending kitchen tickets held locally and kept current from get_order_changes.
+
+    The first poll loads every pending order; later polls only ask for orders
+    whose Updated_At is past the watermark, re-reading `overlap` seconds behind
+    it. The watermark never moves past the start of the oldest write
+    transaction still open when a poll began (see get_change_feed_bound), so
+    an order stamped before a slow transaction commits is still picked up.
+    Orders that leave Pending are dropped from the list.
+    """
 
-    # Active orders display
-    st.header("Active Orders")
+    def __init__(self, poll_interval: float = 2.0, overlap: float = 2.0, batch_size: int = 500):
+        self.poll_interval = poll_interval
+        self.overlap = timedelta(seconds=overlap)
+        self.batch_size = batch_size
+        self.tickets = {}  # Order_ID -> latest row
+        self.watermark = None
+        self._check_transactions = True  # cleared when PROCESS is not granted
+        self._last_poll = 0.0
+        self._lags = deque(maxlen=500)
+        self._stats = {"polls": 0, "rows_fetched": 0, "last_poll_rows": 0, "last_poll_ms": 0.0}
+
+    def poll(self, force=False) -> bool:
+        """
+        Merge changes since the watermark into the ticket list.
+
+        Returns False without querying when the last poll was less than
+        poll_interval ago (unless force is set) or when the query fails.
+        """
+        if not force and time.monotonic() - self._last_poll < self.poll_interval:
+            return False
+        self._last_poll = time.monotonic()
+        started = time.perf_counter()
+
+        # Taken before reading, so anything committed after it is stamped
+        # no earlier than the bound and is caught by the next poll
+        bound = get_change_feed_bound(self._check_transactions)
+        if bound is None:
+            return False
+        bound, self._check_transactions = bound
+
+        initial = self.watermark is None
+        since = None if initial else self.watermark - self.overlap
+        after_id = 0
+        fetched = 0
+        latest = None
+        while True:
+            rows = get_order_changes(since, self.batch_size, after_id)
+            if rows is None:
+                return False
+            fetched += len(rows)
+            self._merge(rows, record_lag=not initial)
+            if rows and not initial:
+                latest = rows[-1]["Updated_At"]
+            if len(rows) < self.batch_size:
+                break
+            if not initial:
+                since = rows[-1]["Updated_At"]
+            after_id = rows[-1]["Order_ID"]
+
+        # With open transactions checked the bound is safe as it is. Without,
+        # stay at the newest change read so the overlap is measured from there.
+        if initial or self._check_transactions:
+            self.watermark = bound
+        elif latest is not None:
+            self.watermark = min(max(self.watermark, latest), bound)
+        self._stats["polls"] += 1
+        self._stats["rows_fetched"] += fetched
+        self._stats["last_poll_rows"] = fetched
+        self._stats["last_poll_ms"] = (time.perf_counter() - started) * 1000
+        return True
+
+    def _merge(self, rows, record_lag):
+        for row in rows:
+            known = self.tickets.get(row["Order_ID"])
+            is_new = known is None or known["Updated_At"] != row["Updated_At"]
+            if row["Order_Status"] == "Pending":
+                self.tickets[row["Order_ID"]] = row
+            else:
+                is_new = self.tickets.pop(row["Order_ID"], None) is not None
+            if is_new and record_lag:
+                self._lags.append((row["Seen_At"] - row["Updated_At"]).total_seconds())
+
+    def pending_tickets(self) -> List[Dict]:
+        return sorted(self.tickets.values(), key=lambda t: t["Order_Time"])
+
+    def get_stats(self) -> Dict:
+        """Poll counters plus write-to-display lag (seconds) over recent changes."""
+        lags = sorted(self._lags)
+        stats = dict(self._stats)
+        stats["tickets"] = len(self.tickets)
+        stats["watermark"] = self.watermark
+        stats["transactions_checked"] = self._check_transactions
+        stats["lag_avg"] = sum(lags) / len(lags) if lags else 0.0
+        stats["lag_p95"] = lags[int(len(lags) * 0.95)] if lags else 0.0
+        stats["lag_max"] = lags[-1] if lags else 0.0
+        return stats
+
+
+# Order Management Functions
+def update_order_status(order_id, status) -> Optional[bool]:
+    """Set an order's status: True if done, False if there is no such order, None on error."""
     conn = get_database_connection()
-    if conn:
-        try:
-            cursor = conn.cursor(dictionary=True)
-            cursor.execute(
-                """
-                SELECT o.Order_ID, o.Table_ID, o.Order_Time,
-                       GROUP_CONCAT(CONCAT(mi.Item_Name, ' x', oi.Quantity)) as Items
-                FROM Orders o
-                JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
-                JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-                WHERE o.Order_Status = 'Pending'
-                GROUP BY o.Order_ID
-                ORDER BY o.Order_Time
-            """
-            )
-            orders = cursor.fetchall()
-
-            if not orders:
-                st.info("No pending orders")
-                return
-
-            for order in orders:
-                with st.container():
-                    col1, col2 = st.columns([3, 1])
-                    with col1:
-                        st.write(
-                            f"Order #{order['Order_ID']} - Table {order['Table_ID']}"
-                        )
-                        st.write(f"Time: {order['Order_Time']}")
-                        st.write(f"Items: {order['Items']}")
-                    with col2:
-                        if st.button("Mark Ready", key=f"ready_{order['Order_ID']}"):
-                            try:
-                                cursor.execute(
-                                    """
-                                    UPDATE Orders 
-                                    SET Order_Status = 'Ready' 
-                                    WHERE Order_ID = %s
-                                """,
-                                    (order["Order_ID"],),
-                                )
-                                conn.commit()
-                                st.success("Order marked as ready")
-                                st.experimental_rerun()
-                            except Exception as e:
-                                st.error(f"Error updating order status: {e}")
-        except Exception as e:
-            st.error(f"Error fetching orders: {e}")
-        finally:
-            conn.close()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        if not set_order_status(cursor, order_id, status):
+            conn.rollback()
+            return False
+        conn.commit()
+        if status in ("Ready", "Completed"):
+            get_stock_depleter().wake()
+        return True
+    except mysql.connector.Error as error:
+        st.error(f"Error updating order status: {error}")
+        return None
+    finally:
+        conn.close()
 
-def cashier_portal():
-    st.title("Cashier Portal")
 
-    # Show active tables with orders
-    tables = get_table_status()
-    occupied_tables = [t for t in tables if t["table_status"] == "Occupied"]
+def set_order_status(cursor, order_id, status) -> bool:
+    """Set an order's status on an open transaction; False if there is no such order."""
+    cursor.execute(
+        """
+        UPDATE Orders 
+        SET Order_Status = %s 
+        WHERE Order_ID = %s
+    """,
+        (status, order_id),
+    )
+    if cursor.rowcount:
+        return True
+    # An order already in this status changes no rows
+    cursor.execute("SELECT 1 FROM Orders WHERE Order_ID = %s", (order_id,))
+    return bool(cursor.fetchall())
 
-    if occupied_tables:
-        for table in occupied_tables:
-            with st.expander(
-                f"Table {table['Table_Id']} - Order #{table['Current_Order_ID']}"
-            ):
-                conn = get_database_connection()
-                if conn:
-                    try:
-                        cursor = conn.cursor(dictionary=True)
-                        # Get order details
-                        cursor.execute(
-                            """
-                            SELECT 
-                                mi.Item_Name,
-                                mi.Price,
-                                oi.Quantity,
-                                (mi.Price * oi.Quantity) as Subtotal
-                            FROM Order_Items oi
-                            JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-                            WHERE oi.Order_ID = %s
-                        """,
-                            (table["Current_Order_ID"],),
-                        )
-                        items = cursor.fetchall()
 
-                        if not items:
-                            st.warning("No items found for this order")
-                            continue
+def recalculate_order_totals(cursor, order_ids: List[int]):
+    """
+    Set Total_Amount for the given orders from their items in one statement.
 
-                        # Display order items
-                        total = 0
-                        for item in items:
-                            st.write(
-                                f"{item['Item_Name']} x{item['Quantity']} = ₹{item['Subtotal']}"
-                            )
-                            total += item["Subtotal"]
+    This is the statement-level counterpart of the calculate_order_total*
+    triggers, used after batched writes run with @bulk_order_items set.
+    """
+    if not order_ids:
+        return
+    placeholders = ", ".join(["%s"] * len(order_ids))
+    cursor.execute(
+        f"""
+        UPDATE Orders o
+        LEFT JOIN (
+            SELECT oi.Order_ID, SUM(oi.Quantity * mi.Price) AS Total
+            FROM Order_Items oi
+            JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+            WHERE oi.Order_ID IN ({placeholders})
+            GROUP BY oi.Order_ID
+        ) t ON t.Order_ID = o.Order_ID
+        SET o.Total_Amount = COALESCE(t.Total, 0),
+            o.Updated_At = CURRENT_TIMESTAMP(6)
+        WHERE o.Order_ID IN ({placeholders})
+    """,
+        list(order_ids) + list(order_ids),
+    )
 
-                        st.write(f"**Total: ₹{total}**")
 
-                        col1, col2 = st.columns(2)
-                        payment_method = col1.selectbox(
-                            "Payment Method",
-                            ["Cash", "Card", "UPI"],
-                            key=f"payment_{table['Current_Order_ID']}",
-                        )
+session_logger = logging.getLogger("restaurant.session")
 
-                        if col2.button(
-                            "Process Payment", key=f"pay_{table['Current_Order_ID']}"
-                        ):
-                            try:
-                                # Update order status
-                                cursor.execute(
-                                    """
-                                    UPDATE Orders 
-                                    SET Order_Status = 'Completed', 
-                                        Payment_Status = 'Paid',
-                                        Payment_Method = %s
-                                    WHERE Order_ID = %s
-                                """,
-                                    (payment_method, table["Current_Order_ID"]),
-                                )
 
-                                # Update table status
-                                cursor.execute(
-                                    """
-                                    UPDATE Tables 
-                                    SET table_status = 'Available', Current_Order_ID = NULL
-                                    WHERE Table_Id = %s
-                                """,
-                                    (table["Table_Id"],),
-                                )
+def clear_session_flag(cursor, name):
+    """
+    Unset a session flag such as @bulk_order_items, from a finally block.
 
-                                conn.commit()
-                                st.success("Payment processed successfully")
-                                st.experimental_rerun()
-                            except Exception as e:
-                                st.error(f"Error processing payment: {e}")
-                    except Exception as e:
-                        st.error(f"Error fetching order details: {e}")
-                    finally:
-                        conn.close()
-    else:
-        st.info("No active orders to process")
+    A failure is logged rather than raised so that it cannot replace the
+    error that ended the block (a dropped connection fails both); the pool
+    resets the session anyway when the connection is returned.
+    """
+    try:
+        cursor.execute(f"SET {name} = NULL")
+    except mysql.connector.Error as error:
+        session_logger.warning("could not clear %s: %s", name, error)
+
+
+def check_order_totals(start_date, end_date, repair=False) -> Optional[List[Dict]]:
+    """
+    Recompute order totals for a date range and report drift.
+
+    The triggers maintain Total_Amount incrementally at the menu price in
+    effect at the time of each change, so a price edit between two changes
+    to the same order leaves the stored total out of step with a full
+    recomputation.
+
+    Args:
+        start_date: First order date to check (inclusive)
+        end_date: Last order date to check (inclusive)
+        repair: Overwrite drifted totals with the recomputed values
+
+    Returns:
+        List of drifted orders with Stored_Total, Computed_Total and Drift,
+        or None on error.
+    """
+    conn = get_database_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(
+            """
+            SELECT o.Order_ID, o.Order_Time,
+                   o.Total_Amount AS Stored_Total,
+                   COALESCE(SUM(oi.Quantity * mi.Price), 0) AS Computed_Total
+            FROM Orders o
+            LEFT JOIN Order_Items oi ON o.Order_ID = oi.Order_ID
+            LEFT JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+            WHERE o.Order_Time >= %s AND o.Order_Time < %s
+            GROUP BY o.Order_ID
+            HAVING COALESCE(Stored_Total, 0) <> Computed_Total
+            ORDER BY o.Order_ID
+        """,
+            (start_date, end_date + timedelta(days=1)),
+        )
+        drifted = cursor.fetchall()
+        for row in drifted:
+            row["Drift"] = (row["Stored_Total"] or 0) - row["Computed_Total"]
+
+        if repair and drifted:
+            order_ids = [row["Order_ID"] for row in drifted]
+            for i in range(0, len(order_ids), 500):
+                recalculate_order_totals(cursor, order_ids[i : i + 500])
+            conn.commit()
+        return drifted
+    except mysql.connector.Error as error:
+        st.error(f"Error checking order totals: {error}")
+        return None
+    finally:
+        conn.close()
 
 
 def create_order(
-    table_id: int, staff_id: int, order_items: Dict[int, int]
-) -> Tuple[bool, Optional[int]]:
+    table_id: int, staff_id: int, order_items: Dict[int, int], write_key: Optional[str] = None
+) -> Tuple[bool, Optional[int], List[Dict]]:
     """
-    Create a new order in the database.
+    Create a new order with all of its items in a single transaction.
+
+    The items are validated against Menu_Items in one query, written to
+    Order_Items with one batched insert and totalled with one update. Lines that fail validation are
+    reported back and left out; the order is only created if at least one
+    line is valid.
 
     Args:
         table_id: The ID of the table
         staff_id: The ID of the staff member
         order_items: Dictionary mapping item IDs to quantities
+        write_key: Idempotency key (see apply_once). A retry with the key of
+            an order already created returns that order and its items
+            instead of creating another.
 
     Returns:
-        Tuple of (success: bool, order_id: Optional[int])
+        Tuple of (success: bool, order_id: Optional[int], lines: List[Dict])
+        where each line has Item_ID, Quantity, Status ('Added', 'Rejected'
+        or 'Failed') and Reason.
     """
+    if not order_items:
+        return False, None, []
+
     conn = get_database_connection()
     if not conn:
-        return False, None
+        lines = [
+            {"Item_ID": item_id, "Quantity": quantity, "Status": "Failed", "Reason": "No database connection"}
+            for item_id, quantity in order_items.items()
+        ]
+        return False, None, lines
 
     try:
-        cursor = conn.cursor()
+        cursor = conn.cursor(dictionary=True)
+        if write_key is None:
+            order_id, lines = insert_order(cursor, table_id, staff_id, order_items)
+        else:
+            order_id, lines, applied = apply_once(
+                cursor,
+                write_key,
+                "order",
+                lambda cursor: insert_order(cursor, table_id, staff_id, order_items),
+            )
+            if not applied:
+                conn.rollback()
+                cursor.execute("SELECT Item_ID, Quantity FROM Order_Items WHERE Order_ID = %s", (order_id,))
+                lines = [dict(line, Status="Added", Reason=None) for line in cursor.fetchall()]
+                return True, order_id, lines
+        if order_id is None:
+            conn.rollback()
+            return False, None, lines
+        conn.commit()
+        return True, order_id, lines
+    except mysql.connector.Error as error:
+        conn.rollback()
+        st.error(f"Error creating order: {error}")
+        lines = [
+            {"Item_ID": item_id, "Quantity": quantity, "Status": "Failed", "Reason": str(error)}
+            for item_id, quantity in order_items.items()
+        ]
+        return False, None, lines
+    finally:
+        conn.close()
 
-        # Create order
-        cursor.execute(
+
+MENU_AVAILABILITY_SQL = "SELECT Item_Id, Available FROM Menu_Items WHERE Item_Id IN ({in_list})"
+ORDER_ITEMS_INSERT_SQL = "INSERT INTO Order_Items (Order_ID, Item_ID, Quantity) VALUES {values}"
+# Longest item list with its own prepared statement; bigger orders go in chunks
+ORDER_ITEMS_PREPARED_MAX = 16
+
+
+def insert_order(cursor, table_id, staff_id, order_items, order_time=None) -> Tuple[Optional[int], List[Dict]]:
+    """
+    Validate and insert an order on an open transaction, without committing.
+
+    Args:
+        cursor: Dictionary cursor on the transaction's connection
+        table_id: The ID of the table
+        staff_id: The ID of the staff member
+        order_items: Dictionary mapping item IDs to quantities
+        order_time: When the order was taken; now if None
+
+    Returns:
+        (order_id, lines) as for create_order; order_id is None if no line
+        was valid and nothing was written.
+    """
+    lines = [
+        {"Item_ID": item_id, "Quantity": quantity, "Status": None, "Reason": None}
+        for item_id, quantity in order_items.items()
+    ]
+    conn = cursor.connection
+    if lines:
+        item_ids = [line["Item_ID"] for line in lines]
+        menu = {}
+        for start in range(0, len(item_ids), ORDER_ITEMS_PREPARED_MAX):
+            chunk = item_ids[start : start + ORDER_ITEMS_PREPARED_MAX]
+            lookup = conn.prepared(in_list_sql(MENU_AVAILABILITY_SQL, len(chunk)), dictionary=True)
+            lookup.execute(chunk)
+            menu.update((row["Item_Id"], row) for row in lookup.fetchall())
+
+        for line in lines:
+            item = menu.get(line["Item_ID"])
+            if not isinstance(line["Quantity"], int) or line["Quantity"] <= 0:
+                line.update(Status="Rejected", Reason="Quantity must be a positive integer")
+            elif item is None:
+                line.update(Status="Rejected", Reason="Unknown menu item")
+            elif not item["Available"]:
+                line.update(Status="Rejected", Reason="Item is unavailable")
+
+    valid_lines = [line for line in lines if line["Status"] is None]
+    if not valid_lines:
+        return None, lines
+
+    # Create order
+    cursor.execute(
+        """
+        INSERT INTO Orders (Table_ID, Staff_ID, Order_Status, Order_Time)
+        VALUES (%s, %s, 'Pending', COALESCE(%s, NOW()))
+    """,
+        (table_id, staff_id, order_time),
+    )
+    order_id = cursor.lastrowid
+
+    # Create order items with one multi-row prepared insert per chunk. The
+    # per-row total triggers stand down while @bulk_order_items is set and
+    # the total is settled once afterwards.
+    cursor.execute("SET @bulk_order_items = 1")
+    try:
+        for start in range(0, len(valid_lines), ORDER_ITEMS_PREPARED_MAX):
+            chunk = valid_lines[start : start + ORDER_ITEMS_PREPARED_MAX]
+            insert = conn.prepared(values_sql(ORDER_ITEMS_INSERT_SQL, len(chunk), 3))
+            insert.execute(
+                [value for line in chunk for value in (order_id, line["Item_ID"], line["Quantity"])]
+            )
+    finally:
+        clear_session_flag(cursor, "@bulk_order_items")
+    recalculate_order_totals(cursor, [order_id])
+
+    for line in valid_lines:
+        line["Status"] = "Added"
+    return order_id, lines
+
+
+# Write-Behind Journal
+def apply_once(cursor, write_key, kind, apply) -> Tuple[Optional[int], object, bool]:
+    """
+    Apply a write on an open transaction unless its idempotency key is
+    already in Applied_Writes, recording the key in the same transaction.
+
+    A second writer with the same key waits on the key's row lock until the
+    first commits or rolls back, so concurrent retries apply it once.
+
+    Args:
+        cursor: Dictionary cursor on the transaction's connection
+        write_key: Idempotency key, at most 32 characters
+        kind: What the write is, e.g. "order"
+        apply: Callable taking the cursor and returning (Result_Id, details)
+
+    Returns:
+        (Result_Id, details, applied); when the key had already been
+        applied, details is None and applied is False.
+    """
+    cursor.execute(
+        "INSERT IGNORE INTO Applied_Writes (Write_Key, Kind) VALUES (%s, %s)", (write_key, kind)
+    )
+    if cursor.rowcount == 0:
+        cursor.execute("SELECT Result_Id FROM Applied_Writes WHERE Write_Key = %s", (write_key,))
+        return cursor.fetchone()["Result_Id"], None, False
+    result_id, details = apply(cursor)
+    cursor.execute(
+        "UPDATE Applied_Writes SET Result_Id = %s WHERE Write_Key = %s", (result_id, write_key)
+    )
+    return result_id, details, True
+
+
+class WriteRejected(Exception):
+    """A journalled write that can never succeed, e.g. an order with no valid items."""
+
+
+def _apply_order_write(cursor, payload):
+    order_id, lines = insert_order(
+        cursor,
+        payload["table_id"],
+        payload["staff_id"],
+        {int(item_id): quantity for item_id, quantity in payload["items"].items()},
+        payload["order_time"],
+    )
+    if order_id is None:
+        raise WriteRejected("; ".join(f"item {line['Item_ID']}: {line['Reason']}" for line in lines))
+    return order_id, lines
+
+
+def _apply_status_write(cursor, payload):
+    if not set_order_status(cursor, payload["order_id"], payload["status"]):
+        raise WriteRejected(f"Order {payload['order_id']} does not exist")
+    return payload["order_id"], None
+
+
+def _apply_payment_write(cursor, payload):
+    settle_payment(cursor, payload["table_id"], payload["order_id"], payload["payment_method"])
+    return payload["order_id"], None
+
+
+# kind -> handler(cursor, payload) returning (Result_Id, details)
+WRITE_HANDLERS = {
+    "order": _apply_order_write,
+    "order_status": _apply_status_write,
+    "payment": _apply_payment_write,
+}
+
+# Errors that retrying will not fix; anything else is treated as transient
+PERMANENT_WRITE_ERRORS = (
+    mysql.connector.errors.IntegrityError,
+    mysql.connector.errors.DataError,
+)
+
+# Lost connections are not the fault of the entry being applied and do not
+# count towards max_attempts
+CONNECTION_ERRNOS = {
+    errorcode.CR_CONNECTION_ERROR,
+    errorcode.CR_CONN_HOST_ERROR,
+    errorcode.CR_SERVER_GONE_ERROR,
+    errorcode.CR_SERVER_LOST,
+}
+
+write_queue_logger = logging.getLogger("restaurant.write_queue")
+
+
+class WriteJournal:
+    """
+    Durable local queue of orders, status changes and payments.
+
+    submit() commits the write to a SQLite journal and returns at once; a
+    background flusher applies pending entries to MySQL in order, a batch
+    per transaction. Each entry carries an idempotency key that is recorded
+    in Applied_Writes in the same transaction as the write, so an entry
+    replayed after a crash is recognised and not applied twice. A write
+    that fails permanently, or whose payload the handler cannot process, is
+    rolled back to its savepoint and marked rejected without holding up the
+    rest of the batch. Any other failure rolls back the batch and retries it
+    with exponential backoff, charging the attempt to the entry that failed;
+    after max_attempts that entry is set aside as rejected too.
+    """
+
+    def __init__(
+        self, path, flush_interval=0.5, batch_size=100, max_backoff=30.0, retention=86400.0, max_attempts=8
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_backoff = max_backoff
+        self.retention = retention
+        self.max_attempts = max_attempts
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.execute("PRAGMA synchronous = FULL")
+        self._db.execute(
             """
-            INSERT INTO Orders (Table_ID, Staff_ID, Order_Status, Payment_Status)
-            VALUES (%s, %s, 'Pending', 'Pending')
-        """,
-            (table_id, staff_id),
+            CREATE TABLE IF NOT EXISTS journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                write_key TEXT NOT NULL UNIQUE,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                applied_at REAL,
+                result_id INTEGER,
+                details TEXT
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS journal_status ON journal (status, id)")
+        self._db_lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flush at a time keeps entries in order
+        self._stats_lock = threading.Lock()
+        self._flush_ms = deque(maxlen=200)
+        self._lag_s = deque(maxlen=200)
+        self._counts = {"applied": 0, "rejected": 0, "retries": 0}
+        self._last_error = None
+        self._backoff = 0.0
+        self._last_pruned = 0.0
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="write-journal", daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, payload) -> str:
+        """Journal a write durably and return its idempotency key."""
+        key = uuid.uuid4().hex
+        with self._db_lock:
+            self._db.execute(
+                "INSERT INTO journal (write_key, kind, payload, created_at) VALUES (?, ?, ?, ?)",
+                (key, kind, json.dumps(payload, default=str), time.time()),
+            )
+        self._wake.set()
+        return key
+
+    def entry(self, key) -> Optional[Dict]:
+        """Status of a submitted write: status, result_id, details, last_error."""
+        with self._db_lock:
+            row = self._db.execute(
+                "SELECT status, result_id, details, last_error, attempts FROM journal WHERE write_key = ?",
+                (key,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["details"] = json.loads(entry["details"]) if entry["details"] else None
+        return entry
+
+    def stats(self) -> Dict:
+        with self._db_lock:
+            depth, oldest = self._db.execute(
+                "SELECT COUNT(*), MIN(created_at) FROM journal WHERE status = 'pending'"
+            ).fetchone()
+        with self._stats_lock:
+            flush_ms = sorted(self._flush_ms)
+            lag = list(self._lag_s)
+            stats = dict(self._counts)
+            stats.update(
+                depth=depth,
+                oldest_pending_s=time.time() - oldest if oldest else 0.0,
+                flush_ms_p50=flush_ms[len(flush_ms) // 2] if flush_ms else 0.0,
+                flush_ms_max=flush_ms[-1] if flush_ms else 0.0,
+                apply_lag_avg_s=sum(lag) / len(lag) if lag else 0.0,
+                backoff_s=self._backoff,
+                last_error=self._last_error,
+            )
+        return stats
+
+    def flush(self) -> Optional[int]:
+        """
+        Apply one batch of pending entries.
+
+        Returns:
+            Number of entries settled (applied or rejected), or None if the
+            batch failed and will be retried.
+        """
+        with self._flush_lock:
+            return self._flush()
+
+    def _flush(self) -> Optional[int]:
+        with self._db_lock:
+            entries = self._db.execute(
+                "SELECT id, write_key, kind, payload, created_at FROM journal "
+                "WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (self.batch_size,),
+            ).fetchall()
+        if not entries:
+            return 0
+
+        started = time.perf_counter()
+        conn = get_database_connection()
+        if not conn:
+            self._failed(entries, "No database connection")
+            return None
+        settled = []
+        current = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            conn.start_transaction()
+            for entry in entries:
+                current = entry
+                cursor.execute("SAVEPOINT journal_entry")
+                try:
+                    settled.append((entry, "applied", *self._apply(cursor, entry), None))
+                except (WriteRejected, *PERMANENT_WRITE_ERRORS) as error:
+                    cursor.execute("ROLLBACK TO SAVEPOINT journal_entry")
+                    settled.append((entry, "rejected", None, None, str(error)))
+                except mysql.connector.Error:
+                    raise
+                except Exception as error:
+                    # A payload the handler cannot process will not get better
+                    write_queue_logger.exception("write journal entry %s failed", entry["write_key"])
+                    cursor.execute("ROLLBACK TO SAVEPOINT journal_entry")
+                    settled.append((entry, "rejected", None, None, f"{type(error).__name__}: {error}"))
+            current = None
+            conn.commit()
+        except mysql.connector.Error as error:
+            try:
+                conn.rollback()
+            except mysql.connector.Error:
+                pass  # the connection is gone and the transaction with it
+            culprit = None if error.errno in CONNECTION_ERRNOS else current
+            self._failed(entries, str(error), culprit)
+            return None
+        finally:
+            conn.close()
+
+        now = time.time()
+        with self._db_lock:
+            self._db.executemany(
+                "UPDATE journal SET status = ?, applied_at = ?, result_id = ?, details = ?, "
+                "last_error = ?, attempts = attempts + 1 WHERE id = ?",
+                [
+                    (status, now, result_id, json.dumps(details, default=str) if details else None, error, entry["id"])
+                    for entry, status, result_id, details, error in settled
+                ],
+            )
+        with self._stats_lock:
+            self._flush_ms.append((time.perf_counter() - started) * 1000)
+            self._lag_s.extend(now - entry["created_at"] for entry, *_ in settled)
+            for _, status, *_ in settled:
+                self._counts[status] += 1
+            self._backoff = 0.0
+
+        kinds = {entry["kind"] for entry in entries}
+        if kinds & {"order", "payment"}:
+            get_query_cache().invalidate("tables")
+        if kinds & {"order_status", "payment"}:
+            get_stock_depleter().wake()
+        return len(settled)
+
+    def _apply(self, cursor, entry):
+        # A key applied before the journal could record it, e.g. across a
+        # crash, is not applied again
+        handler = WRITE_HANDLERS[entry["kind"]]
+        result_id, details, _ = apply_once(
+            cursor, entry["write_key"], entry["kind"], lambda cursor: handler(cursor, json.loads(entry["payload"]))
         )
+        return result_id, details
 
-        order_id = cursor.lastrowid
+    def _failed(self, entries, error, culprit=None):
+        """
+        Record a failed batch and back off. The attempt is charged to the
+        entry that was being applied, if any; once it has failed max_attempts
+        times it is rejected so the entries behind it can go through.
+        """
+        dead = False
+        with self._db_lock:
+            self._db.executemany(
+                "UPDATE journal SET last_error = ? WHERE id = ?",
+                [(error, entry["id"]) for entry in entries],
+            )
+            if culprit is not None:
+                self._db.execute("UPDATE journal SET attempts = attempts + 1 WHERE id = ?", (culprit["id"],))
+                (attempts,) = self._db.execute(
+                    "SELECT attempts FROM journal WHERE id = ?", (culprit["id"],)
+                ).fetchone()
+                if attempts >= self.max_attempts:
+                    self._db.execute(
+                        "UPDATE journal SET status = 'rejected', applied_at = ?, last_error = ? WHERE id = ?",
+                        (time.time(), f"Gave up after {attempts} attempts: {error}", culprit["id"]),
+                    )
+                    dead = True
+        with self._stats_lock:
+            self._counts["retries"] += 1
+            if dead:
+                self._counts["rejected"] += 1
+            self._last_error = error
+            self._backoff = min(self.max_backoff, max(1.0, self._backoff * 2))
+        if dead:
+            write_queue_logger.error(
+                "write journal entry %s rejected after %d attempts: %s", culprit["write_key"], attempts, error
+            )
+        write_queue_logger.warning(
+            "write journal flush failed, retrying in %.0fs: %s", self._backoff, error
+        )
 
-        # Create order items
-        for item_id, quantity in order_items.items():
-            cursor.execute(
-                """
-                INSERT INTO Order_Items (Order_ID, Item_ID, Quantity)
-                VALUES (%s, %s, %s)
-            """,
-                (order_id, item_id, quantity),
+    def _prune(self):
+        with self._db_lock:
+            self._db.execute(
+                "DELETE FROM journal WHERE status != 'pending' AND applied_at < ?",
+                (time.time() - self.retention,),
             )
+        self._last_pruned = time.monotonic()
+
+    def _run(self):
+        while True:
+            if self._backoff:
+                # New submissions must not cut the backoff short
+                time.sleep(self._backoff)
+            else:
+                self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            while True:
+                try:
+                    settled = self.flush()
+                except Exception as error:
+                    write_queue_logger.exception("write journal flush crashed")
+                    self._failed([], f"{type(error).__name__}: {error}")
+                    settled = None
+                if settled is None or settled < self.batch_size:
+                    break
+            if time.monotonic() - self._last_pruned > 3600:
+                self._prune()
+
+
+@st.cache_resource(show_spinner=False)
+def get_write_journal() -> WriteJournal:
+    return WriteJournal(
+        WRITE_QUEUE_CONFIG["path"],
+        WRITE_QUEUE_CONFIG["flush_interval"],
+        WRITE_QUEUE_CONFIG["batch_size"],
+        WRITE_QUEUE_CONFIG["max_backoff"],
+        WRITE_QUEUE_CONFIG["retention"],
+        WRITE_QUEUE_CONFIG["max_attempts"],
+    )
+
+
+def get_write_queue_stats() -> Dict:
+    return get_write_journal().stats()
 
-        conn.commit()
-        return True, order_id
-    except Exception as e:
-        st.error(f"Error creating order: {e}")
-        return False, None
-    finally:
-        conn.close()
+
+def submit_order(table_id, staff_id, order_items: Dict[int, int]) -> str:
+    """Journal a new order; it is written to MySQL by the flusher. Returns the write key."""
+    return get_write_journal().submit(
+        "order",
+        {
+            "table_id": table_id,
+            "staff_id": staff_id,
+            "items": order_items,
+            "order_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        },
+    )
+
+
+def submit_order_status(order_id, status) -> str:
+    return get_write_journal().submit("order_status", {"order_id": order_id, "status": status})
+
+
+def submit_payment(table_id, order_id, payment_method) -> str:
+    return get_write_journal().submit(
+        "payment", {"table_id": table_id, "order_id": order_id, "payment_method": payment_method}
+    )
 
 
 # Reservation Functions
@@ -1135,8 +5861,9 @@ def make_reservation(
     """
     print(f"Attempting to make reservation for {customer_name} at table {table_id}")
 
-    if not check_table_availability(table_id, reservation_datetime):
-        print("Table is not available for the selected time")
+    customer_id = get_or_create_customer(customer_name, contact_number)
+    if customer_id is None:
+        print("Could not identify the customer")
         return False, None
 
     conn = get_database_connection()
@@ -1147,25 +5874,19 @@ def make_reservation(
     try:
         cursor = conn.cursor()
 
-        # First, check if the customer exists
-        cursor.execute(
-            "SELECT Cust_Id FROM Customers WHERE Cust_Name = %s AND PhoneNumber = %s",
-            (customer_name, contact_number),
-        )
-        result = cursor.fetchone()
-
-        if result:
-            customer_id = result[0]
-            print(f"Existing customer found with ID: {customer_id}")
-        else:
-            # Create new customer if doesn't exist
-            cursor.execute(
-                "INSERT INTO Customers (Cust_Name, PhoneNumber) VALUES (%s, %s)",
-                (customer_name, contact_number),
-            )
-            conn.commit()
-            customer_id = cursor.lastrowid
-            print(f"New customer created with ID: {customer_id}")
+        # Lock the table's row so concurrent bookings for it, from this or
+        # any other process, take turns, then check for a clash
+        cursor.execute("SELECT Table_Id FROM Tables WHERE Table_Id = %s FOR UPDATE", (table_id,))
+        if not cursor.fetchall():
+            print("Table does not exist")
+            conn.rollback()
+            return False, None
+        if reservation_clashes(cursor, table_id, reservation_datetime, lock=True):
+            print("Table is not available for the selected time")
+            conn.rollback()
+            # The index missed a booking made elsewhere; reload it on next use
+            get_availability_index().invalidate()
+            return False, None
 
         # Create the reservation
         cursor.execute(
@@ -1189,6 +5910,9 @@ def make_reservation(
         )
         reservation_id = cursor.lastrowid
         conn.commit()
+        # The after_reservation_insert_update trigger changes table_status.
+        get_query_cache().invalidate("tables")
+        get_availability_index().add(reservation_id, table_id, reservation_datetime)
         print(f"Reservation created successfully with ID: {reservation_id}")
         return True, reservation_id
 
@@ -1239,6 +5963,8 @@ def cancel_reservation(reservation_id: int) -> bool:
         )
 
         conn.commit()
+        get_query_cache().invalidate("tables")
+        get_availability_index().remove(reservation_id)
         return True
     except mysql.connector.Error as error:
         st.error(f"Error canceling reservation: {error}")
@@ -1271,24 +5997,11 @@ def check_database_connection():
         print("Failed to connect to the database")
 
 def register_new_customer(name, phone_number, email):
+    """Register a guest, or find them if they have been before. Returns Cust_Id or None."""
     if not validate_email(email):
         st.error("Invalid email format")
-        return
-    conn = get_database_connection()
-    if not conn:
-        return
-    try:
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO Customers (Cust_Name, PhoneNumber, Email) VALUES (%s, %s, %s)",
-            (name, phone_number, email),
-        )
-        conn.commit()
-        st.success("Customer registered successfully!")
-    except mysql.connector.Error as error:
-        st.error(f"Error: {error}")
-    finally:
-        conn.close()
+        return None
+    return get_or_create_customer(name, phone_number, email)
 
 
 def customer_registration_page():
@@ -1302,11 +6015,14 @@ def customer_registration_page():
 
         if submit:
             if name and phone_number and email:
-                register_new_customer(name, phone_number, email)
-                st.session_state["logged_in"] = True
-                st.session_state["user_data"] = {"Role": "Customer", "Name": name}
-                st.success(f"Welcome, {name}!")
-                st.rerun()
+                customer_id = register_new_customer(name, phone_number, email)
+                if customer_id is not None:
+                    st.session_state["logged_in"] = True
+                    st.session_state["user_data"] = {
+                        "Role": "Customer", "Name": name, "Cust_Id": customer_id
+                    }
+                    st.success(f"Welcome, {name}!")
+                    st.rerun()
             else:
                 st.error("Please fill in all fields")
 
@@ -1405,13 +6121,23 @@ def customer_dashboard():
                             st.error(
                                 "Unable to complete your reservation. Please try again."
                             )
+                            availability = get_availability_index()
+                            free = availability.free_tables(reservation_datetime, party_size)
+                            if free:
+                                st.info(
+                                    f"Free at that time for {party_size} guests: "
+                                    + ", ".join(f"Table {t['Table_Id']}" for t in free)
+                                )
+                            slot = availability.next_free_slot(reservation_datetime, table_id=table_id)
+                            if slot:
+                                st.info(f"Table {table_id} is next free at {slot[1]:%H:%M}")
 
     elif reservation_menu == "View Reservations":
         st.subheader("Your Reservations")
         if "user_data" in st.session_state and st.session_state["user_data"].get(
-            "Name"
+            "Cust_Id"
         ):
-            customer_name = st.session_state["user_data"]["Name"]
+            customer_id = st.session_state["user_data"]["Cust_Id"]
             conn = get_database_connection()
             if conn:
                 cursor = conn.cursor(dictionary=True)
@@ -1421,10 +6147,10 @@ def customer_dashboard():
                     FROM Reservation r
                     JOIN Customers c ON r.Customer_Id = c.Cust_Id
                     JOIN Tables t ON r.Table_Id = t.Table_Id
-                    WHERE c.Cust_Name = %s AND r.Date >= CURDATE()
+                    WHERE r.Customer_Id = %s AND r.Date >= CURDATE()
                     ORDER BY r.Date, r.Time
                 """,
-                    (customer_name,),
+                    (customer_id,),
                 )
                 reservations = cursor.fetchall()
                 conn.close()
@@ -1450,6 +6176,10 @@ def customer_dashboard():
 
 # Modify the main function to start with the user selection page
 def main():
+    get_stock_depleter()
+    get_write_journal()
+    get_snapshot_refresher()
+
     if "logged_in" not in st.session_state:
         st.session_state["logged_in"] = False
 
@@ -1475,5 +6205,134 @@ def main():
         user_selection_page()
 
 
+# Command Line
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def run_command(argv):
+    """Maintenance commands, for use outside `streamlit run`."""
+    parser = argparse.ArgumentParser(prog="Restaurant Management System.py")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    backfill = commands.add_parser(
+        "backfill-rollup", help="Rebuild the sales rollups for all order history"
+    )
+    backfill.add_argument("--chunk-days", type=int, default=31)
+
+    backfill_keys = commands.add_parser(
+        "backfill-customer-keys",
+        help="Set the phone/email identity keys on existing customers, merging duplicates",
+    )
+    backfill_keys.add_argument("--batch-size", type=int, default=CUSTOMER_CONFIG["backfill_batch_size"])
+
+    rebuild = commands.add_parser(
+        "rebuild-rollup", help="Rebuild the sales rollups for a date range"
+    )
+    rebuild.add_argument("start_date", type=_parse_date, help="YYYY-MM-DD")
+    rebuild.add_argument("end_date", type=_parse_date, help="YYYY-MM-DD")
+
+    import_menu = commands.add_parser(
+        "import-menu", help="Insert or update menu items from a CSV file"
+    )
+    import_menu.add_argument("path")
+
+    export = commands.add_parser(
+        "export", help="Stream a report or table dump to CSV or Parquet"
+    )
+    export.add_argument("name", choices=list(EXPORTS))
+    export.add_argument("start_date", type=_parse_date, help="YYYY-MM-DD")
+    export.add_argument("end_date", type=_parse_date, help="YYYY-MM-DD")
+    export.add_argument("--format", choices=list(EXPORT_FORMATS), default="csv")
+    export.add_argument("--output", required=True)
+    export.add_argument("--chunk-size", type=int, default=EXPORT_CONFIG["chunk_size"])
+
+    commands.add_parser(
+        "deplete-stock", help="Take queued completed orders out of stock now"
+    )
+
+    snapshot = commands.add_parser(
+        "snapshot", help="Refresh the local analytics snapshot"
+    )
+    snapshot.add_argument("--full", action="store_true", help="rebuild it from scratch")
+
+    archive = commands.add_parser(
+        "archive", help="Move old closed orders and past reservations to the archive tables"
+    )
+    archive.add_argument("--batch-size", type=int, default=ARCHIVE_CONFIG["batch_size"])
+    archive.add_argument("--max-batches", type=int, help="stop each job after this many batches")
+
+    args = parser.parse_args(argv)
+    if args.command == "snapshot":
+        extracted = get_analytics_snapshot().refresh(full=args.full)
+        if extracted is None:
+            print("Snapshot refresh failed")
+            return 1
+        print(", ".join(f"{name}: {rows} rows" for name, rows in extracted.items()))
+        return 0
+    if args.command == "archive":
+        moved = archive_history(args.batch_size, args.max_batches)
+        if moved is None:
+            print("Archiving failed; completed batches were kept")
+            return 1
+        print(f"Archived {moved['orders']} orders and {moved['reservations']} reservations")
+        return 0
+    if args.command == "backfill-customer-keys":
+        result = backfill_customer_keys(args.batch_size)
+        if result is None:
+            print("Backfill failed; completed batches were kept")
+            return 1
+        print(f"Keyed {result['keyed']} customers, merged {result['merged']} duplicates")
+        return 0
+    if args.command == "deplete-stock":
+        total = 0
+        while True:
+            settled = deplete_stock()
+            if settled is None:
+                print(f"Depletion failed after {total} orders")
+                return 1
+            total += settled
+            if settled < STOCK_DEPLETION_CONFIG["batch_size"]:
+                break
+        print(f"Depleted stock for {total} orders")
+        return 0
+    if args.command == "import-menu":
+        with open(args.path, "rb") as menu_file:
+            result = bulk_upsert_menu_items(parse_menu_csv(menu_file.read()))
+        if result is None:
+            print("Import failed; nothing was written")
+            return 1
+        for row in result["rejected"]:
+            print(f"line {row['Line']}: {row['Error']} ({row['Item_Name']!r})")
+        print(
+            f"Inserted {result['inserted']}, updated {result['updated']}, "
+            f"rejected {len(result['rejected'])}"
+        )
+        return 0
+    if args.command == "export":
+        result = export_query(
+            args.name, args.start_date, args.end_date, args.output, args.format, args.chunk_size
+        )
+        if result is None:
+            print("Export failed")
+            return 1
+        print(
+            f"Wrote {result['Rows']} rows to {result['Path']} in {result['Seconds']:.1f}s "
+            f"({result['Rows_Per_Second']:.0f} rows/s)"
+        )
+        return 0
+    if args.command == "backfill-rollup":
+        written = backfill_sales_rollup(args.chunk_days)
+    else:
+        written = rebuild_sales_rollup(args.start_date, args.end_date)
+    if written is None:
+        print("Rollup rebuild failed")
+        return 1
+    print(f"Wrote {written} rollup rows")
+    return 0
+
+
 if __name__ == "__main__":
+    if not st.runtime.exists() and len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
     main()
@@ -0,0 +1,342 @@
+"""
+Headless JSON API for POS terminals and kitchen screens.
+
+Serves the app's order, table, menu and reservation functions over HTTP
+without Streamlit's rerun model. Requests are handled on asyncio by Starlette
+under uvicorn (both installed with Streamlit); each database call runs on a
+thread pool sized to the connection pool, with a cap on requests in flight
+and a per-request timeout.
+
+    python Restaurant_Management_System_API.py --port 8600 --workers 2
+
+    GET    /health
+    GET    /tables
+    GET    /menu?category=Desserts
+    POST   /orders                {"table_id": 3, "staff_id": 2, "items": {"12": 2, "40": 1}}
+    PATCH  /orders/{order_id}     {"status": "Ready"}
+    GET    /orders/changes?since=2024-05-01T12:00:00.000000
+    POST   /reservations          {"customer_name": ..., "contact_number": ..., "table_id": 4,
+                                   "datetime": "2024-05-01T19:30", "party_size": 4}
+    DELETE /reservations/{reservation_id}
+
+Errors come back as {"error": message} with a 4xx/5xx status: 503 when too
+many requests are queued or the database is unavailable, 504 when a call
+takes longer than the request timeout.
+
+A 504 does not mean the call was abandoned: it may still finish. Send an
+Idempotency-Key header with POST /orders so that a retry returns the order
+already created instead of creating another; without one, the order is not
+subject to the timeout. Reservations are never timed out, and status
+changes and cancellations are safe to retry as they are.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import importlib.util
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import streamlit.config
+import streamlit.logger
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+ROOT = Path(__file__).resolve().parent
+APP_PATH = ROOT / "Restaurant Management System.py"
+
+API_CONFIG = {
+    "host": "127.0.0.1",
+    "port": 8600,
+    "workers": 1,  # server processes; each runs one event loop
+    "max_in_flight": 64,  # requests admitted at once per process
+    "queue_timeout": 1.0,  # seconds a request waits for admission before a 503
+    "request_timeout": 5.0,  # seconds a database call may take before a 504
+}
+
+# Worker processes are started by uvicorn and read their settings from here
+OPTIONS_ENV = "RESTAURANT_API_OPTIONS"
+
+ORDER_STATUSES = ("Pending", "Ready", "Completed", "Cancelled")
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class ApiError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, timedelta):  # TIME columns
+        return str(value)
+    if isinstance(value, (bytes, bytearray)):
+        return value.decode()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class ApiResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return json.dumps(content, default=_json_default, separators=(",", ":")).encode("utf-8")
+
+
+def load_app(db_config=None):
+    """Import the Streamlit app as a module without running its UI."""
+    # Parse Streamlit's config first, otherwise it resets the log level and
+    # every st.error from a worker thread logs a missing-context warning
+    streamlit.config.get_config_options()
+    streamlit.logger.set_log_level("error")
+    spec = importlib.util.spec_from_file_location("restaurant_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    if db_config:
+        app.DB_CONFIG.update(db_config)
+    return app
+
+
+class Backend:
+    """
+    Runs the app's blocking data functions off the event loop.
+
+    At most max_in_flight requests are admitted at once; the rest wait up
+    to queue_timeout and are then turned away. Admitted calls run on a
+    thread pool no larger than the connection pool, so threads never queue
+    for connections. A call made with timeout set gets a 504 after
+    request_timeout, but its thread runs on, so only calls that are safe to
+    retry should set it.
+    """
+
+    def __init__(self, app, max_in_flight: int, queue_timeout: float, request_timeout: float):
+        self.app = app
+        self.queue_timeout = queue_timeout
+        self.request_timeout = request_timeout
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._executor = ThreadPoolExecutor(
+            max_workers=app.DB_POOL_CONFIG["pool_size"], thread_name_prefix="api-db"
+        )
+
+    async def call(self, function, *args, timeout: bool = True):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            raise ApiError(503, "Server busy, try again")
+        try:
+            loop = asyncio.get_running_loop()
+            result = loop.run_in_executor(self._executor, function, *args)
+            if not timeout:
+                return await result
+            return await asyncio.wait_for(result, self.request_timeout)
+        except asyncio.TimeoutError:
+            raise ApiError(504, "Timed out")
+        finally:
+            self._slots.release()
+
+
+def _int(value, name):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"{name} must be an integer")
+
+
+async def _body(request: Request) -> dict:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise ApiError(400, "Body must be JSON")
+    if not isinstance(body, dict):
+        raise ApiError(400, "Body must be a JSON object")
+    return body
+
+
+def _write_key(request: Request):
+    """Applied_Writes key for the request's Idempotency-Key header, or None without one."""
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    if not key or len(key) > 255:
+        raise ApiError(400, f"{IDEMPOTENCY_HEADER} must be 1 to 255 characters")
+    # Hashed to fit Write_Key, and namespaced apart from the write journal's keys
+    return hashlib.sha256(f"api:{key}".encode()).hexdigest()[:32]
+
+
+def _unavailable(result):
+    if result is None:
+        raise ApiError(503, "Database unavailable")
+    return result
+
+
+async def health(request: Request):
+    return ApiResponse({"status": "ok", "pool": request.app.state.backend.app.get_pool_stats()})
+
+
+async def list_tables(request: Request):
+    backend = request.app.state.backend
+    return ApiResponse(_unavailable(await backend.call(backend.app.get_table_status)))
+
+
+async def list_menu(request: Request):
+    backend = request.app.state.backend
+    category = request.query_params.get("category")
+    return ApiResponse(_unavailable(await backend.call(backend.app.get_menu_items, category)))
+
+
+async def create_order(request: Request):
+    backend = request.app.state.backend
+    body = await _body(request)
+    items = body.get("items")
+    if not isinstance(items, dict) or not items:
+        raise ApiError(400, "items must map item ids to quantities")
+    order_items = {_int(item_id, "item id"): _int(quantity, "quantity") for item_id, quantity in items.items()}
+    write_key = _write_key(request)
+    success, order_id, lines = await backend.call(
+        backend.app.create_order,
+        _int(body.get("table_id"), "table_id"),
+        _int(body.get("staff_id"), "staff_id"),
+        order_items,
+        write_key,
+        timeout=write_key is not None,
+    )
+    if success:
+        return ApiResponse({"order_id": order_id, "lines": lines}, status_code=201)
+    failed = any(line["Status"] == "Failed" for line in lines)
+    return ApiResponse(
+        {"error": "Order not created", "lines": lines}, status_code=503 if failed else 422
+    )
+
+
+async def update_order(request: Request):
+    backend = request.app.state.backend
+    order_id = _int(request.path_params["order_id"], "order_id")
+    status = (await _body(request)).get("status")
+    if status not in ORDER_STATUSES:
+        raise ApiError(400, f"status must be one of {', '.join(ORDER_STATUSES)}")
+    updated = await backend.call(backend.app.update_order_status, order_id, status)
+    if updated is None:
+        raise ApiError(503, "Order status not updated")
+    if not updated:
+        raise ApiError(404, "Order not found")
+    return ApiResponse({"order_id": order_id, "status": status})
+
+
+async def order_changes(request: Request):
+    backend = request.app.state.backend
+    since = request.query_params.get("since")
+    if since is not None:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            raise ApiError(400, "since must be an ISO timestamp")
+    return ApiResponse(_unavailable(await backend.call(backend.app.get_order_changes, since)))
+
+
+async def create_reservation(request: Request):
+    backend = request.app.state.backend
+    body = await _body(request)
+    try:
+        when = datetime.fromisoformat(body.get("datetime") or "")
+    except ValueError:
+        raise ApiError(400, "datetime must be an ISO timestamp")
+    if not body.get("customer_name") or not body.get("contact_number"):
+        raise ApiError(400, "customer_name and contact_number are required")
+    success, reservation_id = await backend.call(
+        backend.app.make_reservation,
+        body["customer_name"],
+        body["contact_number"],
+        _int(body.get("table_id"), "table_id"),
+        when,
+        _int(body.get("party_size"), "party_size"),
+        timeout=False,
+    )
+    if not success:
+        raise ApiError(409, "Table not available at that time")
+    return ApiResponse({"reservation_id": reservation_id}, status_code=201)
+
+
+async def delete_reservation(request: Request):
+    backend = request.app.state.backend
+    reservation_id = _int(request.path_params["reservation_id"], "reservation_id")
+    if not await backend.call(backend.app.cancel_reservation, reservation_id):
+        raise ApiError(404, "Reservation not found or not cancelled")
+    return ApiResponse({"reservation_id": reservation_id, "status": "Cancelled"})
+
+
+async def api_error(request: Request, error: ApiError):
+    return ApiResponse({"error": str(error)}, status_code=error.status_code)
+
+
+def create_app(options=None) -> Starlette:
+    """The ASGI application; uvicorn worker processes take options from the environment."""
+    if options is None:
+        options = json.loads(os.environ.get(OPTIONS_ENV, "{}"))
+    settings = {**API_CONFIG, **options}
+    api = Starlette(
+        routes=[
+            Route("/health", health),
+            Route("/tables", list_tables),
+            Route("/menu", list_menu),
+            Route("/orders", create_order, methods=["POST"]),
+            Route("/orders/changes", order_changes),
+            Route("/orders/{order_id:int}", update_order, methods=["PATCH"]),
+            Route("/reservations", create_reservation, methods=["POST"]),
+            Route("/reservations/{reservation_id:int}", delete_reservation, methods=["DELETE"]),
+        ],
+        exception_handlers={ApiError: api_error},
+    )
+    api.state.backend = Backend(
+        load_app(settings.get("db_config")),
+        settings["max_in_flight"],
+        settings["queue_timeout"],
+        settings["request_timeout"],
+    )
+    return api
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=API_CONFIG["host"])
+    parser.add_argument("--port", type=int, default=API_CONFIG["port"])
+    parser.add_argument("--workers", type=int, default=API_CONFIG["workers"])
+    parser.add_argument("--max-in-flight", type=int, default=API_CONFIG["max_in_flight"])
+    parser.add_argument("--request-timeout", type=float, default=API_CONFIG["request_timeout"])
+    for key in ("host", "user", "password", "database"):
+        parser.add_argument(f"--db-{key}", help=f"override DB_CONFIG's {key}")
+    args = parser.parse_args(argv)
+
+    db_config = {
+        key: getattr(args, f"db_{key}")
+        for key in ("host", "user", "password", "database")
+        if getattr(args, f"db_{key}") is not None
+    }
+    os.environ[OPTIONS_ENV] = json.dumps(
+        {
+            "max_in_flight": args.max_in_flight,
+            "request_timeout": args.request_timeout,
+            "db_config": db_config,
+        }
+    )
+    uvicorn.run(
+        "Restaurant_Management_System_API:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=str(ROOT),
+        access_log=False,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,816 @@
+"""
+Benchmark harness for the Restaurant Management System data functions.
+
+Creates a scratch database from Restaurant_Management_System_SQL.sql, fills it
+with synthetic data and times the data-access functions of the app against it.
+Results are written as JSON so runs can be compared.
+
+    python Restaurant_Management_System_Benchmark.py setup --orders 1000000
+    python Restaurant_Management_System_Benchmark.py run --output before.json
+    python Restaurant_Management_System_Benchmark.py compare before.json after.json
+    python Restaurant_Management_System_Benchmark.py prepared --rate 200 --duration 10
+    python Restaurant_Management_System_Benchmark.py forecast --items 500 --weeks 52
+    python Restaurant_Management_System_Benchmark.py api --workers 1 --connections 64
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import mysql.connector
+import numpy as np
+import streamlit.logger
+
+ROOT = Path(__file__).resolve().parent
+APP_PATH = ROOT / "Restaurant Management System.py"
+API_PATH = ROOT / "Restaurant_Management_System_API.py"
+SCHEMA_PATH = ROOT / "Restaurant_Management_System_SQL.sql"
+
+BENCH_DB_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "password",
+    "database": "restaurant_bench",
+}
+
+DEFAULT_VOLUMES = {
+    "staff": 40,
+    "tables": 30,
+    "menu_items": 200,
+    "ingredients": 300,
+    "customers": 20000,
+    "orders": 100000,
+    "max_items_per_order": 6,
+    "reservations": 5000,
+    "history_days": 730,
+    "seed": 42,
+}
+
+CATEGORIES = {
+    "Appetizers": (120, 450),
+    "Main Course": (250, 900),
+    "Desserts": (100, 350),
+    "Beverages": (60, 250),
+}
+
+# Relative order volume by hour of day: lunch and dinner peaks
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 2, 2, 3, 6, 10, 9, 5, 3, 3, 5, 9, 12, 11, 7, 3, 1]
+
+BATCH_SIZE = 5000
+
+
+def load_app():
+    """Import the Streamlit app as a module without running its UI."""
+    streamlit.logger.set_log_level("error")
+    spec = importlib.util.spec_from_file_location("restaurant_app", APP_PATH)
+    app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(app)
+    return app
+
+
+def connect_app(db_config, replicas=()):
+    """
+    The app pointed at db_config, reading reports from the replicas given as
+    "host[:port]" (same credentials and database as the primary).
+    """
+    app = load_app()
+    app.DB_CONFIG.clear()
+    app.DB_CONFIG.update(db_config)
+    app.REPLICA_CONFIGS[:] = [replica_config(db_config, address) for address in replicas]
+    return app
+
+
+def replica_config(db_config, address):
+    host, _, port = address.partition(":")
+    return dict(db_config, host=host, port=int(port or 3306))
+
+
+def split_sql_script(script):
+    """Split a mysql client script into statements, honouring DELIMITER lines."""
+    delimiter = ";"
+    statements, current = [], []
+    for line in script.splitlines():
+        stripped = line.strip()
+        if stripped.upper().startswith("DELIMITER"):
+            delimiter = stripped.split()[1]
+            continue
+        if not current and (not stripped or stripped.startswith("--")):
+            continue
+        current.append(line)
+        if stripped.endswith(delimiter):
+            statement = "\n".join(current).rstrip()
+            statements.append(statement[: -len(delimiter)].strip())
+            current = []
+    if current and "\n".join(current).strip():
+        statements.append("\n".join(current).strip())
+    return statements
+
+
+def create_schema(db_config):
+    server_config = {k: v for k, v in db_config.items() if k != "database"}
+    conn = mysql.connector.connect(**server_config)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{db_config['database']}`")
+        cursor.execute(f"CREATE DATABASE `{db_config['database']}`")
+        cursor.execute(f"USE `{db_config['database']}`")
+        for statement in split_sql_script(SCHEMA_PATH.read_text()):
+            cursor.execute(statement)
+            if cursor.with_rows:
+                cursor.fetchall()
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _batched(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def _insert(conn, sql, rows):
+    cursor = conn.cursor()
+    for batch in _batched(rows):
+        cursor.executemany(sql, batch)
+        conn.commit()
+
+
+def _order_time(rng, day):
+    hour = rng.choices(range(24), weights=HOUR_WEIGHTS)[0]
+    return datetime.combine(day, datetime.min.time()) + timedelta(
+        hours=hour, minutes=rng.randrange(60), seconds=rng.randrange(60)
+    )
+
+
+def generate_data(app, db_config, volumes):
+    """Fill the scratch database with synthetic but realistically shaped data."""
+    rng = random.Random(volumes["seed"])
+    conn = mysql.connector.connect(**db_config)
+    try:
+        password = app.hash_password("password")
+        roles = ["Manager"] * 2 + ["Chef"] * 6 + ["Cashier"] * 4
+        roles += ["Waiter"] * (volumes["staff"] - len(roles))
+        staff = [(i + 1, f"{role.lower()}_{i + 1}", password, role) for i, role in enumerate(roles)]
+        _insert(conn, "INSERT INTO Staff (Staff_ID, Username, Password, Role) VALUES (%s, %s, %s, %s)", staff)
+        waiter_ids = [s[0] for s in staff if s[3] == "Waiter"]
+
+        tables = [(i + 1, rng.choice([2, 4, 4, 6, 8]), "Available") for i in range(volumes["tables"])]
+        _insert(conn, "INSERT INTO Tables (Table_Id, Capacity, table_status) VALUES (%s, %s, %s)", tables)
+
+        menu = []
+        categories = list(CATEGORIES)
+        for i in range(volumes["menu_items"]):
+            category = categories[i % len(categories)]
+            low, high = CATEGORIES[category]
+            price_cents = rng.randrange(low, high) * 100 + rng.choice([0, 50])
+            menu.append((i + 1, f"{category[:4]} Dish {i + 1}", category, price_cents))
+        _insert(
+            conn,
+            "INSERT INTO Menu_Items (Item_Id, Item_Name, Category, Price, Description) VALUES (%s, %s, %s, %s, %s)",
+            [(m[0], m[1], m[2], Decimal(m[3]) / 100, f"Synthetic {m[2].lower()}") for m in menu],
+        )
+        inventory = [
+            (i + 1, f"Ingredient {i + 1}", rng.randrange(0, 5000), rng.randrange(100, 1000), rng.choice(["g", "ml", "pcs"]))
+            for i in range(volumes["ingredients"])
+        ]
+        _insert(
+            conn,
+            "INSERT INTO Inventory (Inventory_Id, Item_Name, Current_Stock, Reorder_Level, Unit) VALUES (%s, %s, %s, %s, %s)",
+            inventory,
+        )
+        recipes = []
+        for m in menu:
+            for ingredient in rng.sample(inventory, min(len(inventory), rng.randint(2, 5))):
+                unit = ingredient[4]
+                quantity = Decimal(rng.randint(1, 4) if unit == "pcs" else rng.randrange(5, 200, 5))
+                recipes.append((m[0], ingredient[0], quantity, unit, quantity))
+        _insert(
+            conn,
+            "INSERT INTO Recipe_Items (Item_Id, Inventory_Id, Quantity, Unit, Stock_Quantity) VALUES (%s, %s, %s, %s, %s)",
+            recipes,
+        )
+
+        customers = []
+        for i in range(volumes["customers"]):
+            phone, email = f"9{100000000 + i}", f"guest{i + 1}@example.com"
+            customers.append(
+                (i + 1, f"Guest {i + 1}", phone, email, app.normalize_phone(phone), app.normalize_email(email))
+            )
+        _insert(
+            conn,
+            "INSERT INTO Customers (Cust_Id, Cust_Name, PhoneNumber, Email, Phone_Key, Email_Key)"
+            " VALUES (%s, %s, %s, %s, %s, %s)",
+            customers,
+        )
+
+        # Orders are spread over the history, weighted towards weekends and
+        # meal times. The newest ones stay open so the portals have work.
+        today = date.today()
+        days = [today - timedelta(days=d) for d in range(volumes["history_days"])]
+        day_weights = [1.4 if d.weekday() >= 5 else 1.0 for d in days]
+        order_times = sorted(
+            _order_time(rng, day) for day in rng.choices(days, weights=day_weights, k=volumes["orders"])
+        )
+        open_count = min(volumes["tables"] // 2, len(order_times))
+        now = datetime.now()
+        for i in range(len(order_times) - open_count, len(order_times)):
+            order_times[i] = now - timedelta(minutes=rng.randrange(1, 60))
+
+        cursor = conn.cursor()
+        cursor.execute("SET @bulk_order_items = 1")
+        prices = {m[0]: m[3] for m in menu}
+        menu_ids = list(prices)
+        orders, items = [], []
+        for order_id, ordered_at in enumerate(order_times, start=1):
+            is_open = order_id > len(order_times) - open_count
+            lines = rng.sample(menu_ids, rng.randint(1, volumes["max_items_per_order"]))
+            total_cents = 0
+            for item_id in lines:
+                quantity = rng.choices([1, 2, 3, 4], weights=[70, 20, 7, 3])[0]
+                items.append((order_id, item_id, quantity))
+                total_cents += quantity * prices[item_id]
+            orders.append(
+                (
+                    order_id,
+                    rng.randrange(1, volumes["tables"] + 1),
+                    rng.choice(waiter_ids),
+                    rng.choice(["Pending", "Ready"]) if is_open else "Completed",
+                    ordered_at,
+                    None if is_open else ordered_at + timedelta(minutes=rng.randrange(20, 90)),
+                    Decimal(total_cents) / 100,
+                )
+            )
+            if len(items) >= BATCH_SIZE:
+                _flush_orders(conn, orders, items)
+                orders, items = [], []
+        _flush_orders(conn, orders, items)
+        cursor.execute("SET @bulk_order_items = NULL")
+
+        for order_id in range(len(order_times) - open_count + 1, len(order_times) + 1):
+            table_id = (order_id % volumes["tables"]) + 1
+            cursor.execute(
+                "UPDATE Orders SET Table_ID = %s WHERE Order_ID = %s", (table_id, order_id)
+            )
+            cursor.execute(
+                "UPDATE Tables SET table_status = 'Occupied', Current_Order_ID = %s WHERE Table_Id = %s",
+                (order_id, table_id),
+            )
+        conn.commit()
+
+        reservations = []
+        for i in range(volumes["reservations"]):
+            day = today + timedelta(days=rng.randrange(-30, 31))
+            start = datetime.combine(day, datetime.min.time()) + timedelta(
+                hours=rng.randrange(11, 23), minutes=rng.choice([0, 15, 30, 45])
+            )
+            reservations.append(
+                (
+                    rng.randrange(1, volumes["customers"] + 1),
+                    rng.randrange(1, volumes["tables"] + 1),
+                    start.date(),
+                    start.time(),
+                    rng.choices(["Booked", "Cancelled"], weights=[9, 1])[0],
+                    rng.randint(1, 8),
+                    start,
+                )
+            )
+        _insert(
+            conn,
+            """
+            INSERT INTO Reservation (Customer_Id, Table_Id, Date, Time, Status, Party_Size, Reservation_DateTime)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """,
+            reservations,
+        )
+        # The reservation insert trigger marks tables occupied; put the floor
+        # back to the open orders only.
+        cursor.execute(
+            "UPDATE Tables SET table_status = 'Available' WHERE Current_Order_ID IS NULL"
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    return app.backfill_sales_rollup()
+
+
+def _flush_orders(conn, orders, items):
+    if not orders:
+        return
+    cursor = conn.cursor()
+    cursor.executemany(
+        """
+        INSERT INTO Orders (Order_ID, Table_ID, Staff_ID, Order_Status, Order_Time, Completed_At, Total_Amount)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """,
+        orders,
+    )
+    cursor.executemany("INSERT INTO Order_Items (Order_ID, Item_ID, Quantity) VALUES (%s, %s, %s)", items)
+    conn.commit()
+
+
+def benchmark_cases(app, rng):
+    """Name -> zero-argument callable for every benchmarked function."""
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    year_ago = today - timedelta(days=365)
+    tables = app.get_table_status()
+    table_ids = [t["Table_Id"] for t in tables]
+    menu_ids = [m["Item_Id"] for m in app.get_menu_items()]
+    waiter_id = next(s["Staff_ID"] for s in app.get_all_staff() if s["Role"] == "Waiter")
+
+    def uncached(fn):
+        def run():
+            app.get_query_cache().clear()
+            return fn()
+
+        return run
+
+    def random_guest_phone():
+        return f"9{100000000 + rng.randrange(DEFAULT_VOLUMES['customers'])}"
+
+    def uncached_customer(phone):
+        app.get_customer_cache().clear()
+        return app.find_customer(phone=phone)
+
+    def random_slot():
+        day = today + timedelta(days=rng.randrange(0, 7))
+        return datetime.combine(day, datetime.min.time()) + timedelta(hours=rng.randrange(11, 23))
+
+    return {
+        "get_sales_report[30d]": lambda: app.get_sales_report(month_ago, today),
+        "get_sales_report[365d]": lambda: app.get_sales_report(year_ago, today),
+        "get_staff_performance[30d]": lambda: app.get_staff_performance(month_ago, today),
+        "get_revenue_analysis[30d]": lambda: app.get_revenue_analysis(month_ago, today),
+        "get_revenue_analysis[365d]": lambda: app.get_revenue_analysis(year_ago, today),
+        "get_inventory_report[30d]": lambda: app.get_inventory_report(month_ago, today),
+        "check_table_availability": lambda: app.check_table_availability(rng.choice(table_ids), random_slot()),
+        "create_order": lambda: app.create_order(
+            rng.choice(table_ids), waiter_id, {i: rng.randint(1, 3) for i in rng.sample(menu_ids, 4)}
+        )[0],
+        "get_table_status[uncached]": uncached(app.get_table_status),
+        "get_menu_items[uncached]": uncached(app.get_menu_items),
+        "get_menu_items[cached]": app.get_menu_items,
+        "get_dashboard_snapshot": lambda: app.get_dashboard_snapshot(ttl=0),
+        "get_open_bills": app.get_open_bills,
+        "get_order_changes[kds_snapshot]": lambda: app.get_order_changes(None),
+        "get_order_changes[kds_poll]": lambda: app.get_order_changes(datetime.now() - timedelta(seconds=5)),
+        "get_reservation": lambda: app.get_reservation(today),
+        "find_customer[uncached]": lambda: uncached_customer(random_guest_phone()),
+        "find_customer[cached]": lambda: app.find_customer(phone=random_guest_phone()),
+        "check_inventory_levels": app.check_inventory_levels,
+        "forecast_demand[uncached]": uncached(app.forecast_demand),
+    }
+
+
+def run_benchmarks(app, repeat, only=None, seed=42):
+    rng = random.Random(seed)
+    results = {}
+    for name, case in benchmark_cases(app, rng).items():
+        if only and not any(pattern in name for pattern in only):
+            continue
+        case()  # warm-up: connection, caches, indexes
+        timings, errors = [], 0
+        for _ in range(repeat):
+            started = time.perf_counter()
+            outcome = case()
+            timings.append((time.perf_counter() - started) * 1000)
+            if outcome is None or outcome is False:
+                errors += 1
+        results[name] = {"runs": repeat, "errors": errors, **_summarise(timings)}
+        print(f"{name:40s} median {results[name]['median_ms']:9.3f} ms  p95 {results[name]['p95_ms']:9.3f} ms")
+    return results
+
+
+def _summarise(timings):
+    timings = sorted(timings)
+    return {
+        "min_ms": timings[0],
+        "median_ms": statistics.median(timings),
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))],
+        "mean_ms": statistics.fmean(timings),
+    }
+
+
+def prepared_cases(app, conn, rng):
+    """The app's hot statements with realistic parameters: name -> (sql, make_params)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT Username, Password, Role FROM Staff")
+    staff = cursor.fetchall()
+    cursor.execute("SELECT Item_Id FROM Menu_Items")
+    menu_ids = [row[0] for row in cursor.fetchall()]
+    cursor.close()
+    today = date.today()
+
+    def reservation_days():
+        day = today + timedelta(days=rng.randrange(0, 30))
+        return [day - timedelta(days=1), day, day + timedelta(days=1)]
+
+    return {
+        "check_staff_login": (app.STAFF_LOGIN_SQL, lambda: rng.choice(staff)),
+        "get_booked_reservations": (app.in_list_sql(app.BOOKED_RESERVATIONS_SQL, 3), reservation_days),
+        "get_order_changes[kds_poll]": (
+            app.ORDER_CHANGES_SINCE_SQL,
+            lambda: (datetime.now() - timedelta(seconds=5),) * 2 + (0, 500),
+        ),
+        "get_order_changes[kds_snapshot]": (app.PENDING_ORDERS_SQL, lambda: (0, 500)),
+        "insert_order[menu_lookup]": (
+            app.in_list_sql(app.MENU_AVAILABILITY_SQL, 4),
+            lambda: rng.sample(menu_ids, 4),
+        ),
+    }
+
+
+def synthetic_hourly_sales(items, weeks, seed=42):
+    """
+    Poisson hourly sales with lunch/dinner peaks, busier weekends, a
+    per-item popularity and a slow trend: (true hourly rates, sales).
+    """
+    rng = np.random.default_rng(seed)
+    day_shape = np.array(HOUR_WEIGHTS, dtype=float) / sum(HOUR_WEIGHTS)
+    week_shape = np.concatenate([day_shape * (1.4 if day >= 5 else 1.0) for day in range(7)])
+    popularity = rng.gamma(2.0, 15.0, items)  # portions per day
+    trend = np.linspace(0.9, 1.1, weeks).repeat(7 * 24)
+    rates = popularity[:, None] * np.tile(week_shape, weeks)[None, :] * trend[None, :]
+    return rates, rng.poisson(rates).astype(float)
+
+
+def run_forecast_benchmark(app, items, weeks, repeat, seed=42):
+    """
+    Time fitting the demand model on `weeks` weeks of synthetic history for
+    `items` menu items, and score next week's forecast against the true
+    rates next to the naive same-hour-last-week forecast.
+    """
+    rates, sales = synthetic_hourly_sales(items, weeks + 1, seed)
+    history, next_week = sales[:, : weeks * 168], rates[:, weeks * 168 :]
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        level, shares = app.fit_demand_model(history, 0, app.FORECAST_CONFIG["smoothing"])
+        forecast = app.forecast_hours(level, shares, 0, 168)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    naive = history[:, -168:]
+    name = f"fit_demand_model[{items}x{weeks}w]"
+    results = {
+        name: {
+            "runs": repeat,
+            "errors": 0,
+            **_summarise(timings),
+            "mae_model": float(np.abs(forecast - next_week).mean()),
+            "mae_last_week": float(np.abs(naive - next_week).mean()),
+        }
+    }
+    print(f"Fitted {items} items x {weeks} weeks: median {results[name]['median_ms']:.1f} ms")
+    print(
+        f"Mean absolute error per item-hour: model {results[name]['mae_model']:.3f}, "
+        f"same hour last week {results[name]['mae_last_week']:.3f}"
+    )
+    return results
+
+
+async def _http_request(reader, writer, method, path, body=None, headers=None):
+    """One request on a keep-alive HTTP/1.1 connection: (status, body bytes)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n{extra}"
+        f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+def api_request_mix(app, rng):
+    """Zero-argument picker of (name, method, path, body, headers): POS and kitchen screen traffic."""
+    table_ids = [t["Table_Id"] for t in app.get_table_status()]
+    menu_ids = [m["Item_Id"] for m in app.get_menu_items()]
+    waiter_id = next(s["Staff_ID"] for s in app.get_all_staff() if s["Role"] == "Waiter")
+
+    def new_order():
+        items = {str(item_id): rng.randint(1, 3) for item_id in rng.sample(menu_ids, rng.randint(1, 4))}
+        body = {"table_id": rng.choice(table_ids), "staff_id": waiter_id, "items": items}
+        return "POST", "/orders", body, {"Idempotency-Key": f"bench-{rng.getrandbits(64):016x}"}
+
+    requests = {
+        "tables": lambda: ("GET", "/tables", None, None),
+        "menu": lambda: ("GET", "/menu", None, None),
+        "kitchen_poll": lambda: (
+            "GET",
+            f"/orders/changes?since={(datetime.now() - timedelta(seconds=5)).isoformat()}",
+            None,
+            None,
+        ),
+        "order": new_order,
+    }
+    weights = {"tables": 3, "menu": 3, "kitchen_poll": 3, "order": 1}
+    names = list(weights)
+
+    def pick():
+        name = rng.choices(names, [weights[n] for n in names])[0]
+        return (name, *requests[name]())
+
+    return pick
+
+
+async def _api_client(host, port, deadline, pick, latencies, statuses):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            name, method, path, body, headers = pick()
+            started = time.perf_counter()
+            status, _ = await _http_request(reader, writer, method, path, body, headers)
+            latencies.setdefault(name, []).append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+    finally:
+        writer.close()
+
+
+def _process_tree_cpu(pid):
+    """CPU seconds used so far by a process and its descendants (Linux /proc)."""
+    ticks = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            fields = Path(f"/proc/{current}/stat").read_text().rsplit(")", 1)[1].split()
+            ticks += int(fields[11]) + int(fields[12])  # utime, stime
+            for task in Path(f"/proc/{current}/task").iterdir():
+                pending.extend(int(child) for child in (task / "children").read_text().split())
+        except (OSError, IndexError):
+            continue
+    return ticks / os.sysconf("SC_CLK_TCK")
+
+
+def run_api_load_test(app, db_config, workers, connections, duration, port=8650, seed=42):
+    """
+    Start the JSON API with `workers` processes against the benchmark
+    database and drive it with `connections` keep-alive clients for
+    `duration` seconds. Throughput is reported per second of wall time and
+    per CPU second the server used, i.e. requests per second per core.
+    """
+    rng = random.Random(seed)
+    pick = api_request_mix(app, rng)
+    server = subprocess.Popen(
+        [sys.executable, str(API_PATH), "--port", str(port), "--workers", str(workers)]
+        + [argument for key, value in db_config.items() for argument in (f"--db-{key}", str(value))],
+    )
+    try:
+        asyncio.run(_wait_for_api("127.0.0.1", port))
+        latencies, statuses = {}, Counter()
+        cpu_before = _process_tree_cpu(server.pid)
+
+        async def drive():
+            deadline = time.perf_counter() + duration
+            await asyncio.gather(
+                *(_api_client("127.0.0.1", port, deadline, pick, latencies, statuses) for _ in range(connections))
+            )
+
+        started = time.perf_counter()
+        asyncio.run(drive())
+        elapsed = time.perf_counter() - started
+        cpu_seconds = _process_tree_cpu(server.pid) - cpu_before
+    finally:
+        server.terminate()
+        server.wait()
+
+    total = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    results = {
+        f"api[{name}]": {"runs": len(timings), **_summarise(timings)} for name, timings in latencies.items()
+    }
+    results["api[all]"] = {
+        "runs": total,
+        "errors": errors,
+        **_summarise([t for timings in latencies.values() for t in timings]),
+        "workers": workers,
+        "connections": connections,
+        "requests_per_second": total / elapsed,
+        "server_cpu_seconds": cpu_seconds,
+        "requests_per_core_second": total / cpu_seconds if cpu_seconds else None,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }
+    summary = results["api[all]"]
+    print(
+        f"{total} requests in {elapsed:.1f}s: {summary['requests_per_second']:.0f} req/s, "
+        f"{summary['requests_per_core_second'] or 0:.0f} req/s per core, "
+        f"p50 {summary['median_ms']:.1f} ms, p95 {summary['p95_ms']:.1f} ms, {errors} errors"
+    )
+    return results
+
+
+async def _wait_for_api(host, port, timeout=30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            status, _ = await _http_request(reader, writer, "GET", "/health")
+            writer.close()
+            if status == 200:
+                return
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            pass
+        if time.perf_counter() > deadline:
+            raise RuntimeError(f"API did not start on port {port}")
+        await asyncio.sleep(0.2)
+
+
+def _session_counters(conn):
+    cursor = conn.cursor()
+    cursor.execute("SHOW SESSION STATUS WHERE Variable_name IN ('Com_stmt_prepare', 'Com_stmt_execute')")
+    counters = {name: int(value) for name, value in cursor.fetchall()}
+    cursor.close()
+    return counters
+
+
+def run_prepared_benchmark(app, db_config, rate, duration, seed=42):
+    """
+    Time each hot statement as plain text queries and as a reused prepared
+    statement, paced at `rate` calls per second for `duration` seconds.
+
+    The difference in median latency is the per-call parse and plan cost the
+    registry saves; multiplied by the rate it is the server time saved per
+    second at that load.
+    """
+    rng = random.Random(seed)
+    conn = mysql.connector.connect(**db_config)
+    results = {}
+    try:
+        for name, (sql, make_params) in prepared_cases(app, conn, rng).items():
+            for mode in ("text", "prepared"):
+                cursor = conn.cursor(prepared=mode == "prepared")
+                cursor.execute(sql, make_params())  # warm-up, and the one prepare
+                cursor.fetchall()
+                before = _session_counters(conn)
+                timings = []
+                next_call = time.perf_counter()
+                deadline = next_call + duration
+                while next_call < deadline:
+                    pause = next_call - time.perf_counter()
+                    if pause > 0:
+                        time.sleep(pause)
+                    started = time.perf_counter()
+                    cursor.execute(sql, make_params())
+                    cursor.fetchall()
+                    timings.append((time.perf_counter() - started) * 1000)
+                    next_call += 1 / rate
+                after = _session_counters(conn)
+                cursor.close()
+                results[f"{name}[{mode}]"] = {
+                    "runs": len(timings),
+                    "prepares": after["Com_stmt_prepare"] - before["Com_stmt_prepare"],
+                    **_summarise(timings),
+                }
+
+            text, prepared = results[f"{name}[text]"], results[f"{name}[prepared]"]
+            saved_ms = text["median_ms"] - prepared["median_ms"]
+            prepared["saved_ms_per_call"] = saved_ms
+            prepared["saved_ms_per_second"] = saved_ms * rate
+            print(
+                f"{name:36s} text {text['median_ms']:8.3f} ms  prepared {prepared['median_ms']:8.3f} ms  "
+                f"saved {saved_ms:+.3f} ms/call, {saved_ms * rate:+.1f} ms/s at {rate}/s "
+                f"({prepared['prepares']} prepares in {prepared['runs']} calls)"
+            )
+    finally:
+        conn.close()
+    return results
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(path, results, db_config, repeat, query_stats=None, routing_stats=None):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "database": db_config["database"],
+        "repeat": repeat,
+        "results": results,
+        "query_stats": query_stats or [],
+        "routing_stats": routing_stats,
+    }
+    path.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {path}")
+
+
+def compare_results(baseline_path, candidate_path):
+    baseline = json.loads(Path(baseline_path).read_text())["results"]
+    candidate = json.loads(Path(candidate_path).read_text())["results"]
+    print(f"{'function':40s} {'baseline':>12s} {'candidate':>12s} {'change':>8s}")
+    for name in sorted(set(baseline) & set(candidate)):
+        before, after = baseline[name]["median_ms"], candidate[name]["median_ms"]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"{name:40s} {before:10.3f}ms {after:10.3f}ms {change:+7.1f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=BENCH_DB_CONFIG["host"])
+    parser.add_argument("--user", default=BENCH_DB_CONFIG["user"])
+    parser.add_argument("--password", default=BENCH_DB_CONFIG["password"])
+    parser.add_argument("--database", default=BENCH_DB_CONFIG["database"])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    setup = commands.add_parser("setup", help="Create the schema and generate synthetic data")
+    for key, value in DEFAULT_VOLUMES.items():
+        setup.add_argument(f"--{key.replace('_', '-')}", type=int, default=value)
+
+    run = commands.add_parser("run", help="Time every data function")
+    run.add_argument("--repeat", type=int, default=20)
+    run.add_argument("--only", nargs="*", help="Run only cases whose name contains one of these")
+    run.add_argument("--output", default=f"bench_results/{datetime.now():%Y%m%d_%H%M%S}.json")
+    run.add_argument(
+        "--replica", action="append", default=[], metavar="HOST[:PORT]",
+        help="Read replica of the benchmark database for reporting reads (repeatable)",
+    )
+
+    prepared = commands.add_parser(
+        "prepared", help="Compare text queries with prepared statements for the hot statements"
+    )
+    prepared.add_argument("--rate", type=float, default=200.0, help="calls per second")
+    prepared.add_argument("--duration", type=float, default=10.0, help="seconds per statement and mode")
+    prepared.add_argument("--output", default=f"bench_results/prepared_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+    forecast = commands.add_parser(
+        "forecast", help="Time the demand forecast fit on synthetic history (no database needed)"
+    )
+    forecast.add_argument("--items", type=int, default=500)
+    forecast.add_argument("--weeks", type=int, default=52)
+    forecast.add_argument("--repeat", type=int, default=10)
+    forecast.add_argument("--output", default=f"bench_results/forecast_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+    api = commands.add_parser("api", help="Load-test the JSON API against the benchmark database")
+    api.add_argument("--workers", type=int, default=1, help="API server processes")
+    api.add_argument("--connections", type=int, default=64, help="concurrent keep-alive clients")
+    api.add_argument("--duration", type=float, default=20.0, help="seconds")
+    api.add_argument("--port", type=int, default=8650)
+    api.add_argument("--output", default=f"bench_results/api_{datetime.now():%Y%m%d_%H%M%S}.json")
+
+    compare = commands.add_parser("compare", help="Compare two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("candidate")
+
+    args = parser.parse_args(argv)
+    db_config = {"host": args.host, "user": args.user, "password": args.password, "database": args.database}
+
+    if args.command == "setup":
+        volumes = {key: getattr(args, key) for key in DEFAULT_VOLUMES}
+        started = time.perf_counter()
+        create_schema(db_config)
+        rollup_rows = generate_data(connect_app(db_config), db_config, volumes)
+        print(f"Generated {volumes['orders']} orders ({rollup_rows} rollup rows) in {time.perf_counter() - started:.1f}s")
+    elif args.command == "run":
+        app = connect_app(db_config, args.replica)
+        results = run_benchmarks(app, args.repeat, args.only)
+        routing_stats = app.get_routing_stats()
+        print(
+            f"Reads routed: {routing_stats['replica_reads']} to replicas, "
+            f"{routing_stats['primary_reads']} to the primary"
+        )
+        write_results(args.output, results, db_config, args.repeat, app.get_query_stats(), routing_stats)
+    elif args.command == "prepared":
+        results = run_prepared_benchmark(load_app(), db_config, args.rate, args.duration)
+        write_results(args.output, results, db_config, None)
+    elif args.command == "api":
+        results = run_api_load_test(
+            connect_app(db_config), db_config, args.workers, args.connections, args.duration, args.port
+        )
+        write_results(args.output, results, db_config, None)
+    elif args.command == "forecast":
+        results = run_forecast_benchmark(load_app(), args.items, args.weeks, args.repeat)
+        write_results(args.output, results, db_config, args.repeat)
+    else:
+        compare_results(args.baseline, args.candidate)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,12 @@
+DROP TABLE IF EXISTS Reservation_Archive;
+DROP TABLE IF EXISTS Payment_Archive;
+DROP TABLE IF EXISTS Order_Items_Archive;
+DROP TABLE IF EXISTS Orders_Archive;
+DROP TABLE IF EXISTS Applied_Writes;
+DROP TABLE IF EXISTS Stock_Depletions;
+DROP TABLE IF EXISTS Recipe_Items;
+DROP TABLE IF EXISTS Daily_Sales_Rollup;
+DROP TABLE IF EXISTS Daily_Order_Rollup;
 DROP TABLE IF EXISTS Order_Items;
 DROP TABLE IF EXISTS Orders;
 DROP TABLE IF EXISTS Payment;
@@ -23,7 +32,12 @@ CREATE TABLE Customers (
     Cust_Id INT PRIMARY KEY AUTO_INCREMENT,
     Cust_Name VARCHAR(20) NOT NULL,
     PhoneNumber VARCHAR(15),
-    Email VARCHAR(30)
+    Email VARCHAR(30),
+    -- Normalised identity keys set by the application (digits with country
+    -- code, lower-cased email); a guest is found by either. Existing
+    -- customers get them from the backfill-customer-keys command
+    Phone_Key VARCHAR(20) UNIQUE,
+    Email_Key VARCHAR(100) UNIQUE
 );
 
 CREATE TABLE Menu_Items (
@@ -51,7 +65,10 @@ CREATE TABLE Orders (
     Order_Status ENUM('Pending', 'Ready', 'Completed', 'Cancelled') NOT NULL,
     Order_Time DATETIME NOT NULL,
     Completed_At DATETIME,
-    Total_Amount DECIMAL(10,2)
+    Total_Amount DECIMAL(10,2),
+    -- Microsecond change stamp; item changes touch it through the total
+    -- triggers, so it drives the kitchen display change feed
+    Updated_At DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6)
 );
 
 CREATE TABLE Order_Items (
@@ -66,9 +83,14 @@ CREATE TABLE Order_Items (
 CREATE TABLE Inventory (
     Inventory_Id INT PRIMARY KEY AUTO_INCREMENT,
     Item_Name VARCHAR(100) NOT NULL,
-    Current_Stock INT NOT NULL,
+    Current_Stock DECIMAL(12,3) NOT NULL,
     Reorder_Level INT NOT NULL,
     Unit VARCHAR(20),
+    -- Stock as a fraction of the reorder level; at or below 1 means reorder.
+    -- Stored and indexed so low-stock lookups are a range scan in urgency order.
+    Stock_Ratio DECIMAL(16,4) AS (
+        IF(Reorder_Level > 0, Current_Stock / Reorder_Level, IF(Current_Stock <= 0, 0, NULL))
+    ) STORED,
     Created_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     Updated_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
@@ -76,7 +98,7 @@ CREATE TABLE Inventory (
 CREATE TABLE Payment (
     Payment_Id INT PRIMARY KEY AUTO_INCREMENT,
     Order_Id INT NOT NULL,
-    Customer_Id INT NOT NULL,
+    Customer_Id INT,  -- NULL for walk-in guests
     Payment_Method CHAR(50),
     Payment_Status ENUM("Paid", "Yet to pay"),
     Total_Amount DECIMAL(10,2),
@@ -97,6 +119,64 @@ CREATE TABLE Reservation (
     Updated_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
 );
 
+-- Sales rollups, maintained by the rollup_completed_order trigger and
+-- rebuilt per date range from the application
+CREATE TABLE Daily_Sales_Rollup (
+    Sale_Date DATE NOT NULL,
+    Category CHAR(30) NOT NULL,
+    Staff_ID INT NOT NULL,
+    Order_Count INT NOT NULL DEFAULT 0,
+    Items_Sold INT NOT NULL DEFAULT 0,
+    Revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    Updated_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (Sale_Date, Category, Staff_ID)
+);
+
+-- Order counts are not additive across categories, so they are kept per
+-- (date, staff) here
+CREATE TABLE Daily_Order_Rollup (
+    Sale_Date DATE NOT NULL,
+    Staff_ID INT NOT NULL,
+    Order_Count INT NOT NULL DEFAULT 0,
+    Revenue DECIMAL(12,2) NOT NULL DEFAULT 0,
+    Updated_At TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (Sale_Date, Staff_ID)
+);
+
+-- Bill of materials: how much of each inventory item one portion of a menu
+-- item uses. Quantity/Unit are as entered; Stock_Quantity is the same amount
+-- in the inventory item's own unit and is what depletion subtracts.
+CREATE TABLE Recipe_Items (
+    Item_Id INT NOT NULL,
+    Inventory_Id INT NOT NULL,
+    Quantity DECIMAL(12,4) NOT NULL,
+    Unit VARCHAR(20),
+    Stock_Quantity DECIMAL(12,4) NOT NULL,
+    PRIMARY KEY (Item_Id, Inventory_Id),
+    FOREIGN KEY (Item_Id) REFERENCES Menu_Items(Item_Id),
+    FOREIGN KEY (Inventory_Id) REFERENCES Inventory(Inventory_Id)
+);
+
+-- One row per order whose ingredients are due to come out of stock. The
+-- queue_stock_depletion trigger adds it when the order reaches Ready or
+-- Completed; the application settles pending rows in batches and stamps
+-- Depleted_At, so an order is never depleted twice.
+CREATE TABLE Stock_Depletions (
+    Order_ID INT PRIMARY KEY,
+    Queued_At DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
+    Depleted_At DATETIME(6),
+    FOREIGN KEY (Order_ID) REFERENCES Orders(Order_ID)
+);
+
+-- Idempotency keys of writes applied from the application's local write
+-- journal, recorded in the same transaction as the write itself
+CREATE TABLE Applied_Writes (
+    Write_Key CHAR(32) PRIMARY KEY,
+    Kind VARCHAR(20) NOT NULL,
+    Result_Id INT,
+    Applied_At DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+);
+
 ALTER TABLE Tables
     ADD FOREIGN KEY (Current_Order_ID) REFERENCES Orders(Order_ID);
 
@@ -130,13 +210,17 @@ BEGIN
 END //
 DELIMITER ;
 
--- Trigger to set table status to available after reservation deletion
+-- Trigger to set table status to available after reservation deletion.
+-- Moving past reservations to the archive sets @archiving, and leaves the
+-- table as it is.
 DELIMITER //
 CREATE TRIGGER after_reservation_delete
 AFTER DELETE ON Reservation
 FOR EACH ROW
 BEGIN
-    UPDATE Tables SET table_status = 'Available' WHERE Table_Id = OLD.Table_Id;
+    IF @archiving IS NULL THEN
+        UPDATE Tables SET table_status = 'Available' WHERE Table_Id = OLD.Table_Id;
+    END IF;
 END //
 DELIMITER ;
 
@@ -156,22 +240,24 @@ DELIMITER ;
 -- Drop existing triggers
 DROP TRIGGER IF EXISTS after_order_complete;
 DROP TRIGGER IF EXISTS calculate_order_total;
--- Modified calculate_order_total trigger
+-- Order totals are maintained incrementally: each trigger applies only the
+-- change in value of the row it fires for. Batched writes set the session
+-- variable @bulk_order_items, which makes the row triggers stand down, and
+-- settle the affected orders with one set-based UPDATE afterwards.
+DROP TRIGGER IF EXISTS calculate_order_total_on_update;
+DROP TRIGGER IF EXISTS calculate_order_total_on_delete;
 DELIMITER //
 CREATE TRIGGER calculate_order_total 
 AFTER INSERT ON Order_Items
 FOR EACH ROW
 BEGIN
-    DECLARE total_amount DECIMAL(10, 2);
-    
-    SELECT SUM(oi.Quantity * mi.Price) INTO total_amount
-    FROM Order_Items oi
-    JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-    WHERE oi.Order_ID = NEW.Order_ID;
-    
-    UPDATE Orders 
-    SET Total_Amount = total_amount 
-    WHERE Order_ID = NEW.Order_ID;
+    IF @bulk_order_items IS NULL THEN
+        UPDATE Orders
+        SET Total_Amount = COALESCE(Total_Amount, 0)
+            + NEW.Quantity * (SELECT Price FROM Menu_Items WHERE Item_Id = NEW.Item_ID),
+            Updated_At = CURRENT_TIMESTAMP(6)
+        WHERE Order_ID = NEW.Order_ID;
+    END IF;
 END //
 DELIMITER ;
 -- Calculate total on order item update
@@ -180,16 +266,34 @@ CREATE TRIGGER calculate_order_total_on_update
 AFTER UPDATE ON Order_Items
 FOR EACH ROW
 BEGIN
-    DECLARE total_amount DECIMAL(10, 2);
-    
-    SELECT SUM(oi.Quantity * mi.Price) INTO total_amount
-    FROM Order_Items oi
-    JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-    WHERE oi.Order_ID = NEW.Order_ID;
-    
-    UPDATE Orders 
-    SET Total_Amount = total_amount 
-    WHERE Order_ID = NEW.Order_ID;
+    DECLARE old_value DECIMAL(10, 2);
+    DECLARE new_value DECIMAL(10, 2);
+
+    IF @bulk_order_items IS NULL
+        AND (NEW.Quantity <> OLD.Quantity
+             OR NEW.Item_ID <> OLD.Item_ID
+             OR NEW.Order_ID <> OLD.Order_ID) THEN
+        SELECT OLD.Quantity * Price INTO old_value
+        FROM Menu_Items WHERE Item_Id = OLD.Item_ID;
+        SELECT NEW.Quantity * Price INTO new_value
+        FROM Menu_Items WHERE Item_Id = NEW.Item_ID;
+
+        IF NEW.Order_ID = OLD.Order_ID THEN
+            UPDATE Orders
+            SET Total_Amount = COALESCE(Total_Amount, 0) + new_value - old_value,
+                Updated_At = CURRENT_TIMESTAMP(6)
+            WHERE Order_ID = NEW.Order_ID;
+        ELSE
+            UPDATE Orders
+            SET Total_Amount = COALESCE(Total_Amount, 0) - old_value,
+                Updated_At = CURRENT_TIMESTAMP(6)
+            WHERE Order_ID = OLD.Order_ID;
+            UPDATE Orders
+            SET Total_Amount = COALESCE(Total_Amount, 0) + new_value,
+                Updated_At = CURRENT_TIMESTAMP(6)
+            WHERE Order_ID = NEW.Order_ID;
+        END IF;
+    END IF;
 END //
 
 DELIMITER ;
@@ -201,16 +305,13 @@ CREATE TRIGGER calculate_order_total_on_delete
 AFTER DELETE ON Order_Items
 FOR EACH ROW
 BEGIN
-    DECLARE total_amount DECIMAL(10, 2);
-    
-    SELECT SUM(oi.Quantity * mi.Price) INTO total_amount
-    FROM Order_Items oi
-    JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
-    WHERE oi.Order_ID = OLD.Order_ID;
-    
-    UPDATE Orders 
-    SET Total_Amount = COALESCE(total_amount, 0)
-    WHERE Order_ID = OLD.Order_ID;
+    IF @bulk_order_items IS NULL THEN
+        UPDATE Orders
+        SET Total_Amount = COALESCE(Total_Amount, 0)
+            - OLD.Quantity * (SELECT Price FROM Menu_Items WHERE Item_Id = OLD.Item_ID),
+            Updated_At = CURRENT_TIMESTAMP(6)
+        WHERE Order_ID = OLD.Order_ID;
+    END IF;
 END //
 
 DELIMITER ;
@@ -229,24 +330,113 @@ END //
 
 DELIMITER ;
 
+-- Fold an order into the sales rollups when it completes, and take it back
+-- out if it is reopened
+DELIMITER //
+
+CREATE TRIGGER rollup_completed_order
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    IF NEW.Order_Status = 'Completed' AND OLD.Order_Status != 'Completed' THEN
+        INSERT INTO Daily_Sales_Rollup (Sale_Date, Category, Staff_ID, Order_Count, Items_Sold, Revenue)
+        SELECT DATE(NEW.Order_Time), mi.Category, NEW.Staff_ID, 1,
+               SUM(oi.Quantity), SUM(oi.Quantity * mi.Price)
+        FROM Order_Items oi
+        JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+        WHERE oi.Order_ID = NEW.Order_ID
+        GROUP BY mi.Category
+        ON DUPLICATE KEY UPDATE
+            Order_Count = Order_Count + VALUES(Order_Count),
+            Items_Sold = Items_Sold + VALUES(Items_Sold),
+            Revenue = Revenue + VALUES(Revenue);
+
+        INSERT INTO Daily_Order_Rollup (Sale_Date, Staff_ID, Order_Count, Revenue)
+        SELECT DATE(NEW.Order_Time), NEW.Staff_ID, 1, COALESCE(SUM(oi.Quantity * mi.Price), 0)
+        FROM Order_Items oi
+        JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+        WHERE oi.Order_ID = NEW.Order_ID
+        ON DUPLICATE KEY UPDATE
+            Order_Count = Order_Count + VALUES(Order_Count),
+            Revenue = Revenue + VALUES(Revenue);
+    ELSEIF OLD.Order_Status = 'Completed' AND NEW.Order_Status != 'Completed' THEN
+        UPDATE Daily_Sales_Rollup r
+        JOIN (
+            SELECT mi.Category, SUM(oi.Quantity) AS Items_Sold,
+                   SUM(oi.Quantity * mi.Price) AS Revenue
+            FROM Order_Items oi
+            JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+            WHERE oi.Order_ID = OLD.Order_ID
+            GROUP BY mi.Category
+        ) t ON r.Category = t.Category
+        SET r.Order_Count = r.Order_Count - 1,
+            r.Items_Sold = r.Items_Sold - t.Items_Sold,
+            r.Revenue = r.Revenue - t.Revenue
+        WHERE r.Sale_Date = DATE(OLD.Order_Time) AND r.Staff_ID = OLD.Staff_ID;
+
+        UPDATE Daily_Order_Rollup
+        SET Order_Count = Order_Count - 1,
+            Revenue = Revenue - (
+                SELECT COALESCE(SUM(oi.Quantity * mi.Price), 0)
+                FROM Order_Items oi
+                JOIN Menu_Items mi ON oi.Item_ID = mi.Item_Id
+                WHERE oi.Order_ID = OLD.Order_ID
+            )
+        WHERE Sale_Date = DATE(OLD.Order_Time) AND Staff_ID = OLD.Staff_ID;
+    END IF;
+END //
+
+DELIMITER ;
+
+-- Queue an order's ingredients for depletion the first time it is ready or
+-- completed. Only the queue row is written here, so completing an order never
+-- waits on locks held on busy Inventory rows.
+DELIMITER //
+
+CREATE TRIGGER queue_stock_depletion
+AFTER UPDATE ON Orders
+FOR EACH ROW
+BEGIN
+    IF NEW.Order_Status IN ('Ready', 'Completed')
+        AND OLD.Order_Status NOT IN ('Ready', 'Completed') THEN
+        INSERT IGNORE INTO Stock_Depletions (Order_ID) VALUES (NEW.Order_ID);
+    END IF;
+END //
+
 DELIMITER ;
 -- Indices for performance
-CREATE INDEX idx_staff_role ON Staff(Role);
-CREATE INDEX idx_menu_category ON Menu_Items(Category);
+CREATE INDEX idx_staff_role ON Staff(Role, Username);
+CREATE INDEX idx_menu_category ON Menu_Items(Category, Item_Name);
 CREATE INDEX idx_order_status ON Orders(Order_Status);
 CREATE INDEX idx_order_date ON Orders(Order_Time);
+CREATE INDEX idx_order_updated ON Orders(Updated_At);
+CREATE INDEX idx_reservation_date ON Reservation(Date, Status);
 CREATE INDEX idx_inventory_stock ON Inventory(Current_Stock);
+CREATE INDEX idx_inventory_ratio ON Inventory(Stock_Ratio);
+CREATE INDEX idx_inventory_name ON Inventory(Item_Name);
+CREATE INDEX idx_recipe_inventory ON Recipe_Items(Inventory_Id);
+CREATE INDEX idx_depletion_pending ON Stock_Depletions(Depleted_At, Order_ID);
+
+-- Archive tables: closed orders with their items and payments, and past
+-- reservations, once older than the application's retention window. Created
+-- LIKE the hot tables (after their indexes, which are copied; foreign keys
+-- are not) so rows move with INSERT ... SELECT *; keep them in step with any
+-- change to the hot tables.
+CREATE TABLE Orders_Archive LIKE Orders;
+CREATE TABLE Order_Items_Archive LIKE Order_Items;
+CREATE TABLE Payment_Archive LIKE Payment;
+CREATE TABLE Reservation_Archive LIKE Reservation;
+CREATE INDEX idx_payment_archive_created ON Payment_Archive(Created_At);
 
 -- Views for reporting
 CREATE OR REPLACE VIEW daily_sales AS
 SELECT 
-    DATE(o.Order_Time) AS sale_date,
-    COUNT(DISTINCT o.Order_ID) AS total_orders,
-    SUM(o.Total_Amount) AS total_revenue,
-    AVG(o.Total_Amount) AS average_order_value
-FROM Orders o
-WHERE o.Order_Status = 'Completed'
-GROUP BY DATE(o.Order_Time);
+    r.Sale_Date AS sale_date,
+    SUM(r.Order_Count) AS total_orders,
+    SUM(r.Revenue) AS total_revenue,
+    SUM(r.Revenue) / NULLIF(SUM(r.Order_Count), 0) AS average_order_value
+FROM Daily_Order_Rollup r
+GROUP BY r.Sale_Date;
 
 CREATE OR REPLACE VIEW staff_performance AS
 SELECT 
@@ -257,7 +447,11 @@ SELECT
     SUM(o.Total_Amount) AS total_sales,
     AVG(o.Total_Amount) AS average_order_value
 FROM Staff s
-LEFT JOIN Orders o ON s.Staff_ID = o.Staff_ID
+LEFT JOIN (
+    SELECT Order_ID, Staff_ID, Order_Status, Total_Amount FROM Orders
+    UNION ALL
+    SELECT Order_ID, Staff_ID, Order_Status, Total_Amount FROM Orders_Archive
+) o ON s.Staff_ID = o.Staff_ID
 WHERE o.Order_Status = 'Completed'
 GROUP BY s.Staff_ID;
 
@@ -362,3 +556,7 @@ DELIMITER ;
 ALTER TABLE Reservation
 MODIFY COLUMN Reservation_DateTime DATETIME DEFAULT CURRENT_TIMESTAMP;
 
+-- Reservation_Archive was created LIKE Reservation before this change
+ALTER TABLE Reservation_Archive
+MODIFY COLUMN Reservation_DateTime DATETIME DEFAULT CURRENT_TIMESTAMP;
+
@@ -0,0 +1,19 @@
+import importlib.util
+import pathlib
+
+import pytest
+import streamlit
+
+APP_PATH = pathlib.Path(__file__).resolve().parent.parent / "Restaurant Management System.py"
+
+
+@pytest.fixture(scope="session")
+def app():
+    """The Streamlit app imported as a module, without running its UI."""
+    # Parse Streamlit's config first, otherwise it resets the log level
+    streamlit.config.get_config_options()
+    streamlit.logger.set_log_level("error")
+    spec = importlib.util.spec_from_file_location("restaurant_app", APP_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,111 @@
+from datetime import date, datetime, time as dt_time, timedelta
+
+import pytest
+
+TABLES = [
+    {"Table_Id": 1, "Capacity": 2},
+    {"Table_Id": 2, "Capacity": 4},
+    {"Table_Id": 3, "Capacity": 6},
+]
+
+DAY = date(2024, 5, 10)
+
+
+def at(hour, minute=0, day=DAY):
+    return datetime.combine(day, dt_time(hour, minute))
+
+
+def booking(reserve_id, table_id, start):
+    return {
+        "Reserve_Id": reserve_id,
+        "Table_Id": table_id,
+        "Date": start.date(),
+        "Time": timedelta(hours=start.hour, minutes=start.minute),
+    }
+
+
+@pytest.fixture
+def bookings(app, monkeypatch):
+    rows = []
+    loads = []
+
+    def get_booked_reservations(dates):
+        loads.append(sorted(dates))
+        return [row for row in rows if row["Date"] in dates]
+
+    monkeypatch.setattr(app, "get_booked_reservations", get_booked_reservations)
+    monkeypatch.setattr(app, "get_table_status", lambda: TABLES)
+    return rows, loads
+
+
+@pytest.fixture
+def index(app):
+    return app.AvailabilityIndex(window_hours=2, ttl=60.0)
+
+
+def test_free_without_bookings(index, bookings):
+    assert index.is_free(1, at(19)) is True
+
+
+def test_clash_within_window_on_both_sides(index, bookings):
+    rows, _ = bookings
+    rows.append(booking(1, 1, at(19)))
+    assert index.is_free(1, at(17, 1)) is False
+    assert index.is_free(1, at(20, 59)) is False
+    assert index.is_free(1, at(21)) is False  # the window is inclusive
+    assert index.is_free(1, at(21, 1)) is True
+    assert index.is_free(1, at(16, 59)) is True
+    assert index.is_free(2, at(19)) is True
+
+
+def test_window_crosses_midnight(index, bookings):
+    rows, _ = bookings
+    rows.append(booking(1, 1, at(23, 30, DAY - timedelta(days=1))))
+    assert index.is_free(1, at(1)) is False
+    assert index.is_free(1, at(1, 31)) is True
+
+
+def test_free_tables_smallest_first(index, bookings):
+    rows, _ = bookings
+    rows.append(booking(1, 2, at(19)))
+    free = index.free_tables(at(19, 30), party_size=2)
+    assert [t["Table_Id"] for t in free] == [1, 3]
+    assert [t["Table_Id"] for t in index.free_tables(at(19, 30), party_size=5)] == [3]
+
+
+def test_next_free_slot_skips_clashing_bookings(index, bookings):
+    rows, _ = bookings
+    rows.append(booking(1, 1, at(18)))
+    rows.append(booking(2, 1, at(20)))
+    assert index.next_free_slot(at(18), table_id=1) == (1, at(22, 1))
+
+
+def test_next_free_slot_prefers_earliest_table(index, bookings):
+    rows, _ = bookings
+    rows.append(booking(1, 1, at(18)))
+    assert index.next_free_slot(at(18), party_size=2) == (2, at(18))
+
+
+def test_add_and_remove(index, bookings):
+    assert index.is_free(1, at(12)) is True
+    index.add(10, 1, at(12))
+    assert index.is_free(1, at(13)) is False
+    index.remove(10)
+    assert index.is_free(1, at(13)) is True
+    index.remove(10)  # removing twice is harmless
+
+
+def test_days_load_once_until_invalidated(index, bookings):
+    _, loads = bookings
+    index.is_free(1, at(12))
+    index.is_free(1, at(15))
+    assert len(loads) == 1
+    assert loads[0] == [DAY - timedelta(days=1), DAY, DAY + timedelta(days=1)]
+    index.invalidate()
+    index.is_free(1, at(12))
+    assert len(loads) == 2
+
+
+def test_failed_load(index, app, monkeypatch):
+    monkeypatch.setattr(app, "get_booked_reservations", lambda dates: None)
+    assert index.is_free(1, at(12)) is None
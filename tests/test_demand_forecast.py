@@ -0,0 +1,104 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+HOURS = 168
+
+
+def test_constant_demand(app):
+    sales = np.ones((1, 4 * HOURS))
+    level, shares = app.fit_demand_model(sales, first_weekday=0, smoothing=0.3)
+    assert level == pytest.approx([HOURS])
+    assert shares == pytest.approx(np.full((1, HOURS), 1 / HOURS))
+    assert shares.sum(axis=1) == pytest.approx([1.0])
+
+
+def test_level_is_exponential_smoothing_of_weekly_totals(app):
+    weekly = [10.0, 20.0, 40.0]
+    sales = np.zeros((1, len(weekly) * HOURS))
+    for week, total in enumerate(weekly):
+        sales[0, week * HOURS] = total
+    smoothing = 0.5
+    level, _ = app.fit_demand_model(sales, first_weekday=0, smoothing=smoothing)
+
+    expected = weekly[0]
+    for total in weekly[1:]:
+        expected = smoothing * total + (1 - smoothing) * expected
+    assert level == pytest.approx([expected])
+
+
+def test_profile_is_aligned_to_monday(app):
+    # History starting on a Wednesday; every sale is at 13:00 on Wednesdays
+    sales = np.zeros((1, 2 * HOURS))
+    sales[0, 13] = 5
+    sales[0, HOURS + 13] = 5
+    _, shares = app.fit_demand_model(sales, first_weekday=2, smoothing=0.5)
+    assert shares[0, 2 * 24 + 13] == pytest.approx(1.0)
+    assert shares.sum() == pytest.approx(1.0)
+
+
+def test_items_are_fitted_independently(app):
+    sales = np.zeros((3, 2 * HOURS))
+    sales[0, :] = 1
+    sales[1, 5] = 7  # sold once, in the first week
+    level, shares = app.fit_demand_model(sales, first_weekday=0, smoothing=0.2)
+    assert level.shape == (3,) and shares.shape == (3, HOURS)
+    assert level[0] == pytest.approx(HOURS)
+    assert level[1] == pytest.approx(0.8 * 7)
+    assert shares[1, 5] == pytest.approx(1.0)
+    assert level[2] == 0 and not shares[2].any()  # never sold
+
+
+def test_partial_trailing_week_is_ignored(app):
+    sales = np.ones((1, 2 * HOURS + 10))
+    sales[0, 2 * HOURS :] = 1000
+    level, _ = app.fit_demand_model(sales, first_weekday=0, smoothing=0.5)
+    assert level == pytest.approx([HOURS])
+
+
+def test_forecast_hours_wrap_around_the_week(app):
+    level = np.array([2.0])
+    shares = np.zeros((1, HOURS))
+    shares[0, 0] = 0.5  # Monday 00:00
+    shares[0, HOURS - 1] = 0.5  # Sunday 23:00
+    forecast = app.forecast_hours(level, shares, start_weekday=6, hours=48)
+    assert forecast.shape == (1, 48)
+    assert forecast[0, 23] == pytest.approx(1.0)
+    assert forecast[0, 24] == pytest.approx(1.0)
+    assert forecast.sum() == pytest.approx(2.0)
+
+
+class FakeCursor:
+    def __init__(self, results):
+        self._results = results
+
+    def execute(self, sql, params=None):
+        self._rows = self._results.pop(0)
+
+    def fetchall(self):
+        return self._rows
+
+
+class FakeConnection:
+    def __init__(self, results):
+        self._results = results
+
+    def cursor(self, *args, **kwargs):
+        return FakeCursor(self._results)
+
+    def close(self):
+        pass
+
+
+def test_load_hourly_sales_skips_items_no_longer_on_the_menu(app, monkeypatch):
+    menu = [(1,), (3,)]
+    # (Item_ID, Slot, Quantity); item 2 was deleted but its sales are archived
+    sales = [(1, 0, 4), (2, 5, 9), (3, 167, 2), (4, 1, 1)]
+    monkeypatch.setattr(app, "get_read_connection", lambda: FakeConnection([menu, sales]))
+    monkeypatch.setattr(app, "history_sql", lambda conn, query, params, start: (query.sql, params))
+    item_ids, loaded = app.load_hourly_sales(date(2024, 1, 1), 1)
+    assert item_ids.tolist() == [1, 3]
+    assert loaded.shape == (2, HOURS)
+    assert loaded[0, 0] == 4 and loaded[1, 167] == 2
+    assert loaded.sum() == 6
@@ -0,0 +1,104 @@
+from decimal import Decimal
+
+import pytest
+
+
+def item(inventory_id, stock, reorder_level):
+    if reorder_level > 0:
+        ratio = Decimal(stock) / Decimal(reorder_level)
+    else:
+        ratio = Decimal(0) if stock <= 0 else None
+    return {
+        "Inventory_Id": inventory_id,
+        "Item_Name": f"Item {inventory_id}",
+        "Current_Stock": stock,
+        "Reorder_Level": reorder_level,
+        "Stock_Ratio": ratio,
+    }
+
+
+@pytest.fixture
+def inventory(app, monkeypatch):
+    """Inventory rows by id, served by a stand-in for get_low_stock_items."""
+    rows = {}
+    loads = []
+
+    def get_low_stock_items(inventory_ids=None):
+        loads.append(inventory_ids)
+        if inventory_ids is None:
+            low = [row for row in rows.values() if row["Stock_Ratio"] is not None and row["Stock_Ratio"] <= 1]
+            return sorted(low, key=lambda row: row["Stock_Ratio"])
+        return [rows[i] for i in inventory_ids if i in rows]
+
+    monkeypatch.setattr(app, "get_low_stock_items", get_low_stock_items)
+    rows.update((row["Inventory_Id"], row) for row in (
+        item(1, 5, 10),
+        item(2, 0, 10),
+        item(3, 20, 10),
+        item(4, 9, 10),
+        item(5, 3, 0),
+    ))
+    return rows, loads
+
+
+def ids(alerts):
+    return [row["Inventory_Id"] for row in alerts]
+
+
+def test_most_urgent_first(app, inventory):
+    alerts = app.LowStockAlerts(ttl=60.0)
+    assert ids(alerts.top()) == [2, 1, 4]
+    assert ids(alerts.top(2)) == [2, 1]
+    assert alerts.count() == 3
+
+
+def test_equal_ratios_order_by_id(app, inventory):
+    rows, _ = inventory
+    rows[6] = item(6, 5, 10)
+    alerts = app.LowStockAlerts(ttl=60.0)
+    assert ids(alerts.top()) == [2, 1, 6, 4]
+
+
+def test_refresh_moves_changed_items(app, inventory):
+    rows, _ = inventory
+    alerts = app.LowStockAlerts(ttl=60.0)
+    alerts.top()
+    rows[3] = item(3, 1, 10)  # now the most urgent after item 2
+    rows[1] = item(1, 50, 10)  # restocked
+    alerts.refresh([1, 3])
+    assert ids(alerts.top()) == [2, 3, 4]
+
+
+def test_refresh_before_first_load_is_skipped(app, inventory):
+    _, loads = inventory
+    alerts = app.LowStockAlerts(ttl=60.0)
+    alerts.refresh([1])
+    assert loads == []
+
+
+def test_reload_after_ttl_or_invalidate(app, inventory):
+    _, loads = inventory
+    alerts = app.LowStockAlerts(ttl=60.0)
+    alerts.top()
+    alerts.top()
+    assert loads == [None]
+    alerts.invalidate()
+    alerts.top()
+    assert loads == [None, None]
+
+    expired = app.LowStockAlerts(ttl=0.0)
+    expired.top()
+    expired.top()
+    assert loads == [None, None, None, None]
+
+
+def test_failed_refresh_forces_reload(app, inventory, monkeypatch):
+    _, loads = inventory
+    alerts = app.LowStockAlerts(ttl=60.0)
+    alerts.top()
+    real = app.get_low_stock_items
+    monkeypatch.setattr(app, "get_low_stock_items", lambda inventory_ids=None: None)
+    alerts.refresh([1])
+    assert alerts.top() is None
+    monkeypatch.setattr(app, "get_low_stock_items", real)
+    assert ids(alerts.top()) == [2, 1, 4]
@@ -0,0 +1,86 @@
+def test_hit_after_load(app):
+    cache = app.QueryCache()
+    calls = []
+
+    def load():
+        calls.append(1)
+        return ["row"]
+
+    assert cache.get_or_load("key", load, ttl=60) == ["row"]
+    assert cache.get_or_load("key", load, ttl=60) == ["row"]
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_failed_load_is_not_cached(app):
+    cache = app.QueryCache()
+    assert cache.get_or_load("key", lambda: None, ttl=60) is None
+    assert cache.get_or_load("key", lambda: ["row"], ttl=60) == ["row"]
+
+
+def test_invalidate_drops_tagged_entries_only(app):
+    cache = app.QueryCache()
+    cache.get_or_load("menu", lambda: ["menu"], ttl=60, tags={"menu:all"})
+    cache.get_or_load("tables", lambda: ["tables"], ttl=60, tags={"tables"})
+    cache.invalidate("menu:all")
+    assert cache.get_or_load("menu", lambda: ["new menu"], ttl=60) == ["new menu"]
+    assert cache.get_or_load("tables", lambda: ["new tables"], ttl=60) == ["tables"]
+
+
+def test_tags_from_loaded_value(app):
+    cache = app.QueryCache()
+    cache.get_or_load("items", lambda: [3, 4], ttl=60, tags=lambda ids: {f"menu:item:{i}" for i in ids})
+    cache.invalidate("menu:item:4")
+    assert cache.get_or_load("items", lambda: [5], ttl=60) == [5]
+
+
+def test_lru_eviction(app):
+    cache = app.QueryCache(max_entries=2)
+    for key in ("a", "b"):
+        cache.get_or_load(key, lambda: [key], ttl=60)
+    cache.get_or_load("a", lambda: ["reloaded"], ttl=60)  # a is now most recent
+    cache.get_or_load("c", lambda: ["c"], ttl=60)
+    assert cache.get_or_load("a", lambda: ["reloaded"], ttl=60) == ["a"]
+    assert cache.get_or_load("b", lambda: ["reloaded"], ttl=60) == ["reloaded"]
+    assert cache.stats()["evictions"] >= 1
+
+
+def test_load_racing_an_invalidation_is_not_stored(app):
+    cache = app.QueryCache()
+
+    def load_then_write():
+        # A write commits and invalidates while this load is in flight
+        cache.invalidate("menu:all")
+        return ["stale"]
+
+    assert cache.get_or_load("menu", load_then_write, ttl=60, tags={"menu:all"}) == ["stale"]
+    assert cache.get_or_load("menu", lambda: ["fresh"], ttl=60, tags={"menu:all"}) == ["fresh"]
+
+
+def test_invalidation_of_other_tags_does_not_block_store(app):
+    cache = app.QueryCache()
+
+    def load_during_unrelated_write():
+        cache.invalidate("tables")
+        return ["menu"]
+
+    cache.get_or_load("menu", load_during_unrelated_write, ttl=60, tags={"menu:all"})
+    assert cache.get_or_load("menu", lambda: ["reloaded"], ttl=60) == ["menu"]
+
+
+def test_load_racing_a_clear_is_not_stored(app):
+    cache = app.QueryCache()
+
+    def load_then_clear():
+        cache.clear()
+        return ["stale"]
+
+    cache.get_or_load("key", load_then_clear, ttl=60)
+    assert cache.get_or_load("key", lambda: ["fresh"], ttl=60) == ["fresh"]
+
+
+def test_load_after_invalidation_is_stored(app):
+    cache = app.QueryCache()
+    cache.invalidate("menu:all")
+    cache.get_or_load("menu", lambda: ["menu"], ttl=60, tags={"menu:all"})
+    assert cache.get_or_load("menu", lambda: ["reloaded"], ttl=60) == ["menu"]
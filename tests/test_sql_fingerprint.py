@@ -0,0 +1,33 @@
+def test_whitespace_is_collapsed(app):
+    assert app.sql_fingerprint("SELECT *\n    FROM   Orders\n") == "SELECT * FROM Orders"
+
+
+def test_literals_and_placeholders_become_markers(app):
+    a = app.sql_fingerprint("SELECT * FROM Orders WHERE Order_ID = 42 AND Order_Status = 'Pending'")
+    b = app.sql_fingerprint("SELECT * FROM Orders WHERE Order_ID = %s AND Order_Status = %s")
+    assert a == b == "SELECT * FROM Orders WHERE Order_ID = ? AND Order_Status = ?"
+
+
+def test_quoted_strings_with_escapes(app):
+    fingerprint = app.sql_fingerprint("SELECT 1 FROM Staff WHERE Username = 'o\\'brien' OR Email = \"a\\\"b\"")
+    assert fingerprint == "SELECT ? FROM Staff WHERE Username = ? OR Email = ?"
+
+
+def test_decimals(app):
+    assert app.sql_fingerprint("UPDATE Menu_Items SET Price = 12.50") == "UPDATE Menu_Items SET Price = ?"
+
+
+def test_digits_inside_identifiers_are_kept(app):
+    assert app.sql_fingerprint("SELECT Col1 FROM t2") == "SELECT Col1 FROM t2"
+
+
+def test_in_lists_of_any_length_share_a_key(app):
+    one = app.sql_fingerprint("SELECT * FROM Orders WHERE Order_ID IN (%s)")
+    three = app.sql_fingerprint("SELECT * FROM Orders WHERE Order_ID IN (%s, %s, %s)")
+    literal = app.sql_fingerprint("SELECT * FROM Orders WHERE Order_ID IN (1,2)")
+    assert one == three == literal == "SELECT * FROM Orders WHERE Order_ID IN (?+)"
+
+
+def test_multi_row_values_tuples(app):
+    two = app.sql_fingerprint("INSERT INTO Order_Items VALUES (%s, %s, %s), (%s, %s, %s)")
+    assert two == "INSERT INTO Order_Items VALUES (?+), (?+)"
@@ -0,0 +1,158 @@
+import json
+
+import mysql.connector
+import pytest
+from mysql.connector import errorcode
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=None):
+        self.conn.statements.append(sql)
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+        self.statements = []
+
+    def cursor(self, dictionary=False):
+        return FakeCursor(self)
+
+    def start_transaction(self):
+        self.log.append("begin")
+
+    def commit(self):
+        self.log.append("commit")
+
+    def rollback(self):
+        self.log.append("rollback")
+
+    def close(self):
+        pass
+
+
+def transient_error():
+    return mysql.connector.errors.OperationalError("Lock wait timeout", errno=errorcode.ER_LOCK_WAIT_TIMEOUT)
+
+
+def connection_error():
+    return mysql.connector.errors.OperationalError("Lost connection", errno=errorcode.CR_SERVER_LOST)
+
+
+@pytest.fixture
+def journal(app, monkeypatch, tmp_path):
+    """A journal without its flusher thread, applying writes to a fake database."""
+    monkeypatch.setattr(app.WriteJournal, "_run", lambda self: None)
+    monkeypatch.setattr(app, "get_query_cache", lambda: app.QueryCache())
+    log = []
+    monkeypatch.setattr(app, "get_database_connection", lambda: FakeConnection(log))
+    failures = {}  # payload name -> list of exceptions to raise, one per attempt
+    applied = []
+
+    def apply(self, cursor, entry):
+        name = json.loads(entry["payload"])["name"]
+        pending = failures.get(name)
+        if pending:
+            raise pending.pop(0)
+        applied.append(name)
+        return len(applied), None
+
+    monkeypatch.setattr(app.WriteJournal, "_apply", apply)
+    journal = app.WriteJournal(str(tmp_path / "journal.sqlite3"), batch_size=10, max_attempts=3)
+    journal.log, journal.failures, journal.applied = log, failures, applied
+    return journal
+
+
+def test_entries_apply_in_order_in_one_transaction(journal):
+    keys = [journal.submit("order", {"name": name}) for name in ("a", "b", "c")]
+    assert journal.flush() == 3
+    assert journal.applied == ["a", "b", "c"]
+    assert journal.log == ["begin", "commit"]
+    assert [journal.entry(key)["status"] for key in keys] == ["applied"] * 3
+    assert journal.flush() == 0
+
+
+def test_rejected_write_does_not_hold_up_the_batch(app, journal):
+    journal.failures["bad"] = [app.WriteRejected("No valid items")]
+    bad = journal.submit("order", {"name": "bad"})
+    good = journal.submit("order", {"name": "good"})
+    assert journal.flush() == 2
+    assert journal.entry(bad)["status"] == "rejected"
+    assert journal.entry(bad)["last_error"] == "No valid items"
+    assert journal.entry(good)["status"] == "applied"
+
+
+def test_handler_bug_rejects_only_that_entry(journal):
+    journal.failures["bug"] = [KeyError("table_id")]
+    bug = journal.submit("order", {"name": "bug"})
+    good = journal.submit("order", {"name": "good"})
+    assert journal.flush() == 2
+    assert journal.entry(bug)["status"] == "rejected"
+    assert "KeyError" in journal.entry(bug)["last_error"]
+    assert journal.entry(good)["status"] == "applied"
+
+
+def test_transient_error_retries_the_batch_with_backoff(journal):
+    journal.failures["slow"] = [transient_error()]
+    slow = journal.submit("order", {"name": "slow"})
+    after = journal.submit("order", {"name": "after"})
+    assert journal.flush() is None
+    assert journal.log == ["begin", "rollback"]
+    assert journal.entry(slow)["attempts"] == 1
+    assert journal.entry(after)["attempts"] == 0  # only the failing entry is charged
+    assert journal.entry(after)["last_error"]
+    stats = journal.stats()
+    assert stats["retries"] == 1 and stats["backoff_s"] >= 1.0
+
+    assert journal.flush() == 2
+    assert journal.applied == ["slow", "after"]
+    assert journal.stats()["backoff_s"] == 0.0
+
+
+def test_entry_failing_max_attempts_is_dead_lettered(journal):
+    journal.failures["poison"] = [transient_error() for _ in range(3)]
+    poison = journal.submit("order", {"name": "poison"})
+    after = journal.submit("order", {"name": "after"})
+    assert journal.flush() is None
+    assert journal.flush() is None
+    assert journal.entry(poison)["status"] == "pending"
+    assert journal.flush() is None
+    entry = journal.entry(poison)
+    assert entry["status"] == "rejected"
+    assert entry["last_error"].startswith("Gave up after 3 attempts")
+    assert journal.flush() == 1
+    assert journal.entry(after)["status"] == "applied"
+    assert journal.stats()["rejected"] == 1
+
+
+def test_lost_connection_is_not_charged_to_the_entry(journal):
+    journal.failures["a"] = [connection_error() for _ in range(5)]
+    key = journal.submit("order", {"name": "a"})
+    for _ in range(5):
+        assert journal.flush() is None
+    entry = journal.entry(key)
+    assert entry["status"] == "pending"
+    assert entry["attempts"] == 0
+    assert journal.flush() == 1
+
+
+def test_no_connection_backs_off(app, journal, monkeypatch):
+    monkeypatch.setattr(app, "get_database_connection", lambda: None)
+    key = journal.submit("order", {"name": "a"})
+    assert journal.flush() is None
+    assert journal.entry(key)["last_error"] == "No database connection"
+    assert journal.entry(key)["attempts"] == 0
+
+
+def test_backoff_doubles_up_to_the_limit(journal):
+    journal.max_backoff = 4.0
+    journal.failures["a"] = [connection_error() for _ in range(4)]
+    journal.submit("order", {"name": "a"})
+    backoffs = []
+    for _ in range(4):
+        journal.flush()
+        backoffs.append(journal.stats()["backoff_s"])
+    assert backoffs == [1.0, 2.0, 4.0, 4.0]